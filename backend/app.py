@@ -1,13 +1,46 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-from python_debugger import debug_python
+from python_debugger import (debug_python, stream_debug_python, DebugCancelled, DEFAULT_KEYFRAME_INTERVAL,
+                             DEFAULT_LOOP_KEEP_ITERATIONS, TRACER_VERSION)
+from replay import DEFAULT_CHECKPOINT_INTERVAL
+from worker_pool import (WorkerPool, JobTimeoutError, JobCancelledError, RUNNERS, DEFAULT_POOL_SIZE,
+                         DEFAULT_MAX_JOBS_PER_WORKER, DEFAULT_MAX_MEMORY_MB, DEFAULT_JOB_TIMEOUT,
+                         STREAM_BUFFER_RECORDS)
+from jobs import JobManager, QueueFullError, DEFAULT_MAX_QUEUED_JOBS, DEFAULT_JOB_TTL, DONE
+from result_cache import ResultCache, cache_key, is_deterministic, DEFAULT_CACHE_MAX_BYTES
+from value_serializer import DEFAULT_MAX_DEPTH, DEFAULT_MAX_ITEMS, DEFAULT_MAX_STRING_LENGTH
+from debug_sessions import (SessionStore, RecordingSession, PreviousRun, supports_prefix_reuse, DEFAULT_SESSION_TTL,
+                            DEFAULT_MAX_SESSIONS, DEFAULT_MAX_PREVIOUS_RUNS)
+from trace_store import TraceStore
+from trace_selection import TraceSelection
+from execution_budget import DEFAULT_MAX_STEPS, DEFAULT_MAX_SECONDS, DEFAULT_MAX_STATE_BYTES
+from recursion_tree import RecursionTree
+from trace_diff import compare_traces
+from metrics import MetricsRegistry, SIZE_BUCKETS
+from complexity import analyze_complexity, measured_complexity, DEFAULT_COMPLEXITY_SIZES
 import os
+import gzip
+import json
+import time
+import queue
 import logging
+import threading
 from datetime import datetime
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+# Optional compact transports, used only when installed
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['Server-Timing', 'X-Debug-Metrics'])
 
 # Configure logging
 logging.basicConfig(
@@ -19,6 +52,254 @@ logging.basicConfig(
     ]
 )
 
+# Debug sessions run in a pool of worker processes; DEBUG_POOL_SIZE=0 runs them in-process
+POOL_SIZE = int(os.getenv('DEBUG_POOL_SIZE', DEFAULT_POOL_SIZE))
+debug_pool = None
+debug_pool_lock = threading.Lock()
+
+def get_debug_pool():
+    """Start the worker pool on first use, so worker processes never start their own pool"""
+    global debug_pool
+    with debug_pool_lock:
+        if debug_pool is None:
+            debug_pool = WorkerPool(
+                size=POOL_SIZE,
+                max_jobs_per_worker=int(os.getenv('DEBUG_POOL_MAX_JOBS', DEFAULT_MAX_JOBS_PER_WORKER)),
+                max_memory_mb=int(os.getenv('DEBUG_POOL_MAX_MEMORY_MB', DEFAULT_MAX_MEMORY_MB)),
+                job_timeout=float(os.getenv('DEBUG_JOB_TIMEOUT', DEFAULT_JOB_TIMEOUT)),
+                address_space_mb=int(os.getenv('DEBUG_WORKER_ADDRESS_SPACE_MB', 0)) or None
+            )
+            logging.info(f"Started debug worker pool with {POOL_SIZE} workers")
+        return debug_pool
+
+# Budgets every run is stopped at; requests may ask for lower ones. 0 disables a limit
+MAX_STEPS = int(os.getenv('DEBUG_MAX_STEPS', DEFAULT_MAX_STEPS)) or None
+MAX_SECONDS = float(os.getenv('DEBUG_MAX_SECONDS', DEFAULT_MAX_SECONDS)) or None
+MAX_STATE_BYTES = int(float(os.getenv('DEBUG_MAX_STATE_MB', DEFAULT_MAX_STATE_BYTES / (1024 * 1024))) * 1024 * 1024) or None
+
+# Results of deterministic programs are cached; DEBUG_CACHE_MAX_MB=0 disables the cache
+CACHE_MAX_BYTES = int(float(os.getenv('DEBUG_CACHE_MAX_MB', DEFAULT_CACHE_MAX_BYTES / (1024 * 1024))) * 1024 * 1024)
+result_cache = ResultCache(CACHE_MAX_BYTES, os.getenv('DEBUG_CACHE_DIR')) if CACHE_MAX_BYTES > 0 else None
+
+# Traces kept server-side for clients that page through them instead of downloading everything
+session_store = SessionStore(
+    ttl=float(os.getenv('DEBUG_SESSION_TTL', DEFAULT_SESSION_TTL)),
+    max_sessions=int(os.getenv('DEBUG_MAX_SESSIONS', DEFAULT_MAX_SESSIONS))
+)
+
+# Recordings replayed on demand; they run far more steps than a traced run may
+recording_store = SessionStore(
+    ttl=float(os.getenv('DEBUG_SESSION_TTL', DEFAULT_SESSION_TTL)),
+    max_sessions=int(os.getenv('DEBUG_MAX_SESSIONS', DEFAULT_MAX_SESSIONS)),
+    session_class=RecordingSession
+)
+MAX_RECORD_STEPS = int(os.getenv('DEBUG_MAX_RECORD_STEPS', 50000000)) or None
+# Replaying re-runs every step before the requested page, so pages past this step are refused
+MAX_REPLAY_START = int(os.getenv('DEBUG_MAX_REPLAY_START', 5000000)) or None
+
+# Each client's last run, so re-running an edited program only traces what follows the unchanged statements
+previous_runs = SessionStore(
+    ttl=float(os.getenv('DEBUG_SESSION_TTL', DEFAULT_SESSION_TTL)),
+    max_sessions=int(os.getenv('DEBUG_MAX_PREVIOUS_RUNS', DEFAULT_MAX_PREVIOUS_RUNS)),
+    session_class=PreviousRun
+)
+
+# Submitted debug jobs: DEBUG_JOB_CONCURRENCY run at once, DEBUG_MAX_QUEUED_JOBS wait, the rest are rejected
+def run_job(job):
+    result, run_metrics = run_instrumented(progress=job.progress, cancel_event=job.cancel_event, **job.options)
+    if job.request.get('session'):
+        job.session_id, _ = session_store.create(result)
+    return result, run_metrics
+
+job_manager = JobManager(
+    run_job,
+    concurrency=int(os.getenv('DEBUG_JOB_CONCURRENCY', max(1, POOL_SIZE))),
+    max_queued=int(os.getenv('DEBUG_MAX_QUEUED_JOBS', DEFAULT_MAX_QUEUED_JOBS)),
+    ttl=float(os.getenv('DEBUG_JOB_TTL', DEFAULT_JOB_TTL))
+)
+JOB_EVENT_INTERVAL = 0.25  # Seconds between progress events of /api/jobs/<id>/events
+
+# Inputs accepted by one /api/debug/batch request
+MAX_BATCH_INPUTS = int(os.getenv('DEBUG_MAX_BATCH_INPUTS', 100))
+
+# Input sizes accepted by one /api/complexity request
+MAX_COMPLEXITY_SIZES = int(os.getenv('DEBUG_MAX_COMPLEXITY_SIZES', 10))
+
+# Service metrics, exported at /api/metrics
+metrics = MetricsRegistry()
+requests_total = metrics.counter('debugger_requests_total', 'Debug API requests by endpoint and HTTP status',
+                                 ('endpoint', 'status'))
+errors_total = metrics.counter('debugger_errors_total', 'Failed debug requests and traced programs that raised',
+                               ('kind',))
+request_seconds = metrics.histogram('debugger_request_duration_seconds', 'Debug request latency', ('endpoint',))
+phase_seconds = metrics.histogram('debugger_phase_duration_seconds',
+                                  'Time spent per phase of a debug request', ('phase',))
+states_total = metrics.counter('debugger_states_total', 'Trace states recorded (raw) and returned (filtered)',
+                               ('kind',))
+response_bytes = metrics.histogram('debugger_response_bytes', 'Uncompressed debug response size',
+                                   buckets=SIZE_BUCKETS)
+peak_memory_bytes = metrics.histogram('debugger_peak_memory_bytes', 'Peak memory of the process that ran a job',
+                                      buckets=SIZE_BUCKETS)
+truncated_total = metrics.counter('debugger_truncated_runs_total', 'Runs stopped by their execution budget',
+                                  ('reason',))
+in_flight = metrics.gauge('debugger_requests_in_flight', 'Debug runs in progress, including streams')
+metrics.gauge('debugger_sessions_active', 'Debug sessions kept server-side').set_function(
+    lambda: len(session_store.sessions))
+metrics.counter('debugger_cache_events_total', 'Result cache lookups and stores', ('event',)).set_function(
+    lambda: {(event,): count for event, count in (result_cache.counters.items() if result_cache else ())})
+metrics.gauge('debugger_pool_workers', 'Worker pool processes by state', ('state',)).set_function(
+    lambda: {} if debug_pool is None else {('busy',): debug_pool.stats()['busy'],
+                                           ('idle',): debug_pool.size - debug_pool.stats()['busy']})
+metrics.gauge('debugger_pool_queued_jobs', 'Debug jobs waiting for a worker').set_function(
+    lambda: 0 if debug_pool is None else debug_pool.stats()['queued'])
+metrics.gauge('debugger_jobs', 'Submitted debug jobs by status', ('status',)).set_function(
+    lambda: {(status,): count for status, count in job_manager.stats().items()})
+
+# Phases of the run_metrics returned by debug_python
+RUN_PHASES = (('compile', 'compileSeconds'), ('trace', 'traceSeconds'), ('filter', 'filterSeconds'))
+
+def record_run_metrics(run_metrics):
+    """Aggregate the metrics of one debug run, from debug_python or a cache hit"""
+    for phase, key in RUN_PHASES:
+        if key in run_metrics:
+            phase_seconds.observe(run_metrics[key], phase)
+    if 'rawStates' in run_metrics:
+        states_total.inc('raw', amount=run_metrics['rawStates'])
+    if 'states' in run_metrics:
+        states_total.inc('filtered', amount=run_metrics['states'])
+    if 'peakMemoryKB' in run_metrics:
+        peak_memory_bytes.observe(run_metrics['peakMemoryKB'] * 1024)
+
+def run_debug_session(progress=None, cancel_event=None, client_id=None, **job):
+    """Run debug_python on the worker pool, or in-process when the pool is disabled
+
+    Results of deterministic programs are served from the result cache when
+    the same code, input and options were debugged before. Returns the result
+    and the metrics of the run, which are never cached.
+
+    With a client_id, the client's run is kept as a PreviousRun, and when
+    its next one only edits statements further down, the unchanged ones run
+    untraced and their states are reused.
+
+    progress receives the step count while the program runs; setting
+    cancel_event stops it, raising JobCancelledError.
+    """
+    start = time.perf_counter()
+    key = None
+    # A profile measures this run; a cached one would report the times of an earlier run
+    if result_cache is not None and not job.get('profile'):
+        if is_deterministic(job['code']):
+            options = {name: value for name, value in job.items() if name not in ('code', 'input_data')}
+            key = cache_key(job['code'], job.get('input_data'), options, TRACER_VERSION)
+            cached = result_cache.get(key)
+            if cached is not None:
+                cached.pop('metrics', None)
+                return cached, {'cached': True, 'states': len(cached['debugStates']),
+                                'cacheSeconds': round(time.perf_counter() - start, 6)}
+        else:
+            result_cache.count('uncacheable')
+
+    previous = None
+    if client_id is not None:
+        if supports_prefix_reuse(job):
+            previous = previous_runs.get(client_id)
+            resume = previous.resume_point(job) if previous is not None else None
+            job = dict(job, checkpoints=True, resume=resume)
+        else:
+            previous_runs.delete(client_id)
+
+    if POOL_SIZE <= 0:
+        def report_progress(steps):
+            if cancel_event is not None and cancel_event.is_set():
+                raise DebugCancelled()
+            if progress is not None:
+                progress(steps)
+        try:
+            result = debug_python(progress=report_progress, **job)
+        except DebugCancelled:
+            raise JobCancelledError('Debug job was cancelled')
+    else:
+        result = get_debug_pool().run(job, progress=progress, cancel_event=cancel_event)
+    if job.get('checkpoints'):
+        if job['resume'] is not None:
+            previous.splice(result)
+        checkpoints = result.pop('prefixCheckpoints')
+        if checkpoints:
+            job = {name: value for name, value in job.items() if name not in ('checkpoints', 'resume')}
+            previous_runs.put(client_id, {'job': job, 'result': result, 'checkpoints': checkpoints})
+        else:
+            previous_runs.delete(client_id)
+    run_metrics = dict(result.pop('metrics', {}), cached=False)
+    # Whatever the run itself did not account for: queueing, pickling, cache lookup
+    run_metrics['overheadSeconds'] = round(max(0.0, time.perf_counter() - start - sum(
+        run_metrics.get(key, 0) for _, key in RUN_PHASES)), 6)
+
+    # Runs cut short by the clock or by memory would not stop at the same step twice
+    if key is not None and result.get('truncated', {}).get('reason') not in ('time', 'memory'):
+        result_cache.put(key, result)
+    return result, run_metrics
+
+def run_pool_job(kind, job):
+    """A RUNNERS function other than debug_python on the worker pool, or in-process when the pool is disabled"""
+    if POOL_SIZE > 0:
+        return get_debug_pool().run(job, kind=kind)
+    return RUNNERS[kind](**job)
+
+def pool_concurrency(count):
+    """Threads to submit count runs from
+
+    In-process runs share stdout and settrace, so only the pool runs them in parallel.
+    """
+    return min(count, POOL_SIZE) if POOL_SIZE > 0 else 1
+
+def run_instrumented(**job):
+    """run_debug_session, counted in the in-flight gauge and the run metrics"""
+    in_flight.inc()
+    try:
+        debug_states, run_metrics = run_debug_session(**job)
+    finally:
+        in_flight.dec()
+    record_run_metrics(run_metrics)
+    if 'truncated' in debug_states:
+        truncated_total.inc(debug_states['truncated']['reason'])
+    if debug_states['debugStates'] and debug_states['debugStates'][-1].get('error'):
+        errors_total.inc('program')
+    return debug_states, run_metrics
+
+COMPRESS_MIN_BYTES = 1024
+
+def encode_response(payload, status=200):
+    """Serialize a payload in the representation the client negotiated
+
+    Accept: application/msgpack gets MessagePack when msgpack is installed,
+    anything else JSON. Bodies over COMPRESS_MIN_BYTES are compressed with
+    zstd (when zstandard is installed) or gzip if Accept-Encoding allows it.
+    """
+    if msgpack is not None and 'application/msgpack' in request.headers.get('Accept', ''):
+        body = msgpack.packb(payload, use_bin_type=True)
+        mimetype = 'application/msgpack'
+    else:
+        body = app.json.dumps(payload).encode('utf-8')
+        mimetype = 'application/json'
+
+    content_encoding = None
+    uncompressed_size = len(body)
+    accepted = request.headers.get('Accept-Encoding', '')
+    if len(body) >= COMPRESS_MIN_BYTES:
+        if zstandard is not None and 'zstd' in accepted:
+            body = zstandard.ZstdCompressor().compress(body)
+            content_encoding = 'zstd'
+        elif 'gzip' in accepted:
+            body = gzip.compress(body, compresslevel=6)
+            content_encoding = 'gzip'
+
+    response = Response(body, status=status, mimetype=mimetype)
+    response.uncompressed_size = uncompressed_size
+    if content_encoding:
+        response.headers['Content-Encoding'] = content_encoding
+    response.headers['Vary'] = 'Accept, Accept-Encoding'
+    return response
+
 @app.route('/', methods=['GET'])
 def index():
     return jsonify({
@@ -33,9 +314,180 @@ def health_check():
         'timestamp': datetime.now().isoformat()
     })
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Service metrics in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss counters of the result cache"""
+    if result_cache is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(result_cache.stats(), enabled=True))
+
+def parse_debug_options(data):
+    """Validate the debug options of a request, returning (options, error message)"""
+    code = data.get('code', '')
+    snapshot_mode = data.get('snapshotMode', 'full')
+    tracer_backend = data.get('tracerBackend', 'settrace')
+    value_format = data.get('valueFormat', 'repr')
+
+    if not code.strip():
+        return None, 'No code provided'
+    if snapshot_mode not in ('full', 'delta'):
+        return None, f'Unsupported snapshot mode: {snapshot_mode}'
+    if tracer_backend not in ('settrace', 'monitoring', 'auto'):
+        return None, f'Unsupported tracer backend: {tracer_backend}'
+    if value_format not in ('repr', 'structured'):
+        return None, f'Unsupported value format: {value_format}'
+
+    # Selective tracing: only these functions, line ranges and breakpoints are recorded
+    selection = {
+        'functions': data.get('traceFunctions') or [],
+        'line_ranges': data.get('traceLines') or [],
+        'breakpoints': data.get('breakpoints') or []
+    }
+    try:
+        TraceSelection(**selection)
+    except (ValueError, TypeError, KeyError) as e:
+        return None, f'Invalid trace selection: {e}'
+
+    try:
+        budget = {
+            'max_steps': lower_limit(MAX_STEPS, data.get('maxSteps'), int),
+            'max_seconds': lower_limit(MAX_SECONDS, data.get('maxSeconds'), float),
+            'max_state_bytes': lower_limit(MAX_STATE_BYTES, data.get('maxStateBytes'), int)
+        }
+    except (ValueError, TypeError) as e:
+        return None, f'Invalid execution budget: {e}'
+
+    try:
+        keyframe_interval = positive_option(data.get('keyframeInterval'), DEFAULT_KEYFRAME_INTERVAL)
+    except (ValueError, TypeError) as e:
+        return None, f'Invalid keyframeInterval: {e}'
+    try:
+        loop_keep_iterations = positive_option(data.get('loopKeepIterations'), DEFAULT_LOOP_KEEP_ITERATIONS)
+    except (ValueError, TypeError) as e:
+        return None, f'Invalid loopKeepIterations: {e}'
+    try:
+        parse_tree_depth(data.get('recursionTreeDepth'))
+    except (ValueError, TypeError) as e:
+        return None, f'Invalid recursionTreeDepth: {e}'
+
+    value_options = {'value_format': value_format}
+    for key, option, default in (('max_depth', 'maxDepth', DEFAULT_MAX_DEPTH),
+                                 ('max_items', 'maxItems', DEFAULT_MAX_ITEMS),
+                                 ('max_string_length', 'maxStringLength', DEFAULT_MAX_STRING_LENGTH)):
+        try:
+            value_options[key] = positive_option(data.get(option), default)
+        except (ValueError, TypeError) as e:
+            return None, f'Invalid {option}: {e}'
+
+    return {
+        'code': code,
+        # The frontend has always sent its test input as testCase
+        'input_data': data.get('input') or data.get('testCase') or '',
+        'snapshot_mode': snapshot_mode,
+        'keyframe_interval': keyframe_interval,
+        'tracer_backend': tracer_backend,
+        'collapse_loops': bool(data.get('collapseLoops', False)),
+        'loop_keep_iterations': loop_keep_iterations,
+        'value_options': value_options,
+        'selection': selection if any(selection.values()) else None,
+        'budget': budget,
+        'profile': bool(data.get('profile', False)),
+        # Lists, dicts, sets and dataclasses in locals become references into a heap table
+        'heap': bool(data.get('heap', False))
+    }, None
+
+def lower_limit(server_limit, requested, convert):
+    """The limit a run gets: the requested one when given, but never above the server's"""
+    if requested is None:
+        return server_limit
+    requested = convert(requested)
+    if requested <= 0:
+        raise ValueError(f'limits must be positive, got {requested}')
+    return requested if server_limit is None else min(requested, server_limit)
+
+def positive_option(requested, default):
+    """An integer option of a request, default when it is not given"""
+    if requested is None:
+        return default
+    requested = int(requested)
+    if requested <= 0:
+        raise ValueError(f'must be positive, got {requested}')
+    return requested
+
+def stream_debug_session(**job):
+    """Yield stream_debug_python records from the worker pool, or from a thread when the pool is disabled"""
+    if POOL_SIZE > 0:
+        yield from get_debug_pool().stream(job)
+        return
+
+    records = queue.Queue(maxsize=STREAM_BUFFER_RECORDS)
+    def run():
+        try:
+            stream_debug_python(emit=records.put, **job)
+        except Exception as e:
+            records.put({'type': 'error', 'error': str(e)})
+        records.put(None)
+    threading.Thread(target=run, daemon=True).start()
+
+    while True:
+        record = records.get()
+        if record is None:
+            return
+        yield record
+
+def shape_result(debug_states, data):
+    """Add the extras a request asked for to a debug result, and convert its trace format"""
+    # Aggregated recursion tree, for clients that cannot draw one node per call
+    if data.get('recursionTree'):
+        debug_states = dict(debug_states, recursionTree=RecursionTree(
+            debug_states['callHierarchy']).view(depth=parse_tree_depth(data.get('recursionTreeDepth'))))
+    
+    # Columnar traces send each column as one list plus a string table
+    if data.get('traceFormat') == 'columnar':
+        debug_states = dict(debug_states, traceFormat='columnar',
+                            debugStates=TraceStore.from_states(debug_states['debugStates']).to_columns())
+    return debug_states
+
+def debug_response(debug_states, run_metrics, data, start_time, request_id):
+    """Encode a debug result in the shape the request asked for, and record its metrics"""
+    # Keep the trace server-side and only return a summary
+    serialize_start = time.perf_counter()
+    if data.get('session'):
+        session_id, session = session_store.create(debug_states)
+        response = encode_response({
+            'success': True,
+            'sessionId': session_id,
+            'expiresIn': session_store.ttl,
+            'summary': session.summary()
+        })
+    else:
+        # Simplified response with just the debug states
+        response = encode_response({
+            'success': True,
+            'debugStates': shape_result(debug_states, data)
+        })
+    
+    run_metrics['serializeSeconds'] = round(time.perf_counter() - serialize_start, 6)
+    run_metrics['responseBytes'] = response.uncompressed_size
+    run_metrics['totalSeconds'] = round(time.perf_counter() - start_time, 6)
+    phase_seconds.observe(run_metrics['serializeSeconds'], 'serialize')
+    response_bytes.observe(response.uncompressed_size)
+    logging.info(f"[{request_id}] Debug completed - {json.dumps(run_metrics)}")
+    
+    # Opt-in breakdown for clients profiling the service
+    if data.get('includeMetrics'):
+        response.headers['X-Debug-Metrics'] = json.dumps(run_metrics)
+        response.headers['Server-Timing'] = server_timing(run_metrics)
+    return response
+
 @app.route('/api/debug', methods=['POST'])
 def debug_code():
-    start_time = datetime.now()
+    start_time = time.perf_counter()
     request_id = os.urandom(4).hex()
     
     data = request.get_json()
@@ -46,30 +498,26 @@ def debug_code():
             'request_id': request_id
         }), 400
 
-    code = data.get('code', '')
-    input_data = data.get('input', '')
     language = data.get('language', 'python').lower()
 
     logging.info(f"[{request_id}] Debug request - Language: {language}")
 
-    if not code.strip():
+    options, error = parse_debug_options(data)
+    trace_format = data.get('traceFormat', 'states')
+    if not error and trace_format not in ('states', 'columnar'):
+        error = f'Unsupported trace format: {trace_format}'
+    if error:
         return jsonify({
             'success': False,
-            'error': 'No code provided',
+            'error': error,
             'request_id': request_id
         }), 400
 
     try:
         if language == 'python':
             logging.info(f"[{request_id}] Starting Python debug session")
-            debug_states = debug_python(code, input_data)
-            logging.info(f"[{request_id}] Debug completed - {len(debug_states)} states")
-            
-            # Simplified response with just the debug states
-            return jsonify({
-                'success': True,
-                'debugStates': debug_states
-            })
+            debug_states, run_metrics = run_instrumented(client_id=data.get('clientId'), **options)
+            return debug_response(debug_states, run_metrics, data, start_time, request_id)
             
         elif language == 'javascript':
             return jsonify({
@@ -86,7 +534,17 @@ def debug_code():
                 'request_id': request_id
             }), 400
 
+    except JobTimeoutError as e:
+        errors_total.inc('timeout')
+        logging.warning(f"[{request_id}] Debug session timed out: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f"Debugging timed out: {str(e)}",
+            'request_id': request_id
+        }), 504
+
     except Exception as e:
+        errors_total.inc('failure')
         logging.error(f"[{request_id}] Error: {str(e)}\n{traceback.format_exc()}")
         return jsonify({
             'success': False,
@@ -94,6 +552,522 @@ def debug_code():
             'traceback': traceback.format_exc() if app.debug else None
         }), 500
 
+@app.route('/api/debug/batch', methods=['POST'])
+def debug_batch():
+    """Debug one program on many inputs in parallel and compare the traces
+
+    Runs are spread over the worker pool, where each worker compiles the
+    program once and reuses it for every input it gets. The response has a
+    result per input, without the traces when includeTraces is false, and
+    a comparison of the runs (see compare_traces).
+    """
+    start_time = time.perf_counter()
+    request_id = os.urandom(4).hex()
+    data = request.get_json(silent=True) or {}
+
+    inputs = data.get('inputs')
+    options, error = parse_debug_options(data)
+    if not error and (not isinstance(inputs, list) or not inputs):
+        error = 'inputs must be a non-empty list'
+    elif not error and len(inputs) > MAX_BATCH_INPUTS:
+        error = f'At most {MAX_BATCH_INPUTS} inputs per batch, got {len(inputs)}'
+    elif not error and not all(isinstance(item, str) for item in inputs):
+        error = 'Every input must be a string'
+    if error:
+        return jsonify({'success': False, 'error': error, 'request_id': request_id}), 400
+
+    logging.info(f"[{request_id}] Batch debug request - {len(inputs)} inputs")
+
+    def run(input_data):
+        try:
+            debug_states, _ = run_instrumented(**dict(options, input_data=input_data))
+            return debug_states, None
+        except JobTimeoutError as e:
+            errors_total.inc('timeout')
+            return None, f"Debugging timed out: {str(e)}"
+        except Exception as e:
+            errors_total.inc('failure')
+            logging.error(f"[{request_id}] Batch run failed: {str(e)}")
+            return None, f"Debugging failed: {str(e)}"
+
+    with ThreadPoolExecutor(max_workers=pool_concurrency(len(inputs))) as executor:
+        runs = list(executor.map(run, inputs))
+
+    results = []
+    for index, (debug_states, error) in enumerate(runs):
+        if debug_states is None:
+            results.append({'input': index, 'success': False, 'error': error})
+        elif data.get('includeTraces', True):
+            results.append({'input': index, 'success': True, 'debugStates': shape_result(debug_states, data)})
+        else:
+            results.append({'input': index, 'success': True})
+
+    response = encode_response({
+        'success': True,
+        'results': results,
+        'comparison': compare_traces([debug_states for debug_states, _ in runs])
+    })
+    logging.info(f"[{request_id}] Batch debug completed - {len(inputs)} inputs in "
+                 f"{time.perf_counter() - start_time:.3f}s")
+    return response
+
+@app.route('/api/debug/stream', methods=['POST'])
+def debug_code_stream():
+    """Stream debug states as newline-delimited JSON while the program runs"""
+    request_id = os.urandom(4).hex()
+
+    data = request.get_json()
+    if not data:
+        return jsonify({
+            'success': False,
+            'error': 'No JSON data received',
+            'request_id': request_id
+        }), 400
+
+    language = data.get('language', 'python').lower()
+    if language != 'python':
+        return jsonify({
+            'success': False,
+            'error': f'Unsupported language: {language}',
+            'supported_languages': ['python'],
+            'request_id': request_id
+        }), 400
+
+    options, error = parse_debug_options(data)
+    if error:
+        return jsonify({
+            'success': False,
+            'error': error,
+            'request_id': request_id
+        }), 400
+
+    logging.info(f"[{request_id}] Starting streamed Python debug session")
+
+    def generate():
+        start = time.perf_counter()
+        in_flight.inc()
+        try:
+            for record in stream_debug_session(**options):
+                if record.get('type') == 'summary':
+                    record_run_metrics(record.get('metrics', {}))
+                    if 'truncated' in record:
+                        truncated_total.inc(record['truncated']['reason'])
+                    if data.get('recursionTree'):
+                        record['recursionTree'] = RecursionTree(record['callHierarchy']).view(
+                            depth=parse_tree_depth(data.get('recursionTreeDepth')))
+                yield json.dumps(record) + '\n'
+        except Exception as e:
+            errors_total.inc('stream')
+            logging.error(f"[{request_id}] Stream error: {str(e)}")
+            yield json.dumps({'type': 'error', 'error': f"Debugging failed: {str(e)}"}) + '\n'
+        finally:
+            in_flight.dec()
+            phase_seconds.observe(time.perf_counter() - start, 'stream')
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@app.route('/api/profile', methods=['POST'])
+def profile_code():
+    """Profile-only run: per-line hit counts and times as a heatmap, without recording any state
+
+    Takes the /api/debug options; no locals are captured, so a run may go
+    on for as many steps as a recording.
+    """
+    request_id = os.urandom(4).hex()
+    data = request.get_json(silent=True) or {}
+    options, error = parse_debug_options(data)
+    if not error:
+        try:
+            max_steps = lower_limit(MAX_RECORD_STEPS, data.get('maxSteps'), int)
+        except (ValueError, TypeError) as e:
+            error = f'Invalid execution budget: {e}'
+    if error:
+        return jsonify({'success': False, 'error': error, 'request_id': request_id}), 400
+
+    job = {
+        'code': options['code'],
+        'input_data': options['input_data'],
+        'tracer_backend': options['tracer_backend'],
+        'budget': dict(options['budget'], max_steps=max_steps)
+    }
+    logging.info(f"[{request_id}] Profiling Python run")
+    in_flight.inc()
+    try:
+        result = run_pool_job('profile', job)
+    except JobTimeoutError as e:
+        errors_total.inc('timeout')
+        return jsonify({'success': False, 'error': f"Profiling timed out: {str(e)}", 'request_id': request_id}), 504
+    finally:
+        in_flight.dec()
+    record_run_metrics(result.pop('metrics'))
+    if 'truncated' in result:
+        truncated_total.inc(result['truncated']['reason'])
+    if 'error' in result:
+        errors_total.inc('program')
+    logging.info(f"[{request_id}] Profiled {result['totalSteps']} steps")
+    return encode_response(dict(result, success=True))
+
+@app.route('/api/complexity', methods=['POST'])
+def measure_complexity():
+    """Static complexity estimate of a program, plus its growth measured over several input sizes
+
+    The program runs once per size, in parallel on the worker pool, with
+    the input template's {n} replaced by the size; each run counts its
+    steps and is then timed untraced (see measure_python). Growth curves
+    are fitted to the step counts and timings (see measured_complexity).
+    """
+    request_id = os.urandom(4).hex()
+    data = request.get_json(silent=True) or {}
+    code = data.get('code', '')
+    sizes = data.get('sizes') or list(DEFAULT_COMPLEXITY_SIZES)
+    template = data.get('inputTemplate', '{n}')
+    error = None
+    if not code.strip():
+        error = 'No code provided'
+    elif not isinstance(sizes, list) or not all(isinstance(size, int) and size > 0 for size in sizes):
+        error = 'sizes must be a list of positive integers'
+    elif len(sizes) > MAX_COMPLEXITY_SIZES:
+        error = f'At most {MAX_COMPLEXITY_SIZES} sizes per request, got {len(sizes)}'
+    elif not isinstance(template, str) or '{n}' not in template:
+        error = 'inputTemplate must be a string containing {n}'
+    if not error:
+        try:
+            budget = {
+                'max_steps': lower_limit(MAX_RECORD_STEPS, data.get('maxSteps'), int),
+                'max_seconds': lower_limit(MAX_SECONDS, data.get('maxSeconds'), float)
+            }
+        except (ValueError, TypeError) as e:
+            error = f'Invalid execution budget: {e}'
+    if error:
+        return jsonify({'success': False, 'error': error, 'request_id': request_id}), 400
+
+    sizes = sorted(set(sizes))
+    logging.info(f"[{request_id}] Measuring complexity at {len(sizes)} input sizes")
+
+    def run(size):
+        job = {
+            'code': code,
+            'input_data': template.replace('{n}', str(size)),
+            'tracer_backend': data.get('tracerBackend', 'settrace'),
+            'budget': budget
+        }
+        try:
+            result = run_pool_job('measure', job)
+        except JobTimeoutError as e:
+            errors_total.inc('timeout')
+            return {'size': size, 'error': {'type': 'Timeout', 'message': str(e)}}
+        except Exception as e:
+            errors_total.inc('failure')
+            logging.error(f"[{request_id}] Complexity run failed: {str(e)}")
+            return {'size': size, 'error': {'type': type(e).__name__, 'message': str(e)}}
+        record_run_metrics(result.pop('metrics'))
+        return dict(result, size=size)
+
+    in_flight.inc()
+    try:
+        with ThreadPoolExecutor(max_workers=pool_concurrency(len(sizes))) as executor:
+            runs = list(executor.map(run, sizes))
+    finally:
+        in_flight.dec()
+    return encode_response({
+        'success': True,
+        'static': analyze_complexity(code),
+        'measured': measured_complexity(runs)
+    })
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Queue a debug run and return its job id right away; 429 when the queue is full"""
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'success': False, 'error': 'No JSON data received'}), 400
+    language = data.get('language', 'python').lower()
+    if language != 'python':
+        return jsonify({
+            'success': False,
+            'error': f'Unsupported language: {language}',
+            'supported_languages': ['python']
+        }), 400
+    options, error = parse_debug_options(data)
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+
+    try:
+        job = job_manager.submit(dict(options, client_id=data.get('clientId')), data)
+    except QueueFullError as e:
+        errors_total.inc('queue_full')
+        response = jsonify({'success': False, 'error': str(e)})
+        response.status_code = 429
+        response.headers['Retry-After'] = '1'
+        return response
+    logging.info(f"[{job.id[:8]}] Queued debug job")
+    return jsonify(dict(job.to_dict(), success=True)), 202
+
+def get_job_or_404(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return None, (jsonify({
+            'success': False,
+            'error': 'Unknown or expired debug job'
+        }), 404)
+    return job, None
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job, error = get_job_or_404(job_id)
+    if error:
+        return error
+    return jsonify(dict(job.to_dict(), success=True))
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued or running job; the tracer stops at its next progress check"""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return get_job_or_404(job_id)[1]
+    return jsonify(dict(job.to_dict(), success=True))
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """The finished job's result, shaped like an /api/debug response; 409 until it is done"""
+    start_time = time.perf_counter()
+    job, error = get_job_or_404(job_id)
+    if error:
+        return error
+    if job.status != DONE:
+        return jsonify(dict(job.to_dict(), success=False, error=f'Job is {job.status}')), 409
+    if job.session_id:
+        session = session_store.get(job.session_id)
+        if session is None:
+            return jsonify({'success': False, 'error': 'Unknown or expired debug session'}), 404
+        return jsonify({'success': True, 'sessionId': job.session_id, 'expiresIn': session_store.ttl,
+                        'summary': session.summary()})
+    return debug_response(job.result, dict(job.metrics), job.request, start_time, job.id[:8])
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Newline-delimited JSON progress events until the job finishes"""
+    job, error = get_job_or_404(job_id)
+    if error:
+        return error
+
+    def generate():
+        last = None
+        while True:
+            finished = job.done.wait(JOB_EVENT_INTERVAL)
+            status = job.to_dict()
+            if finished or (status['status'], status['steps']) != last:
+                last = (status['status'], status['steps'])
+                yield json.dumps(dict(status, type='done' if finished else 'progress')) + '\n'
+            if finished:
+                return
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+def get_session_or_404(session_id):
+    session = session_store.get(session_id)
+    if session is None:
+        return None, (jsonify({
+            'success': False,
+            'error': 'Unknown or expired debug session'
+        }), 404)
+    return session, None
+
+@app.route('/api/sessions/<session_id>', methods=['GET'])
+def session_summary(session_id):
+    session, error = get_session_or_404(session_id)
+    if error:
+        return error
+    return jsonify({'success': True, 'summary': session.summary()})
+
+@app.route('/api/sessions/<session_id>', methods=['DELETE'])
+def delete_session(session_id):
+    return jsonify({'success': session_store.delete(session_id)})
+
+@app.route('/api/sessions/<session_id>/steps', methods=['GET'])
+def session_steps(session_id):
+    """A page of steps: ?start=0&count=100"""
+    session, error = get_session_or_404(session_id)
+    if error:
+        return error
+    start = max(0, request.args.get('start', 0, type=int))
+    count = request.args.get('count', 100, type=int)
+    return encode_response({
+        'success': True,
+        'start': start,
+        'totalSteps': len(session.states),
+        'steps': session.page(start, count)
+    })
+
+@app.route('/api/sessions/<session_id>/steps/<int:step>/variables', methods=['GET'])
+def session_variables(session_id, step):
+    session, error = get_session_or_404(session_id)
+    if error:
+        return error
+    if step >= len(session.states):
+        return jsonify({'success': False, 'error': f'Step {step} out of range'}), 404
+    return jsonify({'success': True, 'step': step, 'variables': session.variables(step)})
+
+@app.route('/api/sessions/<session_id>/recursion-tree', methods=['GET'])
+def session_recursion_tree(session_id):
+    """Aggregated recursion tree: ?depth= levels below the roots, or below ?node= to expand one node"""
+    session, error = get_session_or_404(session_id)
+    if error:
+        return error
+    tree = session.recursion_tree()
+    node_id = request.args.get('node', type=int)
+    if node_id is not None and not 0 <= node_id < len(tree.nodes):
+        return jsonify({'success': False, 'error': f'Unknown tree node {node_id}'}), 404
+    try:
+        depth = parse_tree_depth(request.args.get('depth'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid depth: {e}'}), 400
+    return encode_response(dict(tree.view(node_id, depth), success=True))
+
+def parse_tree_depth(value):
+    """Depth limit of a recursion tree view; missing or negative means unlimited"""
+    if value is None or value == '':
+        return None
+    depth = int(value)
+    return depth if depth >= 0 else None
+
+@app.route('/api/sessions/<session_id>/seek', methods=['GET'])
+def session_seek(session_id):
+    """Find the next step matching ?line=, ?function=, ?callId= and/or ?variable= (changed)
+
+    Searches forward from ?from= (exclusive), or backward with ?direction=backward.
+    """
+    session, error = get_session_or_404(session_id)
+    if error:
+        return error
+    backward = request.args.get('direction', 'forward') == 'backward'
+    step = session.seek(
+        start=request.args.get('from', len(session.states) if backward else -1, type=int),
+        backward=backward,
+        line=request.args.get('line', type=int),
+        function=request.args.get('function'),
+        call_id=request.args.get('callId'),
+        variable=request.args.get('variable')
+    )
+    return jsonify({'success': True, 'step': step})
+
+@app.route('/api/recordings', methods=['POST'])
+def create_recording():
+    """Record a run for time-travel: only its inputs and checkpoints are kept
+
+    Takes the /api/debug options plus checkpointInterval. Steps are then
+    fetched with /api/recordings/<id>/steps, which replays the program.
+    """
+    request_id = os.urandom(4).hex()
+    data = request.get_json(silent=True) or {}
+    options, error = parse_debug_options(data)
+    checkpoint_interval = data.get('checkpointInterval', DEFAULT_CHECKPOINT_INTERVAL)
+    if not error and (not isinstance(checkpoint_interval, int) or checkpoint_interval <= 0):
+        error = 'checkpointInterval must be a positive integer'
+    if not error:
+        try:
+            max_steps = lower_limit(MAX_RECORD_STEPS, data.get('maxSteps'), int)
+        except (ValueError, TypeError) as e:
+            error = f'Invalid execution budget: {e}'
+    if error:
+        return jsonify({'success': False, 'error': error, 'request_id': request_id}), 400
+
+    job = {
+        'code': options['code'],
+        'input_data': options['input_data'],
+        'tracer_backend': options['tracer_backend'],
+        'value_options': options['value_options'],
+        'checkpoint_interval': checkpoint_interval,
+        'budget': dict(options['budget'], max_steps=max_steps)
+    }
+    logging.info(f"[{request_id}] Recording Python run")
+    try:
+        recording = run_pool_job('record', job)
+    except JobTimeoutError as e:
+        errors_total.inc('timeout')
+        return jsonify({'success': False, 'error': f"Recording timed out: {str(e)}", 'request_id': request_id}), 504
+    record_run_metrics(recording.pop('metrics'))
+
+    recording_id, session = recording_store.create(dict(recording, job=job))
+    logging.info(f"[{request_id}] Recorded {recording['totalSteps']} steps")
+    return encode_response({
+        'success': True,
+        'recordingId': recording_id,
+        'expiresIn': recording_store.ttl,
+        'summary': session.summary()
+    })
+
+def get_recording_or_404(recording_id):
+    session = recording_store.get(recording_id)
+    if session is None:
+        return None, (jsonify({'success': False, 'error': 'Unknown or expired recording'}), 404)
+    return session, None
+
+@app.route('/api/recordings/<recording_id>', methods=['GET'])
+def recording_summary(recording_id):
+    session, error = get_recording_or_404(recording_id)
+    if error:
+        return error
+    return encode_response({'success': True, 'summary': session.summary()})
+
+@app.route('/api/recordings/<recording_id>', methods=['DELETE'])
+def delete_recording(recording_id):
+    return jsonify({'success': recording_store.delete(recording_id)})
+
+@app.route('/api/recordings/<recording_id>/steps', methods=['GET'])
+def recording_steps(recording_id):
+    """Steps ?start=0&count=100 of a recording, rebuilt by replaying the program up to them
+
+    The replay runs all steps before start again, so its cost grows with
+    start; replayedSteps in the response says how many steps were run.
+    """
+    session, error = get_recording_or_404(recording_id)
+    if error:
+        return error
+    start = max(0, request.args.get('start', 0, type=int))
+    count = request.args.get('count', 100, type=int)
+    total_steps = session.recording['totalSteps']
+    if start >= total_steps:
+        return jsonify({'success': False, 'error': f'Step {start} out of range'}), 404
+    if MAX_REPLAY_START is not None and start > MAX_REPLAY_START:
+        return jsonify({
+            'success': False,
+            'error': f'Replaying to step {start} would re-run {start} steps; pages start at step {MAX_REPLAY_START} at most'
+        }), 400
+
+    replay_start = time.perf_counter()
+    try:
+        replay = run_pool_job('replay', session.replay_job(start, count))
+    except JobTimeoutError as e:
+        errors_total.inc('timeout')
+        return jsonify({'success': False, 'error': f"Replay timed out: {str(e)}"}), 504
+    replay_seconds = time.perf_counter() - replay_start
+    phase_seconds.observe(replay_seconds, 'replay')
+    return encode_response(dict(replay, success=True, start=start, totalSteps=total_steps,
+                                replaySeconds=round(replay_seconds, 6)))
+
+def server_timing(run_metrics):
+    """Server-Timing header value, in milliseconds, from the metrics of a request"""
+    entries = []
+    for key, value in run_metrics.items():
+        if key.endswith('Seconds'):
+            entries.append(f"{key[:-len('Seconds')]};dur={value * 1000:.2f}")
+    return ', '.join(entries)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Count every API request and its latency; streams are timed to their first byte"""
+    if request.endpoint and request.endpoint != 'metrics_endpoint' and 'request_start' in g:
+        requests_total.inc(request.endpoint, str(response.status_code))
+        request_seconds.observe(time.perf_counter() - g.request_start, request.endpoint)
+        if response.status_code == 400:
+            errors_total.inc('bad_request')
+    return response
+
 @app.after_request
 def add_header(response):
     """Add response headers for better cache control"""
@@ -121,4 +1095,4 @@ if __name__ == '__main__':
     debug = os.getenv('FLASK_DEBUG', 'false').lower() == 'true'
     
     logging.info(f"Starting API on {host}:{port}")
-    app.run(host=host, port=port, debug=True)
\ No newline at end of file
+    app.run(host=host, port=port, debug=debug, threaded=True)
\ No newline at end of file
@@ -0,0 +1,273 @@
+"""Tracer overhead benchmarks
+
+Runs canonical workloads through every stage of a debug session and reports
+per-stage timings, steps/sec, slowdown against untraced execution, peak
+memory and response size. Results can be written as JSON and compared with
+a stored baseline; the exit code is 1 when a metric regressed by more than
+the threshold.
+
+    python benchmark.py                          # run and print
+    python benchmark.py --output results.json    # also write the results
+    python benchmark.py --save-baseline          # store as the new baseline
+    python benchmark.py --compare                # fail on regressions
+"""
+import io
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+from contextlib import redirect_stdout, redirect_stderr
+
+from python_debugger import (debug_python, create_tracer, execute_traced, assign_call_steps,
+                             DeltaDecodeStage, TraceFilterStage, SimplifyStage, DeltaEncodeStage,
+                             CallStepStage, DEFAULT_KEYFRAME_INTERVAL)
+
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+UNTRACED_MIN_REPEAT = 20
+
+WORKLOADS = {
+    'factorial': (
+        "def factorial(n):\n"
+        "    if n <= 1:\n"
+        "        return 1\n"
+        "    return n * factorial(n-1)\n"
+        "\n"
+        "for i in range(50):\n"
+        "    factorial(20)\n"
+    ),
+    'fib': (
+        "def fib(n):\n"
+        "    if n < 2:\n"
+        "        return n\n"
+        "    return fib(n-1) + fib(n-2)\n"
+        "\n"
+        "print(fib(16))\n"
+    ),
+    'primes_up_to': (
+        "def is_prime(n):\n"
+        "    if n <= 1:\n"
+        "        return False\n"
+        "    for i in range(2, int(n**0.5) + 1):\n"
+        "        if n % i == 0:\n"
+        "            return False\n"
+        "    return True\n"
+        "\n"
+        "def primes_up_to(limit):\n"
+        "    primes = []\n"
+        "    for num in range(2, limit + 1):\n"
+        "        if is_prime(num):\n"
+        "            primes.append(num)\n"
+        "    return primes\n"
+        "\n"
+        "print(len(primes_up_to(3000)))\n"
+    ),
+    'nested_loops': (
+        "total = 0\n"
+        "for i in range(60):\n"
+        "    for j in range(60):\n"
+        "        total += i * j\n"
+        "print(total)\n"
+    ),
+    'big_list_mutation': (
+        "def mutate():\n"
+        "    data = list(range(50000))\n"
+        "    for i in range(2000):\n"
+        "        data[i] = data[i] * 2\n"
+        "    return sum(data)\n"
+        "\n"
+        "print(mutate())\n"
+    ),
+    'deep_recursion': (
+        "def depth(n):\n"
+        "    if n == 0:\n"
+        "        return 0\n"
+        "    return depth(n - 1) + 1\n"
+        "\n"
+        "for i in range(5):\n"
+        "    depth(400)\n"
+    ),
+    'exceptions': (
+        "def parse(value):\n"
+        "    try:\n"
+        "        return int(value)\n"
+        "    except ValueError:\n"
+        "        return -1\n"
+        "\n"
+        "results = []\n"
+        "for i in range(3000):\n"
+        "    results.append(parse('x' if i % 2 else str(i)))\n"
+        "print(sum(results))\n"
+    )
+}
+
+# Compared metrics: (whether a larger value is an improvement, allowed relative regression).
+# Timings are noisy, sizes are deterministic
+COMPARED_METRICS = {
+    'slowdown': (False, 1.0),
+    'stepsPerSecond': (True, 0.5),
+    'peakMemoryKB': (False, 0.1),
+    'responseBytes': (False, 0.05)
+}
+
+def best_of(repeat, func):
+    """Run func repeat times and return (fastest seconds, last result)"""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def run_untraced(code):
+    code_obj = compile(code, '<benchmark>', 'exec')
+    with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+        exec(code_obj, {'__name__': '__benchmark__'})
+
+def run_trace(code, snapshot_mode):
+    tracer = create_tracer('settrace', snapshot_mode, DEFAULT_KEYFRAME_INTERVAL)
+    with redirect_stdout(io.StringIO()):
+        output, error = execute_traced(code, tracer)
+    return tracer, output, error
+
+def run_stages(stages, states):
+    """Push states through a chain of pipeline stages and flush them"""
+    for stage in stages:
+        pushed = [result for state in states for result in stage.push(state)]
+        states = pushed + stage.finish()
+    return states
+
+def benchmark_workload(code, snapshot_mode='full', repeat=3):
+    delta = snapshot_mode == 'delta'
+    compile_seconds, _ = best_of(repeat, lambda: compile(code, '<benchmark>', 'exec'))
+    # Untraced runs take milliseconds, so they need more samples to be stable
+    untraced_seconds, _ = best_of(max(repeat, UNTRACED_MIN_REPEAT), lambda: run_untraced(code))
+    trace_seconds, (tracer, output, error) = best_of(repeat, lambda: run_trace(code, snapshot_mode))
+
+    raw_states = tracer.debug_states
+    if raw_states:
+        raw_states[-1]['output'] = output
+
+    def filter_states():
+        stages = [DeltaDecodeStage()] if delta else []
+        return run_stages(stages + [TraceFilterStage()], raw_states)
+    filter_seconds, filtered = best_of(repeat, filter_states)
+
+    def simplify_states():
+        call_steps = CallStepStage()
+        stages = [SimplifyStage()] + ([DeltaEncodeStage()] if delta else []) + [call_steps]
+        return run_stages(stages, filtered), call_steps
+    simplify_seconds, (simplified, call_steps) = best_of(repeat, simplify_states)
+
+    result = {
+        'debugStates': simplified,
+        'callHierarchy': assign_call_steps(tracer.call_history, call_steps.entry_steps, call_steps.return_steps),
+        'frames': tracer.frames,
+        'snapshotMode': snapshot_mode,
+        'tracerBackend': 'settrace'
+    }
+    serialize_seconds, body = best_of(repeat, lambda: json.dumps({'success': True, 'debugStates': result}))
+
+    # End to end, and peak memory in a separate run since tracemalloc slows everything down
+    quiet = io.StringIO()
+    with redirect_stdout(quiet):
+        total_seconds, _ = best_of(repeat, lambda: debug_python(code, snapshot_mode=snapshot_mode))
+        tracemalloc.start()
+        debug_python(code, snapshot_mode=snapshot_mode)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        'rawSteps': len(raw_states),
+        'states': len(simplified),
+        'compileSeconds': round(compile_seconds, 6),
+        'untracedSeconds': round(untraced_seconds, 6),
+        'traceSeconds': round(trace_seconds, 6),
+        'filterSeconds': round(filter_seconds, 6),
+        'simplifySeconds': round(simplify_seconds, 6),
+        'serializeSeconds': round(serialize_seconds, 6),
+        'totalSeconds': round(total_seconds, 6),
+        'stepsPerSecond': round(len(raw_states) / trace_seconds, 1) if trace_seconds else None,
+        'slowdown': round(trace_seconds / untraced_seconds, 1) if untraced_seconds else None,
+        'peakMemoryKB': peak // 1024,
+        'responseBytes': len(body)
+    }
+
+def run_benchmarks(names, snapshot_mode='full', repeat=3):
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'snapshotMode': snapshot_mode,
+        'workloads': {}
+    }
+    for name in names:
+        results['workloads'][name] = benchmark_workload(WORKLOADS[name], snapshot_mode, repeat)
+        print_workload(name, results['workloads'][name])
+    return results
+
+def print_workload(name, metrics):
+    print(f"{name:<18} steps {metrics['rawSteps']:>7}  trace {metrics['traceSeconds']:>8.3f}s  "
+          f"filter {metrics['filterSeconds']:>7.3f}s  simplify {metrics['simplifySeconds']:>7.3f}s  "
+          f"json {metrics['serializeSeconds']:>7.3f}s  {metrics['stepsPerSecond'] or 0:>10.0f} steps/s  "
+          f"x{metrics['slowdown'] or 0:<7} {metrics['peakMemoryKB']:>7} KB  {metrics['responseBytes']:>9} B")
+
+def compare_results(results, baseline, threshold=None):
+    """Return a description of every metric that regressed by more than its threshold
+
+    threshold overrides the per-metric thresholds of COMPARED_METRICS.
+    """
+    regressions = []
+    for name, metrics in results['workloads'].items():
+        base = baseline.get('workloads', {}).get(name)
+        if base is None:
+            continue
+        for metric, (higher_is_better, allowed) in COMPARED_METRICS.items():
+            old, new = base.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > (allowed if threshold is None else threshold):
+                regressions.append(f"{name}.{metric}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark tracer overhead on canonical workloads')
+    parser.add_argument('workloads', nargs='*', help=f"workloads to run (default: all of {', '.join(WORKLOADS)})")
+    parser.add_argument('--snapshot-mode', choices=['full', 'delta'], default='full')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per stage, the fastest is kept')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline results file')
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the baseline')
+    parser.add_argument('--compare', action='store_true', help='compare with the baseline and fail on regressions')
+    parser.add_argument('--threshold', type=float,
+                        help='allowed relative regression for every metric (default: per metric)')
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.workloads if name not in WORKLOADS]
+    if unknown:
+        parser.error(f"unknown workloads: {', '.join(unknown)}")
+
+    results = run_benchmarks(args.workloads or list(WORKLOADS), args.snapshot_mode, max(1, args.repeat))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
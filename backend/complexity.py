@@ -0,0 +1,563 @@
+import ast
+import copy
+import math
+from functools import lru_cache
+
+# Programs whose analysis is kept, keyed by source
+COMPLEXITY_CACHE_SIZE = 256
+
+# Input sizes an empirical measurement runs the program at unless asked otherwise
+DEFAULT_COMPLEXITY_SIZES = (8, 16, 32, 64, 128)
+
+# Growth rates are (factorial, exponential base, power of n, power of log n),
+# ordered so that max() picks the fastest growing one
+ONE = (0, 0, 0, 0)
+LOG = (0, 0, 0, 1)
+SQRT = (0, 0, 0.5, 0)
+LINEAR = (0, 0, 1, 0)
+FACTORIAL = (1, 0, 0, 0)
+
+# Calls whose cost grows with the size of their single argument
+LINEAR_BUILTINS = {'sum', 'min', 'max', 'any', 'all', 'list', 'set', 'tuple', 'dict', 'frozenset', 'reversed'}
+SORTING_BUILTINS = {'sorted'}
+LINEAR_METHODS = {'count', 'index', 'copy', 'insert', 'remove', 'join', 'extend', 'reverse'}
+SORTING_METHODS = {'sort'}
+# Methods that grow a container by one item, or by a whole iterable
+GROWING_METHODS = {'append', 'appendleft', 'add', 'push'}
+EXTENDING_METHODS = {'extend', 'update'}
+MEMO_DECORATORS = {'cache', 'lru_cache'}
+
+MANY = float('inf')  # Fan-out of a recursive call made inside a loop of unknown length
+
+def repeated(calls, times):
+    """Recursive calls made by a body run times times; no calls stay none, even for MANY runs"""
+    return calls * times if calls else 0
+
+def multiply(a, b):
+    base = a[1] * b[1] if a[1] and b[1] else max(a[1], b[1])
+    return (max(a[0], b[0]), base, a[2] + b[2], a[3] + b[3])
+
+def format_growth(growth):
+    """A growth rate in big-O notation, e.g. 'O(n log n)'"""
+    factorial, base, power, logs = growth
+    if factorial:
+        return 'O(n!)'
+    if base:
+        return f'O({format_number(base)}^n)'
+    parts = []
+    if power:
+        parts.append({0.5: '√n', 1: 'n', 2: 'n²', 3: 'n³'}.get(power, f'n^{format_number(power)}'))
+    if logs:
+        parts.append('log n' if logs == 1 else f'log^{format_number(logs)} n')
+    return f"O({' '.join(parts) or '1'})"
+
+def format_number(number):
+    return str(int(number)) if float(number).is_integer() else str(round(number, 2))
+
+def is_constant(node):
+    """Whether an expression only involves literals, so it does not grow with the input"""
+    return all(not isinstance(child, (ast.Name, ast.Attribute, ast.Call, ast.Subscript))
+               for child in ast.walk(node))
+
+def literal_length(node):
+    """The number of items of a literal collection or range() of literals, or None"""
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        return len(node.elts)
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'range'
+            and node.args and all(is_constant(arg) for arg in node.args)):
+        try:
+            return len(range(*[ast.literal_eval(arg) for arg in node.args]))
+        except (ValueError, TypeError, SyntaxError):
+            return None
+    return None
+
+def is_square_root(node):
+    """n ** 0.5, sqrt(n) or isqrt(n), as in range(2, int(n ** 0.5) + 1)"""
+    for child in ast.walk(node):
+        if (isinstance(child, ast.BinOp) and isinstance(child.op, ast.Pow)
+                and isinstance(child.right, ast.Constant) and child.right.value == 0.5):
+            return True
+        if isinstance(child, ast.Call):
+            name = child.func.attr if isinstance(child.func, ast.Attribute) else getattr(child.func, 'id', None)
+            if name in ('sqrt', 'isqrt'):
+                return True
+    return False
+
+def halving_names(function):
+    """Names assigned by halving or doubling, and the names assigned from those, in one function body
+
+    They are what binary searches and divide-and-conquer recursions narrow
+    their range with: mid = (lo + hi) // 2, then lo = mid + 1.
+    """
+    names = set()
+    assignments = []
+    for node in ast.walk(function):
+        if isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name):
+            if isinstance(node.op, (ast.FloorDiv, ast.Div, ast.RShift, ast.Mult, ast.LShift)):
+                names.add(node.target.id)
+        elif isinstance(node, ast.Assign):
+            targets = [target.id for target in node.targets if isinstance(target, ast.Name)]
+            if any(isinstance(child, ast.BinOp) and isinstance(child.op, (ast.FloorDiv, ast.Div, ast.RShift))
+                   for child in ast.walk(node.value)):
+                names.update(targets)
+            else:
+                assignments.append((targets, {child.id for child in ast.walk(node.value)
+                                              if isinstance(child, ast.Name)}))
+    # One pass is enough for lo = mid + 1; chains of copies are not followed
+    for targets, sources in assignments:
+        if sources & names:
+            names.update(targets)
+    return names
+
+def is_memoized(function):
+    """Whether a function caches its results, by decorator or with a 'key in memo' check"""
+    for decorator in function.decorator_list:
+        target = decorator.func if isinstance(decorator, ast.Call) else decorator
+        name = target.attr if isinstance(target, ast.Attribute) else getattr(target, 'id', None)
+        if name in MEMO_DECORATORS:
+            return True
+    checked = {node.comparators[0].id for node in ast.walk(function)
+               if isinstance(node, ast.Compare) and isinstance(node.ops[0], (ast.In, ast.NotIn))
+               and isinstance(node.comparators[0], ast.Name)}
+    return any(isinstance(node, ast.Subscript) and isinstance(node.ctx, ast.Store)
+               and isinstance(node.value, ast.Name) and node.value.id in checked
+               for node in ast.walk(function))
+
+class CostWalker:
+    """Walks one function body, or the module's, adding up its cost
+
+    Statements run one after another cost as much as the most expensive
+    one, a loop multiplies the cost of its body by its bound, and a call
+    to another function of the program costs what that function costs.
+    Recursive calls are counted rather than costed: calls is the largest
+    number of them one run of the body can make, MANY when one sits in a
+    loop whose length is not a literal.
+    """
+
+    def __init__(self, analyzer, function=None):
+        self.analyzer = analyzer
+        self.function = function
+        self.halving = halving_names(function) if function is not None else set()
+        self.space = ONE          # Growth of what the body allocates
+        self.shrinks = set()      # How recursive calls shrink their arguments
+        self.loops = []           # loop_details entries
+        self.depth = 0            # Loops around the current statement
+        self.growing_depth = 0    # Of which not bounded by a constant
+        self.loop_depth = 0       # Deepest growing_depth reached
+
+    def block(self, statements, context):
+        """(cost, recursive calls) of statements running in loops of total bound context"""
+        cost, calls = ONE, 0
+        for statement in statements:
+            statement_cost, statement_calls = self.statement(statement, context)
+            cost = max(cost, statement_cost)
+            calls += statement_calls
+        return cost, calls
+
+    def statement(self, node, context):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            # Defining is cheap; functions are costed where they are called
+            return ONE, 0
+        if isinstance(node, (ast.For, ast.AsyncFor)):
+            bound = self.for_bound(node.iter)
+            iter_cost, iter_calls = self.expression(node.iter, context)
+            cost, calls = self.loop(node, 'for', bound, node.body + node.orelse, context, literal_length(node.iter))
+            return max(iter_cost, cost), iter_calls + calls
+        if isinstance(node, ast.While):
+            test_cost, test_calls = self.expression(node.test, context)
+            cost, calls = self.loop(node, 'while', self.while_bound(node), node.body + node.orelse, context, None)
+            return max(test_cost, cost), repeated(test_calls, MANY) + calls
+        if isinstance(node, ast.If):
+            test_cost, test_calls = self.expression(node.test, context)
+            body_cost, body_calls = self.block(node.body, context)
+            else_cost, else_calls = self.block(node.orelse, context)
+            return max(test_cost, body_cost, else_cost), test_calls + max(body_calls, else_calls)
+        if hasattr(ast, 'Match') and isinstance(node, ast.Match):
+            subject_cost, subject_calls = self.expression(node.subject, context)
+            cases = [self.block(case.body, context) for case in node.cases] or [(ONE, 0)]
+            return max([subject_cost] + [cost for cost, _ in cases]), subject_calls + max(calls for _, calls in cases)
+
+        return self.children(node, context)
+
+    def children(self, node, context):
+        """Cost of any other statement: its expressions, then the blocks it contains, in order"""
+        cost, calls = ONE, 0
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.expr):
+                child_cost, child_calls = self.expression(child, context)
+            elif isinstance(child, ast.stmt):
+                child_cost, child_calls = self.statement(child, context)
+            elif isinstance(child, (ast.excepthandler, ast.withitem)):
+                child_cost, child_calls = self.children(child, context)
+            else:
+                continue
+            cost = max(cost, child_cost)
+            calls += child_calls
+        return cost, calls
+
+    def loop(self, node, kind, bound, body, context, length):
+        self.depth += 1
+        growing = bound != ONE
+        self.growing_depth += growing
+        self.loop_depth = max(self.loop_depth, self.growing_depth)
+        self.loops.append({
+            'type': kind,
+            'line': self.analyzer.source_line(node.lineno),
+            'lineNumber': node.lineno,
+            'nesting_level': self.depth,
+            'bound': format_growth(bound)[2:-1] if growing else 'constant',
+            'function': self.function.name if self.function is not None else None
+        })
+        body_cost, body_calls = self.block(body, multiply(context, bound))
+        self.depth -= 1
+        self.growing_depth -= growing
+        return multiply(bound, body_cost), repeated(body_calls, MANY if length is None else length)
+
+    def for_bound(self, iterable):
+        if literal_length(iterable) is not None or isinstance(iterable, ast.Constant):
+            return ONE
+        if isinstance(iterable, ast.Call) and getattr(iterable.func, 'id', None) == 'range' and is_square_root(iterable):
+            return SQRT
+        return LINEAR
+
+    def while_bound(self, node):
+        """log n for a loop whose body halves its condition's variables, √n for i * i <= n, else n"""
+        tested = {child.id for child in ast.walk(node.test) if isinstance(child, ast.Name)}
+        if isinstance(node.test, ast.Constant):
+            return LINEAR
+        if tested & halving_names(ast.Module(body=node.body, type_ignores=[])):
+            return LOG
+        for child in ast.walk(node.test):
+            if (isinstance(child, ast.BinOp) and isinstance(child.op, ast.Mult)
+                    and ast.dump(child.left) == ast.dump(child.right)) or is_square_root(child):
+                return SQRT
+        return LINEAR
+
+    def expression(self, node, context):
+        """(cost, recursive calls) of evaluating an expression"""
+        if isinstance(node, ast.Lambda):
+            return ONE, 0
+        if isinstance(node, (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)):
+            return self.comprehension(node, context)
+        if isinstance(node, ast.IfExp):
+            test_cost, test_calls = self.expression(node.test, context)
+            body_cost, body_calls = self.expression(node.body, context)
+            else_cost, else_calls = self.expression(node.orelse, context)
+            return max(test_cost, body_cost, else_cost), test_calls + max(body_calls, else_calls)
+
+        cost, calls = ONE, 0
+        if isinstance(node, ast.Call):
+            cost, calls = self.call(node, context)
+        elif (isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mult)
+              and any(isinstance(side, ast.List) for side in (node.left, node.right))
+              and not (is_constant(node.left) and is_constant(node.right))):
+            # [0] * n
+            cost = LINEAR
+            self.space = max(self.space, LINEAR)
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.keyword):
+                child = child.value
+            if isinstance(child, ast.expr):
+                child_cost, child_calls = self.expression(child, context)
+                cost = max(cost, child_cost)
+                calls += child_calls
+        return cost, calls
+
+    def comprehension(self, node, context):
+        bound, count, cost, calls = ONE, 1, ONE, 0
+        for generator in node.generators:
+            iter_cost, iter_calls = self.expression(generator.iter, multiply(context, bound))
+            cost = max(cost, multiply(bound, iter_cost))
+            calls += repeated(iter_calls, count)
+            length = literal_length(generator.iter)
+            count = MANY if length is None or count == MANY else count * length
+            bound = multiply(bound, self.for_bound(generator.iter))
+            for condition in generator.ifs:
+                condition_cost, condition_calls = self.expression(condition, multiply(context, bound))
+                cost = max(cost, multiply(bound, condition_cost))
+                calls += repeated(condition_calls, count)
+        elements = [node.key, node.value] if isinstance(node, ast.DictComp) else [node.elt]
+        for element in elements:
+            element_cost, element_calls = self.expression(element, multiply(context, bound))
+            cost = max(cost, multiply(bound, element_cost))
+            calls += repeated(element_calls, count)
+        if not isinstance(node, ast.GeneratorExp):
+            self.space = max(self.space, bound)
+        return cost, calls
+
+    def call(self, node, context):
+        """Cost of the call itself, without its arguments"""
+        func = node.func
+        if isinstance(func, ast.Name):
+            name = func.id
+            if self.function is not None and name == self.function.name:
+                self.recursive_call(node)
+                return ONE, 1
+            callee = self.analyzer.functions.get(name)
+            if callee is not None:
+                return self.analyzer.function_cost(callee)['growth'], 0
+            single = len(node.args) == 1 and not is_constant(node.args[0])
+            if name in SORTING_BUILTINS:
+                self.space = max(self.space, LINEAR)
+                return multiply(LINEAR, LOG), 0
+            if name in LINEAR_BUILTINS and single:
+                if name in ('list', 'set', 'tuple', 'dict', 'frozenset'):
+                    self.space = max(self.space, LINEAR)
+                return LINEAR, 0
+            return ONE, 0
+        if isinstance(func, ast.Attribute):
+            name = func.attr
+            # self.method() of the same class
+            if isinstance(func.value, ast.Name) and func.value.id in ('self', 'cls'):
+                if self.function is not None and name == self.function.name:
+                    self.recursive_call(node)
+                    return ONE, 1
+                callee = self.analyzer.functions.get(name)
+                if callee is not None:
+                    return self.analyzer.function_cost(callee)['growth'], 0
+            if name in GROWING_METHODS:
+                self.space = max(self.space, context)
+                return ONE, 0
+            if name in EXTENDING_METHODS:
+                self.space = max(self.space, multiply(context, LINEAR))
+            if name in SORTING_METHODS:
+                return multiply(LINEAR, LOG), 0
+            if name in LINEAR_METHODS:
+                return LINEAR, 0
+        return ONE, 0
+
+    def recursive_call(self, node):
+        """Note how a recursive call shrinks its input: by halving, by a step, or to a part of a structure"""
+        arguments = node.args + [keyword.value for keyword in node.keywords]
+        for argument in arguments:
+            for child in ast.walk(argument):
+                if (isinstance(child, ast.BinOp) and isinstance(child.op, (ast.FloorDiv, ast.Div, ast.RShift))) or (
+                        isinstance(child, ast.Name) and child.id in self.halving):
+                    self.shrinks.add('divide')
+                    return
+        for argument in arguments:
+            for child in ast.walk(argument):
+                if (isinstance(child, ast.BinOp) and isinstance(child.op, (ast.Add, ast.Sub))) or (
+                        isinstance(child, ast.Slice)):
+                    self.shrinks.add('decrement')
+                    return
+        self.shrinks.add('structure')
+
+class ComplexityAnalyzer:
+    """Static time and space estimate of a program, per function and overall
+
+    Costs are in terms of a single input size n. Loops over a range() of
+    literals or a literal collection are constant, a while loop whose
+    condition variables are halved or doubled in its body is log n, and
+    loops up to a square root are √n; every other loop is n. Recursion is
+    solved from the number of recursive calls one call makes (its fan-out)
+    and how they shrink the input: a step down with fan-out a is a^n,
+    halving goes by the master theorem, and recursing into parts of a
+    structure, or with memoization, visits each part once. These are
+    worst-case guesses from the shape of the code, not measurements.
+    """
+
+    def __init__(self, code):
+        self.tree = ast.parse(code)
+        self.lines = code.splitlines()
+        self.functions = {}
+        for node in ast.walk(self.tree):
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                self.functions.setdefault(node.name, node)
+        self.costs = {}          # function name -> cost entry
+        self.in_progress = set()
+        self.mutual = set()      # Functions found calling back into a caller
+
+    def source_line(self, line_no):
+        return self.lines[line_no - 1] if 0 < line_no <= len(self.lines) else ''
+
+    def function_cost(self, function):
+        """{'growth', 'space', 'walker', ...} of a function, computed once"""
+        name = function.name
+        if name in self.costs:
+            return self.costs[name]
+        if name in self.in_progress:
+            # Mutual recursion: the cycle is reported, not solved
+            self.mutual.add(name)
+            return {'growth': ONE, 'space': ONE}
+        self.in_progress.add(name)
+        walker = CostWalker(self, function)
+        body, calls = walker.block(function.body, ONE)
+        self.in_progress.discard(name)
+        if math.isnan(calls):
+            # inf * 0 somewhere; a NaN fan-out would also make the result invalid JSON
+            raise ValueError(f'recursive call count of {name} is not a number')
+
+        entry = {'growth': body, 'space': walker.space, 'walker': walker, 'calls': calls,
+                 'memoized': False, 'shrink': None}
+        if calls:
+            memoized = is_memoized(function)
+            shrink = ('divide' if 'divide' in walker.shrinks else
+                      'decrement' if 'decrement' in walker.shrinks else 'structure')
+            entry.update(memoized=memoized, shrink=shrink)
+            if memoized or shrink == 'structure':
+                entry['growth'] = multiply(LINEAR, body)
+            elif shrink == 'decrement':
+                entry['growth'] = (FACTORIAL if calls == MANY else
+                                   multiply(LINEAR, body) if calls == 1 else (0, calls, 0, 0))
+            else:
+                entry['growth'] = self.divide_and_conquer(calls, body)
+            depth = LOG if shrink == 'divide' and not memoized else LINEAR
+            entry['space'] = max(walker.space, depth)
+        self.costs[name] = entry
+        return entry
+
+    def divide_and_conquer(self, calls, body):
+        """T(n) = calls * T(n / 2) + body, by the master theorem"""
+        if calls == MANY:
+            return multiply(LINEAR, body)
+        if body[0] or body[1]:
+            return body
+        critical = math.log2(calls)
+        if critical < body[2]:
+            return body
+        if critical == body[2]:
+            return multiply(body, LOG)
+        return (0, 0, round(critical, 2), 0)
+
+    def analyze(self):
+        walker = CostWalker(self)
+        module_cost, _ = walker.block(self.tree.body, ONE)
+        time, space = module_cost, walker.space
+        loops = list(walker.loops)
+        functions = []
+        for name, function in self.functions.items():
+            entry = self.function_cost(function)
+            time = max(time, entry['growth'])
+            space = max(space, entry['space'])
+            loops.extend(entry['walker'].loops if 'walker' in entry else ())
+        for name, function in self.functions.items():
+            entry = self.costs[name]
+            info = {
+                'name': name,
+                'line': function.lineno,
+                'time': format_growth(entry['growth']),
+                'space': format_growth(entry['space']),
+                'loopDepth': entry['walker'].loop_depth,
+                'recursive': bool(entry['calls']) or name in self.mutual
+            }
+            if entry['calls']:
+                info['fanOut'] = 'n' if entry['calls'] == MANY else entry['calls']
+                info['shrink'] = entry['shrink']
+                info['memoized'] = entry['memoized']
+            functions.append(info)
+        loops.sort(key=lambda loop: loop['lineNumber'])
+        return {
+            'time': format_growth(time),
+            'space': format_growth(space),
+            'has_recursion': any(function['recursive'] for function in functions),
+            'has_loops': bool(loops),
+            'loop_details': loops,
+            'functions': functions
+        }
+
+@lru_cache(maxsize=COMPLEXITY_CACHE_SIZE)
+def cached_analysis(code):
+    try:
+        return ComplexityAnalyzer(code).analyze()
+    except (SyntaxError, ValueError, RecursionError):
+        # A program that does not parse fails when it runs; nothing to estimate, nor for a miscounted one
+        return {'time': 'O(1)', 'space': 'O(1)', 'has_recursion': False, 'has_loops': False,
+                'loop_details': [], 'functions': []}
+
+def analyze_complexity(code):
+    """Estimate the time and space complexity of code from its syntax tree; see ComplexityAnalyzer
+
+    Analyses are cached by source, so re-running a program does not parse it again.
+    """
+    return copy.deepcopy(cached_analysis(code))
+
+# Growth curves an empirical measurement is fitted against, simplest first;
+# exponential growth is fitted last, with its base estimated from the data
+GROWTH_MODELS = (
+    ('O(1)', lambda n: 1.0),
+    ('O(log n)', lambda n: math.log2(n)),
+    ('O(√n)', math.sqrt),
+    ('O(n)', float),
+    ('O(n log n)', lambda n: n * math.log2(n)),
+    ('O(n²)', lambda n: float(n) ** 2),
+    ('O(n³)', lambda n: float(n) ** 3)
+)
+
+# A simpler model is preferred unless a faster growing one fits this much better
+FIT_TOLERANCE = 1.25
+MIN_FIT_POINTS = 3
+
+def fit_growth(sizes, values):
+    """The growth model best explaining values measured at sizes, or None with too few points
+
+    Each polynomial model f is fitted as a + b * f(n) by least squares, and
+    c^n by a line through log(value); they are scored by the root mean
+    square of their relative errors. Also gives the slope of log(value)
+    against log(n), the apparent polynomial degree.
+    """
+    points = sorted((size, value) for size, value in zip(sizes, values) if value is not None and size > 1)
+    if len({size for size, _ in points}) < MIN_FIT_POINTS:
+        return None
+    sizes, values = [size for size, _ in points], [value for _, value in points]
+    fits = []
+    for label, model in GROWTH_MODELS:
+        xs = [model(size) for size in sizes]
+        slope, intercept = least_squares(xs, values)
+        if label == 'O(1)':
+            fits.append((label, relative_error([intercept] * len(values), values), intercept))
+        elif slope > 0:
+            fits.append((label, relative_error([intercept + slope * x for x in xs], values), slope))
+    if all(value > 0 for value in values):
+        slope, intercept = least_squares(sizes, [math.log(value) for value in values])
+        try:
+            predicted = [math.exp(intercept + slope * size) for size in sizes]
+        except OverflowError:
+            predicted = None
+        if predicted is not None and slope > 0:
+            fits.append((f'O({format_number(math.exp(slope))}^n)', relative_error(predicted, values),
+                         math.exp(intercept)))
+    best = min(error for _, error, _ in fits)
+    label, error, coefficient = next(fit for fit in fits if fit[1] <= best * FIT_TOLERANCE + 1e-9)
+    (first_size, first), (last_size, last) = points[0], points[-1]
+    exponent = math.log(last / first) / math.log(last_size / first_size) if first > 0 and last > 0 else None
+    return {
+        'complexity': label,
+        'error': round(error, 4),
+        'coefficient': coefficient,
+        'exponent': round(exponent, 2) if exponent is not None else None
+    }
+
+def relative_error(predicted, values):
+    return math.sqrt(sum(((guess - value) / value) ** 2 if value else guess ** 2
+                         for guess, value in zip(predicted, values)) / len(values))
+
+def least_squares(xs, ys):
+    """(slope, intercept) of the line through (xs, ys); slope 0 when xs are all equal"""
+    count = len(xs)
+    mean_x, mean_y = sum(xs) / count, sum(ys) / count
+    spread = sum((x - mean_x) ** 2 for x in xs)
+    if not spread:
+        return 0.0, mean_y
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / spread
+    return slope, mean_y - slope * mean_x
+
+def measured_complexity(runs):
+    """Growth fitted to measure_python results, one per input size
+
+    runs are {'size', 'steps', 'seconds'} entries; sizes that errored or were
+    cut short have no seconds and are left out of the time fit. Step counts
+    do not depend on machine load, so they decide the reported complexity
+    when there are enough of them.
+    """
+    sizes = [run['size'] for run in runs]
+    steps = fit_growth(sizes, [None if run.get('truncated') or run.get('error') else run.get('steps')
+                               for run in runs])
+    timing = fit_growth(sizes, [run.get('seconds') for run in runs])
+    best = steps or timing
+    return {
+        'time': best['complexity'] if best else None,
+        'stepGrowth': steps,
+        'timeGrowth': timing,
+        'runs': runs
+    }
@@ -0,0 +1,347 @@
+import time
+import uuid
+import bisect
+import threading
+import ast
+from itertools import islice
+from collections import OrderedDict
+from python_debugger import (VariableDeltaDecoder, apply_variable_delta, top_level_statements, record_call_step,
+                             assign_call_steps)
+from result_cache import is_deterministic
+from trace_store import TraceStore
+from recursion_tree import RecursionTree
+
+DEFAULT_SESSION_TTL = 600
+DEFAULT_MAX_SESSIONS = 100
+DEFAULT_MAX_PREVIOUS_RUNS = 20
+MAX_PAGE_SIZE = 500
+
+class DebugSession:
+    """A finished debug result kept server-side and indexed for paging and seeking
+
+    Steps are kept in a columnar TraceStore and indexed by line, function,
+    call and changed variable, each as a sorted list of step numbers, so
+    seeking is a bisect instead of a scan.
+    """
+
+    def __init__(self, result):
+        self.result = {key: value for key, value in result.items() if key != 'debugStates'}
+        self.states = TraceStore.from_states(result['debugStates'])
+        self.delta = result.get('snapshotMode') == 'delta'
+
+        self.line_steps = {}
+        self.function_steps = {}
+        self.call_steps = {}
+        self.variable_steps = {}  # name -> steps where that variable changed in its call
+        self.error_steps = []
+        self.build_indexes()
+        self.tree = None
+
+    def build_indexes(self):
+        decoder = VariableDeltaDecoder()
+        previous = {}  # call_id -> variables of the previous step of that call
+        for index, state in enumerate(self.states):
+            call_id = state.get('callId')
+            self.line_steps.setdefault(state.get('line'), []).append(index)
+            self.function_steps.setdefault(state.get('function'), []).append(index)
+            self.call_steps.setdefault(call_id, []).append(index)
+            if state.get('error'):
+                self.error_steps.append(index)
+
+            if state.get('eventType', 'step') != 'step':
+                continue
+            variables = decoder.decode(state)['variables'] if self.delta else state['variables']
+            before = previous.get(call_id, {})
+            for name, value in variables.items():
+                if name not in before or before[name] != value:
+                    self.variable_steps.setdefault(name, []).append(index)
+            previous[call_id] = variables
+
+    def summary(self):
+        last = self.states[-1] if self.states else {}
+        summary = {
+            'totalSteps': len(self.states),
+            'snapshotMode': self.result.get('snapshotMode', 'full'),
+            'tracerBackend': self.result.get('tracerBackend'),
+            'functions': sorted(name for name in self.function_steps if name),
+            'errorSteps': self.error_steps[:1],
+            'output': last.get('output', ''),
+            'callHierarchy': self.result.get('callHierarchy', []),
+            'frames': self.result.get('frames', {})
+        }
+        if 'truncated' in self.result:
+            summary['truncated'] = self.result['truncated']
+        if 'profile' in self.result:
+            summary['profile'] = self.result['profile']
+        if 'heap' in self.result:
+            summary['heap'] = self.result['heap']
+        return summary
+
+    def recursion_tree(self):
+        """The aggregated RecursionTree of the call hierarchy, built on first use"""
+        if self.tree is None:
+            self.tree = RecursionTree(self.result.get('callHierarchy', []))
+        return self.tree
+
+    def page(self, start, count):
+        """Steps [start, start + count), with full variables even in delta mode"""
+        count = max(0, min(count, MAX_PAGE_SIZE))
+        states = self.states[start:start + count]
+        if not self.delta:
+            return states
+
+        frame_variables = {}
+        page = []
+        for index, state in enumerate(states, start):
+            if state.get('eventType', 'step') == 'step':
+                call_id = state.get('callId')
+                if call_id in frame_variables:
+                    variables = apply_variable_delta(frame_variables[call_id], state)
+                else:
+                    variables = self.variables(index)
+                frame_variables[call_id] = variables
+                state = {key: value for key, value in state.items() if key not in ('keyframe', 'removedVariables')}
+                state['variables'] = variables
+            page.append(state)
+        return page
+
+    def variables(self, index):
+        """Full variables of one step, walking back only through steps of the same call"""
+        state = self.states[index]
+        if not self.delta or state.get('eventType', 'step') != 'step':
+            return dict(state['variables'])
+
+        steps = self.call_steps[state.get('callId')]
+        position = bisect.bisect_right(steps, index) - 1
+        chain = []
+        for step in reversed(steps[:position + 1]):
+            candidate = self.states[step]
+            if candidate.get('eventType', 'step') != 'step':
+                continue
+            chain.append(candidate)
+            if candidate.get('keyframe', True):
+                break
+
+        variables = {}
+        for candidate in reversed(chain):
+            variables = apply_variable_delta(variables, candidate)
+        return variables
+
+    def seek(self, start=-1, backward=False, line=None, function=None, call_id=None, variable=None):
+        """First step after start (or last step before it) matching every given criterion, or None"""
+        criteria = []
+        if line is not None:
+            criteria.append(self.line_steps.get(line, []))
+        if function is not None:
+            criteria.append(self.function_steps.get(function, []))
+        if call_id is not None:
+            criteria.append(self.call_steps.get(call_id, []))
+        if variable is not None:
+            criteria.append(self.variable_steps.get(variable, []))
+        if not criteria:
+            return None
+
+        # Walk the shortest list and check the others by bisect
+        criteria.sort(key=len)
+        candidates, others = criteria[0], criteria[1:]
+        if backward:
+            position = bisect.bisect_left(candidates, start) - 1
+            steps = (candidates[i] for i in range(position, -1, -1))
+        else:
+            position = bisect.bisect_right(candidates, start)
+            steps = (candidates[i] for i in range(position, len(candidates)))
+
+        for step in steps:
+            if all(contains_step(other, step) for other in others):
+                return step
+        return None
+
+class RecordingSession:
+    """A record_python recording kept server-side, with the run's arguments for replaying it
+
+    result is the recording plus 'job', the record_python keyword arguments.
+    """
+
+    def __init__(self, result):
+        self.job = result['job']
+        self.recording = {key: value for key, value in result.items() if key != 'job'}
+
+    def summary(self):
+        return {key: value for key, value in self.recording.items() if key not in ('inputLog', 'metrics')}
+
+    def replay_job(self, start, count):
+        """replay_python keyword arguments for steps [start, start + count)"""
+        return {
+            'code': self.job['code'],
+            'input_data': self.job['input_data'],
+            'tracer_backend': self.job['tracer_backend'],
+            'value_options': self.job['value_options'],
+            'budget': self.job['budget'],
+            'recording': self.recording,
+            'start': start,
+            'count': max(0, min(count, MAX_PAGE_SIZE))
+        }
+
+class PreviousRun:
+    """A client's last debug run, kept so a run of its edited program can reuse the unchanged start
+
+    run is {'job', 'result', 'checkpoints'}: the debug_python keyword
+    arguments, the result and its prefix checkpoints. A new run with the
+    same input and options resumes from the last checkpoint before the
+    first top-level statement that changed, compared by AST with line
+    numbers, since states carry them. Only deterministic programs qualify,
+    so that the statements before it would trace the same again.
+    """
+
+    def __init__(self, run):
+        self.job = run['job']
+        self.result = run['result']
+        self.checkpoints = run['checkpoints']
+        self.statements = statement_dumps(self.job['code'])
+
+    def resume_point(self, job):
+        """debug_python's resume argument for a run of job, or None if nothing can be reused"""
+        if {name: value for name, value in job.items() if name != 'code'} != \
+                {name: value for name, value in self.job.items() if name != 'code'}:
+            return None
+        statements = statement_dumps(job['code'])
+        if statements is None or self.statements is None:
+            return None
+        unchanged = 0
+        for old, new in zip(self.statements, statements):
+            if old != new:
+                break
+            unchanged += 1
+
+        # Checkpoints are in statement order
+        checkpoint = None
+        for candidate in self.checkpoints:
+            if candidate['statement'] <= unchanged and candidate['statement'] < len(statements):
+                checkpoint = candidate
+        if checkpoint is None:
+            return None
+
+        module = self.result['callHierarchy'][0]
+        reused = checkpoint['states']
+        record = {key: value for key, value in module.items() if key not in ('entry_step', 'return_step', 'return_value')}
+        record['children'] = module['children'][:checkpoint['module_children']]
+        entry_step = module.get('entry_step')
+        return dict(
+            checkpoint,
+            module_record=record,
+            module_frame=self.result['frames'][module['call_id']],
+            entry_step=entry_step if entry_step is not None and entry_step < reused else None,
+            encoding=last_encoding(self.result['debugStates'], reused, module['call_id'])
+            if self.result.get('snapshotMode') == 'delta' else None
+        )
+
+    def splice(self, result):
+        """Complete the result of a run resumed from this one with the reused states and calls, in place"""
+        resumed = result.pop('resumedFrom')
+        reused, calls = resumed['states'], resumed['calls']
+        prefix_calls = self.result['callHierarchy'][1:calls]
+        if reused:
+            result['debugStates'] = self.result['debugStates'][:reused] + result['debugStates']
+        else:
+            # The new trace was kept whole or focused on an error, so it starts over
+            entry_steps, return_steps = {}, {}
+            for index, state in enumerate(result['debugStates']):
+                record_call_step(entry_steps, return_steps, index, state)
+            prefix_calls = assign_call_steps([dict(call) for call in prefix_calls], entry_steps, return_steps)
+
+        # The resumed run's call history starts with the module call it continued
+        history = result['callHierarchy']
+        result['callHierarchy'] = history[:1] + prefix_calls + history[1:]
+        frames = dict(islice(self.result['frames'].items(), calls))
+        frames.update(result['frames'])
+        result['frames'] = frames
+        result['metrics'] = dict(result['metrics'], states=len(result['debugStates']), reusedStates=reused)
+        if result.get('prefixCheckpoints') is not None:
+            result['prefixCheckpoints'] = [checkpoint for checkpoint in self.checkpoints
+                                           if checkpoint['statement'] < resumed['statement']] + result['prefixCheckpoints']
+        return result
+
+def supports_prefix_reuse(job):
+    """Whether a debug_python run of job can keep prefix checkpoints and resume from them"""
+    if job.get('collapse_loops') or job.get('selection') or job.get('profile') or job.get('heap'):
+        return False
+    return is_deterministic(job['code'])
+
+def statement_dumps(code):
+    statements = top_level_statements(code)
+    if statements is None:
+        return None
+    return [ast.dump(node, include_attributes=True) for node in statements]
+
+def last_encoding(states, end, call_id):
+    """The variables of call_id's last step before end and the steps since its keyframe, as a delta encoder has them"""
+    chain = []
+    for index in range(end - 1, -1, -1):
+        state = states[index]
+        if state.get('callId') == call_id and state.get('eventType', 'step') == 'step':
+            chain.append(state)
+            if state.get('keyframe', True):
+                break
+    if not chain:
+        return None
+    variables = {}
+    for state in reversed(chain):
+        variables = apply_variable_delta(variables, state)
+    return variables, len(chain) - 1
+
+def contains_step(steps, step):
+    position = bisect.bisect_left(steps, step)
+    return position < len(steps) and steps[position] == step
+
+class SessionStore:
+    """Debug sessions by id, dropped after ttl seconds without access or when over max_sessions
+
+    Sessions are built from results by session_class, DebugSession by default.
+    """
+
+    def __init__(self, ttl=DEFAULT_SESSION_TTL, max_sessions=DEFAULT_MAX_SESSIONS, session_class=DebugSession):
+        self.ttl = ttl
+        self.session_class = session_class
+        self.max_sessions = max(1, max_sessions)
+        self.sessions = OrderedDict()  # id -> (session, last access), least recently used first
+        self.lock = threading.Lock()
+
+    def create(self, result):
+        """Index a debug_python result and return the new session id with the session"""
+        session_id = uuid.uuid4().hex
+        return session_id, self.put(session_id, result)
+
+    def put(self, session_id, result):
+        """Build a session under a given id, replacing the one it had"""
+        session = self.session_class(result)
+        with self.lock:
+            self.evict_expired()
+            self.sessions.pop(session_id, None)
+            self.sessions[session_id] = (session, time.monotonic())
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        return session
+
+    def get(self, session_id):
+        """Return a live session and refresh its TTL, or None"""
+        with self.lock:
+            self.evict_expired()
+            entry = self.sessions.get(session_id)
+            if entry is None:
+                return None
+            self.sessions[session_id] = (entry[0], time.monotonic())
+            self.sessions.move_to_end(session_id)
+            return entry[0]
+
+    def delete(self, session_id):
+        with self.lock:
+            return self.sessions.pop(session_id, None) is not None
+
+    def evict_expired(self):
+        """Drop sessions past their TTL; the caller holds the lock"""
+        deadline = time.monotonic() - self.ttl
+        while self.sessions:
+            session_id, (_, last_access) = next(iter(self.sessions.items()))
+            if last_access > deadline:
+                break
+            del self.sessions[session_id]
@@ -0,0 +1,162 @@
+import json
+import time
+import ctypes
+import threading
+
+# Limits applied to every run unless a request asks for tighter ones
+DEFAULT_MAX_STEPS = 1000000
+DEFAULT_MAX_SECONDS = 10
+DEFAULT_MAX_STATE_BYTES = 64 * 1024 * 1024
+
+# Serializing every state to measure it would slow tracing down by half, so
+# one state in STATE_SIZE_SAMPLE is measured and stands for the ones before it
+STATE_SIZE_SAMPLE = 32
+
+class BudgetExceeded(BaseException):
+    """Raised inside a traced program once a run has used up its budget
+
+    A BaseException, like DebugCancelled, so the program's own
+    'except Exception' blocks let it through.
+    """
+
+    def __init__(self, reason, limit):
+        super().__init__(reason, limit)
+        self.reason = reason
+        self.limit = limit
+
+class DeadlinePassed(BudgetExceeded):
+    """Raised asynchronously in the program's thread once its time is up; the budget keeps the limit"""
+
+    def __init__(self):
+        super().__init__('time', None)
+
+def raise_in_thread(thread_id, exception):
+    """Make exception pending in a thread, raised when it next checks, at the latest on entering a function"""
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread_id), ctypes.py_object(exception))
+
+def take_pending_exception():
+    """Raise the exception pending in this thread, if any, since calling this function checks for one
+
+    Clearing a pending exception with PyThreadState_SetAsyncExc instead
+    wedges the interpreter on 3.11 once it has been raised.
+    """
+
+class ExecutionBudget:
+    """Step, wall-clock and state-size limits of one debug run
+
+    The tracer calls step() with every state it records, before loop
+    collapsing or filtering, and it raises BudgetExceeded from inside the
+    trace hook once a limit is hit; the reason stays in exceeded so the
+    run can be reported as truncated. State bytes estimate the JSON size of
+    the recorded states, an upper bound of what filtering keeps. Limits left
+    as None are not enforced.
+
+    A program can run without producing states, like a one-line
+    'while True: pass' that settrace reports no further lines of, so the
+    clock does not rely on them: a watchdog timer raises DeadlinePassed in
+    the program's thread when time is up, which also bounds untraced runs.
+
+    Code outside a TraceSelection runs untraced and is not counted as
+    steps, a bare 'except:' in the program can swallow the stop, and the
+    watchdog's exception waits for a single long call, such as
+    time.sleep(), a blocking read or sum(range(10 ** 12)), to return; the
+    worker pool's job timeout still bounds all of them, but an in-process
+    run has nothing else.
+    """
+
+    def __init__(self, max_steps=None, max_seconds=None, max_state_bytes=None):
+        self.max_steps = max_steps
+        self.max_seconds = max_seconds
+        self.max_state_bytes = max_state_bytes
+        self.steps = 0
+        self.state_bytes = 0
+        self.deadline = None
+        self.running = False
+        self.exceeded = None  # {'reason', 'limit'} once the run was stopped
+        self.watchdog = None
+        self.watchdog_lock = threading.Lock()
+        self.thread_id = None
+        self.interrupted = False  # Whether the watchdog raised DeadlinePassed in the program
+
+    def start(self):
+        """Start the wall clock; called right before the program runs, in its thread"""
+        self.running = True
+        if self.max_seconds is not None:
+            self.deadline = time.monotonic() + self.max_seconds
+            self.thread_id = threading.get_ident()
+            self.watchdog = threading.Timer(self.max_seconds, self.expire)
+            self.watchdog.daemon = True
+            self.watchdog.start()
+
+    def expire(self):
+        """Stop a program still running at its deadline, whether or not it produces states"""
+        # The lock keeps finish() from returning until the exception is pending
+        with self.watchdog_lock:
+            if not self.running or self.exceeded is not None:
+                return
+            self.exceeded = {'reason': 'time', 'limit': self.max_seconds}
+            self.interrupted = True
+            raise_in_thread(self.thread_id, DeadlinePassed)
+
+    def finish(self):
+        """Stop enforcing limits once the program has ended, for the states recorded after it
+
+        Called right after the program returns or raises, in the handler
+        that catches its BudgetExceeded. Once the lock is taken, expire()
+        can no longer raise; if it already did, the exception is raised
+        from here at the latest, never in the code that runs after.
+        """
+        with self.watchdog_lock:
+            self.running = False
+            if self.watchdog is not None:
+                self.watchdog.cancel()
+                self.watchdog = None
+        if self.interrupted:
+            take_pending_exception()
+
+    def step(self, state):
+        """Count a step; state is None for a step that was counted but not recorded"""
+        if not self.running:
+            return
+        if self.exceeded is not None:
+            # Unwinding the stopped program can still produce states
+            raise BudgetExceeded(self.exceeded['reason'], self.exceeded['limit'])
+        if self.max_steps is not None and self.steps >= self.max_steps:
+            self.stop('steps', self.max_steps)
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            self.stop('time', self.max_seconds)
+        if self.max_state_bytes is not None and state is not None and self.steps % STATE_SIZE_SAMPLE == 0:
+            size = len(json.dumps(state, default=str)) * STATE_SIZE_SAMPLE
+            if self.state_bytes + size > self.max_state_bytes:
+                self.stop('stateBytes', self.max_state_bytes)
+            self.state_bytes += size
+        self.steps += 1
+
+    def add_state_bytes(self, size):
+        """Count bytes kept outside the states, such as HeapTable versions"""
+        if not self.running:
+            return
+        self.state_bytes += size
+        if self.max_state_bytes is not None and self.state_bytes > self.max_state_bytes:
+            self.stop('stateBytes', self.max_state_bytes)
+
+    def stop(self, reason, limit):
+        self.exceeded = {'reason': reason, 'limit': limit}
+        raise BudgetExceeded(reason, limit)
+
+    def out_of_memory(self):
+        """Record that the program was stopped by a MemoryError"""
+        self.exceeded = {'reason': 'memory', 'limit': None}
+
+    def truncation(self):
+        """The truncation marker of a stopped run, or None if it ran to completion"""
+        if self.exceeded is None:
+            return None
+        reason, limit = self.exceeded['reason'], self.exceeded['limit']
+        messages = {
+            'steps': f'Stopped after {limit} steps',
+            'time': f'Stopped after {limit}s',
+            'stateBytes': f'Stopped after recording {limit} bytes of states',
+            'memory': 'Stopped when the program ran out of memory'
+        }
+        return {'reason': reason, 'limit': limit, 'steps': self.steps, 'message': messages[reason]}
@@ -0,0 +1,76 @@
+import json
+from value_serializer import PRIMITIVE_TYPES, is_plain_dataclass
+
+# Mutable containers, whose identity matters; tuples and frozensets are inlined like other values
+HEAP_TYPES = (list, dict, set)
+
+class HeapTable:
+    """Mutable containers and dataclasses of traced locals, stored once per version
+
+    A local or call argument holding a list, dict, set or dataclass is
+    captured as a reference, {'heapRef': id, 'version': n}, to an entry of the table
+    instead of its rendered value. Entries are keyed by object identity, so
+    a list shared by several frames or passed down a recursion is one
+    entry, and a new version is only stored when its rendered value
+    changes. Rendering goes through the ValueSerializer memo, which skips
+    unchanged containers cheaply; nested containers are rendered inline
+    in their parent's value.
+
+    Other values are serialized as usual. The table holds every object it
+    has seen, so their ids cannot be reused by new objects during the run.
+    """
+
+    def __init__(self, serializer, budget=None):
+        self.serializer = serializer
+        self.budget = budget      # ExecutionBudget charged with the size of new versions
+        self.objects = {}         # id -> [object, heap id, rendered versions]
+        self.taken = {}           # heap id -> versions already handed out by take_new()
+        self.changed = {}         # heap id -> entry, for entries with versions not taken yet
+
+    def serialize(self, value):
+        """Serialize a local, referencing the heap for containers"""
+        if isinstance(value, PRIMITIVE_TYPES) or not (type(value) in HEAP_TYPES or is_plain_dataclass(value)):
+            return self.serializer.serialize(value)
+        try:
+            rendered = self.serializer.render(value, 0)
+        except Exception:
+            return self.serializer.serialize(value)
+
+        entry = self.objects.get(id(value))
+        if entry is None:
+            entry = [value, f"h{len(self.objects) + 1}", []]
+            self.objects[id(value)] = entry
+        versions = entry[2]
+        # The memo hands back the same object for an unchanged container
+        if not versions or (versions[-1] is not rendered and versions[-1] != rendered):
+            versions.append(rendered)
+            self.changed[entry[1]] = entry
+            if self.budget is not None:
+                self.budget.add_state_bytes(self.size(rendered))
+        return {'heapRef': entry[1], 'version': len(versions) - 1}
+
+    def size(self, rendered):
+        if isinstance(rendered, str):
+            return len(rendered)
+        return len(json.dumps(rendered, default=str))
+
+    def export(self):
+        """Every entry: heap id -> {'type', 'versions'}, a version being an index into versions"""
+        return {heap_id: {'type': type(value).__name__, 'versions': list(versions)}
+                for value, heap_id, versions in self.objects.values()}
+
+    def take_new(self):
+        """The versions stored since the previous call, with the version number of the first one"""
+        new = {}
+        for value, heap_id, versions in self.changed.values():
+            first = self.taken.get(heap_id, 0)
+            new[heap_id] = {'type': type(value).__name__, 'firstVersion': first, 'versions': versions[first:]}
+            self.taken[heap_id] = len(versions)
+        self.changed = {}
+        return new
+
+def resolve_heap_refs(variables, heap):
+    """Replace the heap references among a state's variables by the values they point to"""
+    return {name: heap[value['heapRef']]['versions'][value['version']]
+            if isinstance(value, dict) and 'heapRef' in value else value
+            for name, value in variables.items()}
@@ -0,0 +1,164 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict, deque
+from worker_pool import JobCancelledError
+
+DEFAULT_JOB_CONCURRENCY = 4
+DEFAULT_MAX_QUEUED_JOBS = 32
+DEFAULT_JOB_TTL = 600
+
+# Job statuses; the last three are final
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the job queue is full"""
+
+class DebugJob:
+    """One submitted debug run, its progress and, once finished, its result
+
+    options are the debug_python keyword arguments; request is the submitted
+    request, kept to shape the result when it is fetched.
+    """
+
+    def __init__(self, options, request=None):
+        self.id = uuid.uuid4().hex
+        self.options = options
+        self.request = request or {}
+        self.status = QUEUED
+        self.steps = 0
+        self.result = None
+        self.metrics = None
+        self.error = None
+        self.session_id = None  # Set when the result was kept as a debug session
+        self.created = time.monotonic()
+        self.started = None
+        self.finished = None
+        self.cancel_event = threading.Event()
+        self.done = threading.Event()
+
+    def progress(self, steps):
+        self.steps = steps
+
+    def is_finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def to_dict(self):
+        now = time.monotonic()
+        status = {
+            'jobId': self.id,
+            'status': self.status,
+            'steps': self.steps,
+            'queuedSeconds': round((self.started or self.finished or now) - self.created, 3)
+        }
+        if self.started is not None:
+            status['runSeconds'] = round((self.finished or now) - self.started, 3)
+        if self.error:
+            status['error'] = self.error
+        if self.session_id:
+            status['sessionId'] = self.session_id
+        return status
+
+class JobManager:
+    """Debug runs submitted as jobs, run by a fixed number of runner threads
+
+    At most max_queued jobs wait for a runner; submitting more raises
+    QueueFullError instead of letting the backlog grow; a cancelled job
+    leaves the queue at once and frees its place. run(job) does the
+    actual work and must honour job.cancel_event, raising JobCancelledError
+    when it stops early. Finished jobs are kept for ttl seconds.
+    """
+
+    def __init__(self, run, concurrency=DEFAULT_JOB_CONCURRENCY, max_queued=DEFAULT_MAX_QUEUED_JOBS,
+                 ttl=DEFAULT_JOB_TTL):
+        self.run = run
+        self.concurrency = max(1, concurrency)
+        self.ttl = ttl
+        self.max_queued = max(1, max_queued)
+        self.waiting = deque()  # Queued jobs, oldest first
+        self.jobs = OrderedDict()  # id -> job, oldest first
+        self.lock = threading.Lock()
+        self.job_waiting = threading.Condition(self.lock)
+        self.threads = []
+
+    def start(self):
+        """Start the runner threads on first use, so importing the app starts nothing"""
+        with self.lock:
+            if self.threads:
+                return
+            for index in range(self.concurrency):
+                thread = threading.Thread(target=self.runner, name=f"debug-job-runner-{index}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def submit(self, options, request=None):
+        """Queue a job and return it, or raise QueueFullError"""
+        self.start()
+        job = DebugJob(options, request)
+        with self.lock:
+            self.evict_expired()
+            if len(self.waiting) >= self.max_queued:
+                raise QueueFullError(f'Job queue is full ({self.max_queued} jobs waiting)')
+            self.waiting.append(job)
+            self.jobs[job.id] = job
+            self.job_waiting.notify()
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            self.evict_expired()
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; returns the job, or None if unknown"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel_event.set()
+        with self.lock:
+            # Queued jobs are cancelled right away, running ones once run() stops
+            if job.status == QUEUED:
+                self.waiting.remove(job)
+                self.finish(job, CANCELLED)
+        return job
+
+    def stats(self):
+        with self.lock:
+            counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+            for job in self.jobs.values():
+                counts[job.status] += 1
+            return counts
+
+    def runner(self):
+        while True:
+            with self.lock:
+                while not self.waiting:
+                    self.job_waiting.wait()
+                job = self.waiting.popleft()
+                job.status = RUNNING
+                job.started = time.monotonic()
+
+            try:
+                job.result, job.metrics = self.run(job)
+                status = DONE
+            except JobCancelledError:
+                status = CANCELLED
+            except Exception as e:
+                job.error = str(e)
+                status = FAILED
+            with self.lock:
+                self.finish(job, status)
+
+    def finish(self, job, status):
+        """Mark a job finished; the caller holds the lock"""
+        job.status = status
+        job.finished = time.monotonic()
+        job.done.set()
+
+    def evict_expired(self):
+        """Drop finished jobs past their TTL; the caller holds the lock"""
+        deadline = time.monotonic() - self.ttl
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.is_finished() and job.finished < deadline]
+        for job_id in expired:
+            del self.jobs[job_id]
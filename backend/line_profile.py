@@ -0,0 +1,114 @@
+import time
+
+class LineProfile:
+    """Per-line and per-function hit counts and times of one traced run
+
+    The tracer reports calls, lines and returns; the time between two events
+    is charged as self time to the line running in the innermost frame.
+    Time spent in the tracer itself is left out: each event pauses the
+    clock and the tracer resumes it once it is done with the event, so
+    building states does not show up as program time.
+
+    Total time of a line or function is the program time from the moment it
+    became active on the stack until it left the stack, counting a recursive
+    line or function once, from its outermost activation.
+    """
+
+    def __init__(self, clock=time.perf_counter_ns):
+        self.clock = clock
+        self.elapsed = 0            # Program time so far, in ns
+        self.resumed = None         # Clock reading when the program last got control back
+        self.stack = []             # [code, current line] of each live frame
+        self.lines = {}             # line -> [hits, self ns, total ns]
+        self.functions = {}         # code -> [calls, self ns, total ns]
+        self.active_lines = {}      # line -> [frames on it, elapsed when the first one got there]
+        self.active_functions = {}  # code -> [live frames, elapsed when the first one started]
+
+    def pause(self):
+        """Charge the program time since the last resume to the current line and function"""
+        now = self.clock()
+        if self.resumed is None or not self.stack:
+            return
+        spent = now - self.resumed
+        self.resumed = None
+        self.elapsed += spent
+        code, line = self.stack[-1]
+        self.functions[code][1] += spent
+        if line is not None:
+            self.lines[line][1] += spent
+
+    def resume(self):
+        self.resumed = self.clock()
+
+    def call(self, code):
+        self.pause()
+        self.stack.append([code, None])
+        stats = self.functions.get(code)
+        if stats is None:
+            stats = self.functions[code] = [0, 0, 0]
+        stats[0] += 1
+        self.enter(self.active_functions, code)
+        self.resume()
+
+    def line(self, line):
+        self.pause()
+        frame = self.stack[-1]
+        if frame[1] is not None:
+            self.leave(self.active_lines, self.lines, frame[1])
+        frame[1] = line
+        stats = self.lines.get(line)
+        if stats is None:
+            stats = self.lines[line] = [0, 0, 0]
+        stats[0] += 1
+        self.enter(self.active_lines, line)
+        self.resume()
+
+    def ret(self):
+        self.pause()
+        code, line = self.stack.pop()
+        if line is not None:
+            self.leave(self.active_lines, self.lines, line)
+        self.leave(self.active_functions, self.functions, code)
+        self.resume()
+
+    def enter(self, active, key):
+        entry = active.get(key)
+        if entry is None:
+            active[key] = [1, self.elapsed]
+        else:
+            entry[0] += 1
+
+    def leave(self, active, stats, key):
+        entry = active[key]
+        entry[0] -= 1
+        if not entry[0]:
+            del active[key]
+            stats[key][2] += self.elapsed - entry[1]
+
+    def finish(self):
+        """Close the frames still live when the program stopped, e.g. on an uncaught exception
+
+        Time since the last event is not charged, it went to the debugger's error handling.
+        """
+        self.resumed = None
+        while self.stack:
+            code, line = self.stack.pop()
+            if line is not None:
+                self.leave(self.active_lines, self.lines, line)
+            self.leave(self.active_functions, self.functions, code)
+
+    def export(self):
+        """The profile as a heatmap payload; heat is a line's share of the hottest line's self time"""
+        hottest = max((stats[1] for stats in self.lines.values()), default=0)
+        lines = [
+            {'line': line, 'hits': hits, 'selfNs': self_ns, 'totalNs': total_ns,
+             'heat': round(self_ns / hottest, 3) if hottest else 0.0}
+            for line, (hits, self_ns, total_ns) in sorted(self.lines.items())
+        ]
+        functions = [
+            {'function': getattr(code, 'co_qualname', code.co_name), 'line': code.co_firstlineno,
+             'calls': calls, 'selfNs': self_ns, 'totalNs': total_ns}
+            for code, (calls, self_ns, total_ns) in self.functions.items()
+        ]
+        functions.sort(key=lambda function: -function['selfNs'])
+        return {'totalNs': self.elapsed, 'lines': lines, 'functions': functions}
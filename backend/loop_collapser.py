@@ -0,0 +1,261 @@
+import ast
+import time
+from collections import deque
+
+DEFAULT_LOOP_KEEP_ITERATIONS = 3
+
+def find_loop_ranges(code):
+    """Map the header line of every for/while loop in the code to its last line"""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return {}
+
+    loop_ranges = {}
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.For, ast.AsyncFor, ast.While)):
+            loop_ranges[node.lineno] = node.end_lineno
+    return loop_ranges
+
+class LoopCollector:
+    """Iterations of one running loop, identified by (call_id, header line)"""
+
+    def __init__(self, state, end_line, keep_iterations, variables=None):
+        self.call_id = state.get('callId')
+        self.header = state['lineNumber']
+        self.end_line = end_line
+        self.keep_iterations = keep_iterations
+        self.function = state['functionName']
+        self.parent_id = state.get('parentId')
+        self.stack_depth = state.get('stackDepth', 0)
+
+        self.iterations = 0
+        self.recent = deque()  # Buffered iterations that may turn out to be among the last ones
+        self.collapsed = 0
+        self.collapsed_states = 0
+        self.collapsed_time = 0.0
+        self.variable_stats = {}
+        self.pending_delta = None
+        # With delta snapshots, all locals of the call as of the last step
+        # this loop has seen, since a step only holds the ones that changed
+        self.variables = dict(variables or {})
+
+    def contains(self, line):
+        return self.header <= line <= self.end_line
+
+class LoopCollapser:
+    """Keep the first and last iterations of hot loops and summarize the rest
+
+    Sits between the tracer and wherever its states go. A state at a loop
+    header starts a new iteration of that loop in its call; the first
+    keep_iterations iterations pass straight through, later ones are
+    buffered, and once more than keep_iterations are buffered the oldest is
+    folded into a summary. One extra iteration is held back, since the last
+    visit of a header may only be the check that ends the loop. When the
+    loop exits, a 'loop_summary' state with the iteration count, time spent
+    and min/max/final values of the changed variables is emitted, followed
+    by the buffered last iterations.
+
+    With delta snapshots, the changes of collapsed steps are folded into the
+    next kept step of the same call so variables can still be rebuilt, and
+    the summary is computed from the rebuilt locals, so it is the same as
+    with full snapshots.
+    """
+
+    def __init__(self, loop_ranges, sink, keep_iterations=DEFAULT_LOOP_KEEP_ITERATIONS, delta=False):
+        self.loop_ranges = loop_ranges
+        self.sink = sink
+        self.keep_iterations = max(1, keep_iterations)
+        self.delta = delta
+        self.collectors = []  # Active loops, innermost last
+        self.frame_variables = {}  # call_id -> all locals of the call, with delta snapshots
+
+    def push(self, state):
+        call_id = state.get('callId')
+        event_type = state.get('eventType', 'step')
+        line = state['lineNumber']
+        if self.delta:
+            if event_type == 'return':
+                self.frame_variables.pop(call_id, None)
+            elif event_type == 'step':
+                apply_delta(self.frame_variables.setdefault(call_id, {}), state)
+
+        # Close loops whose call is returning or whose body was left
+        while self.collectors and self.collectors[-1].call_id == call_id and (
+                event_type == 'return' or
+                (event_type == 'step' and not self.collectors[-1].contains(line))):
+            self.close(self.collectors.pop())
+
+        if event_type == 'step' and line in self.loop_ranges:
+            top = self.collectors[-1] if self.collectors else None
+            if top is None or top.call_id != call_id or top.header != line:
+                top = LoopCollector(state, self.loop_ranges[line], self.keep_iterations,
+                                    self.frame_variables.get(call_id))
+                self.collectors.append(top)
+            self.start_iteration(top)
+
+        self.route(state, len(self.collectors) - 1)
+
+    def finish(self):
+        """Close every loop still open, e.g. when the program stopped inside one"""
+        while self.collectors:
+            self.close(self.collectors.pop())
+
+    def route(self, state, level):
+        """Hand a state to the collector at level, or to the sink below the outermost one"""
+        if level < 0:
+            self.sink(state)
+            return
+        collector = self.collectors[level]
+        if collector.recent:
+            if collector.pending_delta is not None and is_call_step(state, collector.call_id):
+                merge_delta(collector.pending_delta, state)
+                collector.pending_delta = None
+            collector.recent[-1]['states'].append(state)
+        else:
+            if self.delta and is_call_step(state, collector.call_id):
+                apply_delta(collector.variables, state)
+            self.route(state, level - 1)
+
+    def start_iteration(self, collector):
+        collector.iterations += 1
+        if collector.iterations <= collector.keep_iterations:
+            return
+
+        now = time.perf_counter()
+        if collector.recent:
+            collector.recent[-1]['duration'] = now - collector.recent[-1]['started']
+        collector.recent.append({'states': [], 'started': now, 'duration': 0.0})
+        if len(collector.recent) > collector.keep_iterations + 1:
+            self.collapse(collector, collector.recent.popleft())
+
+    def collapse(self, collector, iteration):
+        """Fold a buffered iteration into the loop summary and drop its states"""
+        collector.collapsed += 1
+        collector.collapsed_states += len(iteration['states'])
+        collector.collapsed_time += iteration['duration']
+
+        for state in iteration['states']:
+            if not is_call_step(state, collector.call_id):
+                continue
+            if self.delta:
+                apply_delta(collector.variables, state)
+            variables = collector.variables if self.delta else state['variables']
+            for name, value in variables.items():
+                stats = collector.variable_stats.get(name)
+                if stats is None:
+                    collector.variable_stats[name] = {'first': value, 'final': value, 'changed': False,
+                                                      'min': value, 'max': value}
+                    continue
+                if value != stats['final']:
+                    stats['changed'] = True
+                stats['final'] = value
+                if is_number(value) and is_number(stats['min']):
+                    stats['min'] = min(stats['min'], value)
+                    stats['max'] = max(stats['max'], value)
+            if self.delta:
+                collector.pending_delta = fold_delta(collector.pending_delta, state)
+
+        # The next kept step of the loop's call must carry the dropped changes.
+        # If it has not been traced yet, route() merges them when it arrives
+        if self.delta and collector.pending_delta is not None:
+            for state in collector.recent[0]['states']:
+                if is_call_step(state, collector.call_id):
+                    merge_delta(collector.pending_delta, state)
+                    collector.pending_delta = None
+                    break
+
+    def close(self, collector):
+        """Emit the summary and the buffered last iterations of a finished loop"""
+        level = len(self.collectors) - 1
+        if collector.recent:
+            collector.recent[-1]['duration'] = time.perf_counter() - collector.recent[-1]['started']
+
+        # A final visit of the header that only ends the loop is not an iteration
+        iterations = collector.iterations
+        last = collector.recent[-1] if collector.recent else None
+        if last and all(state.get('callId') == collector.call_id and state['lineNumber'] == collector.header
+                        for state in last['states']):
+            iterations -= 1
+        elif len(collector.recent) > collector.keep_iterations:
+            self.collapse(collector, collector.recent.popleft())
+
+        if collector.collapsed:
+            changed = {}
+            for name, stats in collector.variable_stats.items():
+                if not stats['changed']:
+                    continue
+                changed[name] = {'final': stats['final']}
+                if is_number(stats['min']):
+                    changed[name].update(min=stats['min'], max=stats['max'])
+            self.route({
+                'lineNumber': collector.header,
+                'functionName': collector.function,
+                'variables': {},
+                'callId': collector.call_id,
+                'parentId': collector.parent_id,
+                'stackDepth': collector.stack_depth,
+                'eventType': 'loop_summary',
+                'loopSummary': {
+                    'headerLine': collector.header,
+                    'endLine': collector.end_line,
+                    'iterations': iterations,
+                    'collapsedIterations': collector.collapsed,
+                    'collapsedStates': collector.collapsed_states,
+                    'collapsedTimeMs': round(collector.collapsed_time * 1000, 3),
+                    'variables': changed
+                }
+            }, level)
+
+        for iteration in collector.recent:
+            for state in iteration['states']:
+                self.route(state, level)
+
+def is_call_step(state, call_id):
+    return state.get('eventType', 'step') == 'step' and state.get('callId') == call_id
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def apply_delta(variables, state):
+    """Update the full locals of a call, in place, with a delta-encoded step"""
+    if state.get('keyframe'):
+        variables.clear()
+    variables.update(state['variables'])
+    for name in state.get('removedVariables', []):
+        variables.pop(name, None)
+
+def fold_delta(pending, state):
+    """Accumulate the variable changes of a dropped delta-encoded step"""
+    if state.get('keyframe') or pending is None:
+        pending = {'keyframe': bool(state.get('keyframe')), 'variables': {}, 'removed': set()}
+        if state.get('keyframe'):
+            pending['variables'] = dict(state['variables'])
+            return pending
+
+    pending['variables'].update(state['variables'])
+    pending['removed'].difference_update(state['variables'])
+    for name in state.get('removedVariables', []):
+        pending['variables'].pop(name, None)
+        pending['removed'].add(name)
+    return pending
+
+def merge_delta(pending, state):
+    """Apply accumulated dropped changes underneath a kept delta-encoded step"""
+    if state.get('keyframe'):
+        return
+
+    removed = set(state.get('removedVariables', []))
+    variables = {**pending['variables'], **state['variables']}
+    for name in removed:
+        variables.pop(name, None)
+    state['variables'] = variables
+
+    if pending['keyframe']:
+        state['keyframe'] = True
+        state.pop('removedVariables', None)
+        return
+
+    removed |= pending['removed'] - set(state['variables'])
+    if removed:
+        state['removedVariables'] = sorted(removed)
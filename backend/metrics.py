@@ -0,0 +1,126 @@
+import math
+import threading
+
+# Upper bounds of the latency and size histograms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = tuple(1024 * 4 ** power for power in range(10))  # 1 KB .. 256 MB
+
+class Metric:
+    """A counter or gauge, one value per combination of label values
+
+    Values can also come from a function called at render time, returning
+    a number or a {label values tuple: number} dict, for state that already
+    lives elsewhere (session count, cache counters).
+    """
+
+    def __init__(self, name, kind, help_text, label_names=(), lock=None):
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.values = {}
+        self.function = None
+        self.lock = lock or threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value, *labels):
+        with self.lock:
+            self.values[labels] = value
+
+    def set_function(self, function):
+        self.function = function
+
+    def samples(self):
+        if self.function is None:
+            with self.lock:
+                values = dict(self.values)
+        else:
+            values = self.function()
+            if not isinstance(values, dict):
+                values = {(): values}
+        return [(self.name, labels, value) for labels, value in sorted(values.items())]
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per combination of label values"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS, lock=None):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}  # labels -> [bucket counts..., sum, count]
+        self.lock = lock or threading.Lock()
+
+    def observe(self, value, *labels):
+        with self.lock:
+            entry = self.values.get(labels)
+            if entry is None:
+                entry = self.values[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[index] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def samples(self):
+        with self.lock:
+            values = {labels: list(entry) for labels, entry in self.values.items()}
+        samples = []
+        for labels, entry in sorted(values.items()):
+            for bound, count in zip(self.buckets, entry):
+                samples.append((f"{self.name}_bucket", labels + (format_value(bound),), count))
+            samples.append((f"{self.name}_bucket", labels + ('+Inf',), entry[-1]))
+            samples.append((f"{self.name}_sum", labels, entry[-2]))
+            samples.append((f"{self.name}_count", labels, entry[-1]))
+        return samples
+
+class MetricsRegistry:
+    """Service metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self.metrics = []
+        self.lock = threading.Lock()
+
+    def counter(self, name, help_text, label_names=()):
+        return self.add(Metric(name, 'counter', help_text, label_names, self.lock))
+
+    def gauge(self, name, help_text, label_names=()):
+        return self.add(Metric(name, 'gauge', help_text, label_names, self.lock))
+
+    def histogram(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        return self.add(Histogram(name, help_text, label_names, buckets, self.lock))
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            names = metric.label_names + (('le',) if metric.kind == 'histogram' else ())
+            for sample_name, labels, value in metric.samples():
+                label_text = ','.join(f'{name}="{escape_label(str(label))}"'
+                                      for name, label in zip(names, labels))
+                lines.append(f"{sample_name}{{{label_text}}} {format_value(value)}" if label_text
+                             else f"{sample_name} {format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+    return str(value)
@@ -1,206 +1,1205 @@
 import sys
-import tempfile
-import subprocess
+import ast
+import builtins
+import inspect
+import hashlib
+import linecache
 import traceback
-import json
 import io
-import uuid
-from contextlib import redirect_stdout, redirect_stderr
+import time
+import bisect
+import resource
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager, redirect_stdout, redirect_stderr
+from loop_collapser import LoopCollapser, find_loop_ranges, DEFAULT_LOOP_KEEP_ITERATIONS
+from value_serializer import ValueSerializer
+from trace_selection import TraceSelection
+from execution_budget import ExecutionBudget, BudgetExceeded
+from replay import InputLog, StepRecorder, ReplayDone, DEFAULT_CHECKPOINT_INTERVAL
+from line_profile import LineProfile
+from heap_table import HeapTable
+from complexity import analyze_complexity
+
+# Values of these types can be compared by identity: the same object always
+# serializes to the same value, so it never needs converting twice
+IMMUTABLE_TYPES = (int, float, bool, str, type(None))
+
+DEFAULT_KEYFRAME_INTERVAL = 50
+
+# Bump whenever the shape or content of debug results changes, so cached results are not reused
+TRACER_VERSION = 6
+
+# Raw steps between two calls of a run's progress callback
+PROGRESS_INTERVAL = 1000
+
+class DebugCancelled(BaseException):
+    """Raised inside a traced program to stop a cancelled run
+
+    A BaseException, so the program's own 'except Exception' blocks let it through.
+    """
+
+# Compiled user programs kept around, keyed by source hash
+CODE_CACHE_SIZE = 256
+code_cache = OrderedDict()
+code_cache_lock = threading.Lock()
 
 class SimpleTracer:
-    def __init__(self):
+    def __init__(self, snapshot_mode='full', keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, value_options=None):
         self.debug_states = []
         self.current_call_stack = []
-        self.call_stack_ids = {}  # To track parent-child relationships
         self.call_history = []    # To track call hierarchy
-        self.line_execution_count = {}
+        self.call_records = {}    # call_id -> call_history record
         self.call_id_counter = 0  # For generating unique call IDs
+        self.frames = {}          # call_id -> frame node, shared by every state of that call
+        self.last_state = None
+        self.state_sink = None    # When set, states are passed to it instead of being stored
+        self.loop_collapser = None
+        self.selection = None     # TraceSelection limiting what is traced, or None for everything
+        self.budget = None        # ExecutionBudget stopping the program, or None for no limits
+        self.recorder = None      # StepRecorder of a record or replay run, building only some states
+        self.profile = None       # LineProfile timing lines and calls, or None when not profiling
+        self.source_filename = None  # Synthetic filename of the code being debugged
+        self.serializer = ValueSerializer(**(value_options or {}))
+        self.heap = None          # HeapTable that containers in locals are referenced from, or None to inline them
+        self.serialize_local = self.serializer.serialize
+        self.prefix_checkpoints = None  # PrefixCheckpoints noting where later runs could resume, or None
+        self.resumed_call = None  # call_info of the module call a resumed run continues, until it starts
+        
+        # 'full' stores every local on every step, 'delta' only the changes
+        self.snapshot_mode = snapshot_mode
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.frame_snapshots = {}  # call_id -> last captured locals of that frame
+
+    def start(self):
+        """Install the tracer for the current thread"""
+        sys.settrace(self.trace_calls)
+
+    def stop(self):
+        """Remove the tracer"""
+        sys.settrace(None)
+
+    def is_traced_file(self, filename):
+        """Only the debugged program is traced, never the stdlib, packages or the debugger"""
+        return filename == self.source_filename
 
     def trace_calls(self, frame, event, arg):
         """Trace function calls"""
         if event == 'call':
-            func_name = frame.f_code.co_name
-            line_no = frame.f_lineno
-            filename = frame.f_code.co_filename
-            
             # Skip library code
-            if '<frozen' in filename or '/lib/' in filename:
+            if not self.is_traced_file(frame.f_code.co_filename):
                 return None
             
-            # Generate unique call ID for this function call
-            self.call_id_counter += 1
-            call_id = f"{func_name}_{self.call_id_counter}"
-            
-            # Determine parent call ID
-            parent_id = None
-            if self.current_call_stack:
-                parent_id = self.current_call_stack[-1].get('call_id')
-            
-            # Add to call stack
-            call_info = {
-                'function': func_name,
-                'line': line_no,
-                'file': filename,
-                'call_id': call_id,
-                'parent_id': parent_id,
-                'stack_depth': len(self.current_call_stack)
-            }
-            
-            self.current_call_stack.append(call_info)
-            self.call_history.append({
-                'call_id': call_id,
-                'parent_id': parent_id,
-                'function': func_name,
-                'entry_line': line_no,
-                'stack_depth': len(self.current_call_stack) - 1,
-                'children': []
-            })
+            # Frames outside the selection get no local tracer and run untraced
+            if self.selection is not None and not self.selection.traces_code(frame.f_code):
+                return None
             
-            # Update parent's children list
-            if parent_id:
-                for call in self.call_history:
-                    if call['call_id'] == parent_id:
-                        call['children'].append(call_id)
-                        break
+            self.record_call(frame)
                 
         return self.trace_lines
         
     def trace_lines(self, frame, event, arg):
         """Trace line execution"""
         if event == 'line':
-            filename = frame.f_code.co_filename
-            
             # Skip library code
-            if '<frozen' in filename or '/lib/' in filename:
+            if not self.is_traced_file(frame.f_code.co_filename):
                 return
-                
-            line_no = frame.f_lineno
-            func_name = frame.f_code.co_name
             
-            # Collect local variables
-            variables = {}
-            for name, value in frame.f_locals.items():
-                try:
-                    # Convert values to strings to ensure they're serializable
-                    if isinstance(value, (int, float, bool, str, type(None))):
-                        variables[name] = value
-                    elif hasattr(value, '__dict__'):
-                        variables[name] = str(value)
-                    else:
-                        variables[name] = repr(value)
-                except:
-                    variables[name] = "Error: Unparseable value"
-            
-            # Get current call info
-            current_call_info = self.current_call_stack[-1] if self.current_call_stack else None
-            call_id = current_call_info.get('call_id') if current_call_info else None
-            parent_id = current_call_info.get('parent_id') if current_call_info else None
-            stack_depth = len(self.current_call_stack)
-            
-            # Get full call stack info
-            call_stack = []
-            for call in self.current_call_stack:
-                call_stack.append({
-                    'function': call['function'],
-                    'line': call['line'],
-                    'call_id': call['call_id'],
-                    'parent_id': call['parent_id'],
-                })
-            
-            # Add to debug states
-            self.debug_states.append({
-                'lineNumber': line_no,
-                'functionName': func_name,
-                'variables': variables,
-                'callStack': call_stack,
-                'callId': call_id,
-                'parentId': parent_id,
-                'stackDepth': stack_depth,
-                'eventType': 'step'
-            })
-            
-            # Track line execution count (for handling recursion)
-            line_key = f"{filename}:{line_no}"
-            self.line_execution_count[line_key] = self.line_execution_count.get(line_key, 0) + 1
+            if self.selection is None or self.selection.records_line(frame, frame.f_lineno):
+                self.record_line(frame, frame.f_lineno)
         
         elif event == 'return':
-            if self.current_call_stack:
-                func_name = frame.f_code.co_name
-                line_no = frame.f_lineno
-                
-                # Collect return value
-                return_value = None
-                if arg is not None:
-                    try:
-                        if isinstance(arg, (int, float, bool, str, type(None))):
-                            return_value = arg
-                        else:
-                            return_value = repr(arg)
-                    except:
-                        return_value = "Error: Unparseable return value"
-                
-                # Get call info before popping from stack
-                current_call_info = self.current_call_stack[-1]
-                call_id = current_call_info.get('call_id')
-                parent_id = current_call_info.get('parent_id')
-                stack_depth = len(self.current_call_stack) - 1  # -1 because we're returning
-                
-                # Add return event
-                self.debug_states.append({
-                    'lineNumber': line_no,
-                    'functionName': func_name,
-                    'variables': {'return_value': return_value},
-                    'callStack': list(self.current_call_stack),  # Copy before popping
-                    'callId': call_id,
-                    'parentId': parent_id,
-                    'stackDepth': stack_depth,
-                    'eventType': 'return',
-                    'returnValue': return_value
-                })
-                
-                # Now pop from call stack
-                self.current_call_stack.pop()
+            self.record_return(frame, arg)
                 
         elif event == 'exception':
             exc_type, exc_value, exc_traceback = arg
-            variables = {'exception_type': exc_type.__name__, 'exception_message': str(exc_value)}
-            
-            # Get current call info
-            current_call_info = self.current_call_stack[-1] if self.current_call_stack else None
-            call_id = current_call_info.get('call_id') if current_call_info else None
-            parent_id = current_call_info.get('parent_id') if current_call_info else None
-            stack_depth = len(self.current_call_stack)
+            self.record_exception(frame, exc_type, exc_value)
+        
+        return self.trace_lines
+
+    def record_call(self, frame):
+        """Push a new call onto the call stack and the call hierarchy"""
+        if self.resumed_call is not None:
+            # The statements after a resume point continue the module call of the reused ones
+            self.resumed_call['file'] = frame.f_code.co_filename
+            self.current_call_stack.append(self.resumed_call)
+            self.resumed_call = None
+            return
+        if self.profile is not None:
+            self.profile.call(frame.f_code)
+        func_name = frame.f_code.co_name
+        line_no = frame.f_lineno
+        filename = frame.f_code.co_filename
+        
+        # Generate unique call ID for this function call
+        self.call_id_counter += 1
+        call_id = f"{func_name}_{self.call_id_counter}"
+        
+        # Determine parent call ID
+        parent_id = None
+        if self.current_call_stack:
+            parent_id = self.current_call_stack[-1].get('call_id')
+        
+        # Add to call stack
+        call_info = {
+            'function': func_name,
+            'line': line_no,
+            'file': filename,
+            'call_id': call_id,
+            'parent_id': parent_id,
+            'stack_depth': len(self.current_call_stack)
+        }
+        
+        self.current_call_stack.append(call_info)
+        self.frames[call_id] = {
+            'function': func_name,
+            'line': line_no,
+            'call_id': call_id,
+            'parent_id': parent_id
+        }
+        # Record and replay runs keep no call history, so memory does not grow with the number of calls
+        if self.recorder is not None:
+            return
+        call_record = {
+            'call_id': call_id,
+            'parent_id': parent_id,
+            'function': func_name,
+            'entry_line': line_no,
+            'stack_depth': len(self.current_call_stack) - 1,
+            'args': self.capture_arguments(frame),
+            'children': []
+        }
+        self.call_history.append(call_record)
+        self.call_records[call_id] = call_record
+        
+        # Update parent's children list
+        if parent_id in self.call_records:
+            self.call_records[parent_id]['children'].append(call_id)
+        if self.profile is not None:
+            self.profile.resume()
+
+    def capture_arguments(self, frame):
+        """Serialized parameters of a frame that was just called"""
+        code = frame.f_code
+        count = code.co_argcount + code.co_kwonlyargcount
+        count += bool(code.co_flags & inspect.CO_VARARGS) + bool(code.co_flags & inspect.CO_VARKEYWORDS)
+        if not count:
+            return {}
+        local_vars = frame.f_locals
+        # Comprehensions take their iterator as the hidden parameter '.0'
+        return {name: self.serialize_local(local_vars[name]) for name in code.co_varnames[:count]
+                if name in local_vars and not name.startswith('.')}
+
+    def record_line(self, frame, line_no):
+        """Record a step state for a line about to execute"""
+        if self.profile is not None:
+            self.profile.line(line_no)
+        if self.recorder is not None and self.skips_state():
+            return
+        func_name = frame.f_code.co_name
+        
+        # Get current call info
+        current_call_info = self.current_call_stack[-1] if self.current_call_stack else None
+        call_id = current_call_info.get('call_id') if current_call_info else None
+        parent_id = current_call_info.get('parent_id') if current_call_info else None
+        stack_depth = len(self.current_call_stack)
+        if self.prefix_checkpoints is not None and stack_depth == 1:
+            # A module-level line can start a top-level statement later runs may resume at
+            self.prefix_checkpoints.line(line_no)
+        
+        # The call stack is not copied per step, it is recovered from the
+        # frame table by following parent_id links from call_id
+        
+        # Collect local variables
+        if self.snapshot_mode == 'delta':
+            variables, removed, keyframe = self.capture_variable_delta(call_id, frame.f_locals)
+        else:
+            variables = {name: self.serialize_local(value) for name, value in frame.f_locals.items()}
+        
+        # Add to debug states
+        state = {
+            'lineNumber': line_no,
+            'functionName': func_name,
+            'variables': variables,
+            'callId': call_id,
+            'parentId': parent_id,
+            'stackDepth': stack_depth,
+            'eventType': 'step'
+        }
+        if self.snapshot_mode == 'delta':
+            state['keyframe'] = keyframe
+            if removed:
+                state['removedVariables'] = removed
+        self.emit_state(state)
+        if self.profile is not None:
+            self.profile.resume()
+
+    def record_return(self, frame, arg):
+        """Record a return state and pop the call off the call stack"""
+        if not self.current_call_stack:
+            return
+        if self.profile is not None:
+            self.profile.ret()
+        
+        # Get call info before popping from stack
+        current_call_info = self.current_call_stack[-1]
+        call_id = current_call_info.get('call_id')
+        parent_id = current_call_info.get('parent_id')
+        stack_depth = len(self.current_call_stack) - 1  # -1 because we're returning
+        
+        if self.recorder is None or not self.skips_state():
+            # Collect return value
+            return_value = None
+            if arg is not None:
+                return_value = self.serializer.serialize_return(arg)
             
-            self.debug_states.append({
+            # Add return event
+            self.emit_state({
                 'lineNumber': frame.f_lineno,
                 'functionName': frame.f_code.co_name,
-                'variables': variables,
-                'callStack': list(self.current_call_stack),
+                'variables': {'return_value': return_value},
                 'callId': call_id,
                 'parentId': parent_id,
                 'stackDepth': stack_depth,
-                'eventType': 'exception',
-                'error': True
+                'eventType': 'return',
+                'returnValue': return_value
             })
+            
+            call_record = self.call_records.get(call_id)
+            if call_record is not None:
+                call_record['return_value'] = return_value
+            if self.profile is not None:
+                self.profile.resume()
         
-        return self.trace_lines
+        # Now pop from call stack
+        self.current_call_stack.pop()
+        self.frame_snapshots.pop(call_id, None)
+        if self.recorder is not None:
+            # Only live calls are needed to rebuild the call stack of a captured step
+            self.frames.pop(call_id, None)
+
+    def record_exception(self, frame, exc_type, exc_value):
+        """Record an exception raised in or propagating through a frame"""
+        if self.recorder is not None and self.skips_state():
+            return
+        variables = {'exception_type': exc_type.__name__, 'exception_message': str(exc_value)}
+        
+        # Get current call info
+        current_call_info = self.current_call_stack[-1] if self.current_call_stack else None
+        call_id = current_call_info.get('call_id') if current_call_info else None
+        parent_id = current_call_info.get('parent_id') if current_call_info else None
+        stack_depth = len(self.current_call_stack)
+        
+        self.emit_state({
+            'lineNumber': frame.f_lineno,
+            'functionName': frame.f_code.co_name,
+            'variables': variables,
+            'callId': call_id,
+            'parentId': parent_id,
+            'stackDepth': stack_depth,
+            'eventType': 'exception',
+            'error': True
+        })
+        if self.profile is not None:
+            self.profile.resume()
+
+    def skips_state(self):
+        """Count a step of a record or replay run and return whether its state is skipped"""
+        if self.recorder.step():
+            return False
+        if self.budget is not None:
+            self.budget.step(None)
+        return True
+
+    def emit_state(self, state):
+        """Pass a new state through loop collapsing, if enabled, then deliver it"""
+        # Counted before loop collapsing, which can hold back a long loop's states
+        if self.budget is not None:
+            self.budget.step(state)
+        self.last_state = state
+        if self.loop_collapser is not None:
+            self.loop_collapser.push(state)
+        else:
+            self.deliver_state(state)
+
+    def deliver_state(self, state):
+        """Store a state, or hand it to the state sink when streaming"""
+        if self.state_sink is not None:
+            self.state_sink(state)
+        else:
+            self.debug_states.append(state)
+
+    def enable_loop_collapsing(self, code, keep_iterations=DEFAULT_LOOP_KEEP_ITERATIONS):
+        """Keep only the first and last keep_iterations iterations of each loop in code"""
+        self.loop_collapser = LoopCollapser(
+            find_loop_ranges(code), self.deliver_state, keep_iterations, delta=self.snapshot_mode == 'delta'
+        )
+
+    def enable_selection(self, selection):
+        """Only trace the functions, line ranges and breakpoints of a TraceSelection"""
+        self.selection = selection
+
+    def enable_recording(self, recorder):
+        """Only build the states a StepRecorder asks for, counting the others"""
+        self.recorder = recorder
+
+    def enable_profiling(self, profile):
+        """Time every traced line and call into a LineProfile"""
+        self.profile = profile
+
+    def enable_heap(self, heap):
+        """Capture containers in locals as references to a HeapTable"""
+        self.heap = heap
+        self.serialize_local = heap.serialize
+
+    def enable_budget(self, budget):
+        """Stop the program once it exceeds an ExecutionBudget"""
+        self.budget = budget
+
+    def flush_states(self):
+        """Deliver states still held back by loop collapsing"""
+        if self.loop_collapser is not None:
+            self.loop_collapser.finish()
+
+    def capture_variable_delta(self, call_id, local_vars):
+        """Return (changed, removed, keyframe) for the locals of a frame since its previous step"""
+        snapshot = self.frame_snapshots.get(call_id)
+        keyframe = snapshot is None or snapshot['since_keyframe'] >= self.keyframe_interval
+        if snapshot is None:
+            snapshot = {'objects': {}, 'values': {}, 'since_keyframe': 0}
+            self.frame_snapshots[call_id] = snapshot
+        
+        objects = snapshot['objects']
+        values = snapshot['values']
+        changed = {}
+        
+        for name, value in local_vars.items():
+            # Unchanged immutable values don't need converting again
+            if name in objects and objects[name] is value and isinstance(value, IMMUTABLE_TYPES):
+                continue
+            converted = self.serialize_local(value)
+            objects[name] = value
+            if name not in values or values[name] != converted:
+                values[name] = converted
+                changed[name] = converted
+        
+        removed = [name for name in values if name not in local_vars]
+        for name in removed:
+            del values[name]
+            # The snapshot a resumed run restores has values but no objects yet
+            objects.pop(name, None)
+        
+        if keyframe:
+            snapshot['since_keyframe'] = 0
+            return dict(values), [], True
+        
+        snapshot['since_keyframe'] += 1
+        return changed, removed, False
+
+class MonitoringTracer(SimpleTracer):
+    """Tracer built on sys.monitoring (PEP 669, Python 3.12+)
+    
+    Produces the same states as SimpleTracer, but library code objects are
+    disabled after their first event instead of being filtered on every
+    call and line, so they run at close to full speed.
+    """
+    
+    TOOL_ID = sys.monitoring.DEBUGGER_ID if hasattr(sys, 'monitoring') else None
+
+    def __init__(self, snapshot_mode='full', keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, value_options=None):
+        super().__init__(snapshot_mode, keyframe_interval, value_options)
+        self.thread_id = None
+        self.traced_code = set()   # User code objects with local events enabled
+        self.line_starts = {}      # code -> sorted (offset, line) pairs, for backward jumps
+
+    @classmethod
+    def is_available(cls):
+        """Check whether the interpreter supports sys.monitoring and the tool id is free"""
+        return cls.TOOL_ID is not None and sys.monitoring.get_tool(cls.TOOL_ID) is None
+
+    def start(self):
+        """Register the callbacks and enable the global events"""
+        monitoring = sys.monitoring
+        events = monitoring.events
+        self.thread_id = threading.get_ident()
+        
+        monitoring.use_tool_id(self.TOOL_ID, 'logicly-debugger')
+        callbacks = {
+            events.PY_START: self.on_start,
+            events.PY_RESUME: self.on_start,
+            events.PY_THROW: self.on_start,
+            events.LINE: self.on_line,
+            events.JUMP: self.on_jump,
+            events.PY_RETURN: self.on_return,
+            events.PY_YIELD: self.on_return,
+            events.PY_UNWIND: self.on_unwind,
+            events.RAISE: self.on_raise,
+            events.STOP_ITERATION: self.on_raise,
+        }
+        for event, callback in callbacks.items():
+            monitoring.register_callback(self.TOOL_ID, event, callback)
+        
+        # Events disabled by a previous session must fire again
+        monitoring.restart_events()
+        monitoring.set_events(
+            self.TOOL_ID,
+            events.PY_START | events.PY_RESUME | events.PY_THROW | events.PY_UNWIND | events.RAISE
+        )
+
+    def stop(self):
+        """Disable all events and release the tool id"""
+        monitoring = sys.monitoring
+        if monitoring.get_tool(self.TOOL_ID) is None:
+            return
+        
+        monitoring.set_events(self.TOOL_ID, monitoring.events.NO_EVENTS)
+        for code in self.traced_code:
+            monitoring.set_local_events(self.TOOL_ID, code, monitoring.events.NO_EVENTS)
+        for event in MONITORED_EVENTS:
+            monitoring.register_callback(self.TOOL_ID, event, None)
+        monitoring.free_tool_id(self.TOOL_ID)
+
+    def on_start(self, code, instruction_offset, *args):
+        """Equivalent of the settrace 'call' event"""
+        if threading.get_ident() != self.thread_id:
+            return None
+        if code not in self.traced_code:
+            if not self.is_traced_file(code.co_filename):
+                return sys.monitoring.DISABLE
+            if self.selection is not None and not self.selection.traces_code(code):
+                return sys.monitoring.DISABLE
+            events = sys.monitoring.events
+            sys.monitoring.set_local_events(
+                self.TOOL_ID, code,
+                events.LINE | events.JUMP | events.PY_RETURN | events.PY_YIELD | events.STOP_ITERATION
+            )
+            self.traced_code.add(code)
+        
+        self.record_call(sys._getframe(1))
+
+    def on_line(self, code, line_number):
+        """Equivalent of the settrace 'line' event"""
+        if threading.get_ident() != self.thread_id:
+            return None
+        frame = sys._getframe(1)
+        if self.selection is not None and not self.selection.records_line(frame, line_number):
+            # Lines that can never be selected stop firing; breakpoints may hit later
+            return sys.monitoring.DISABLE if self.selection.never_records(code, line_number) else None
+        self.record_line(frame, line_number)
+
+    def on_jump(self, code, instruction_offset, destination_offset):
+        """settrace reports a backward jump within a single line as a new line event"""
+        if destination_offset > instruction_offset:
+            return sys.monitoring.DISABLE
+        if threading.get_ident() != self.thread_id:
+            return None
+        if self.profile is not None:
+            # Looking the lines up is tracer time, not time of the loop
+            self.profile.pause()
+        
+        line_number = self.line_for_offset(code, destination_offset)
+        if line_number is not None and line_number == self.line_for_offset(code, instruction_offset):
+            frame = sys._getframe(1)
+            if self.selection is None or self.selection.records_line(frame, line_number):
+                self.record_line(frame, line_number)
+        if self.profile is not None:
+            self.profile.resume()
+
+    def on_return(self, code, instruction_offset, retval):
+        """Equivalent of the settrace 'return' event"""
+        if threading.get_ident() != self.thread_id:
+            return None
+        self.record_return(sys._getframe(1), retval)
+
+    def on_unwind(self, code, instruction_offset, exception):
+        """A frame exiting through an exception returns None under settrace"""
+        if code in self.traced_code and threading.get_ident() == self.thread_id:
+            self.record_return(sys._getframe(1), None)
+
+    def on_raise(self, code, instruction_offset, exception):
+        """Equivalent of the settrace 'exception' event"""
+        if code in self.traced_code and threading.get_ident() == self.thread_id:
+            self.record_exception(sys._getframe(1), type(exception), exception)
+
+    def line_for_offset(self, code, offset):
+        """Map a bytecode offset to its source line"""
+        starts = self.line_starts.get(code)
+        if starts is None:
+            starts = [(start, line) for start, end, line in code.co_lines()]
+            self.line_starts[code] = starts
+        index = bisect.bisect_right(starts, (offset, float('inf'))) - 1
+        return starts[index][1] if index >= 0 else None
+
+if hasattr(sys, 'monitoring'):
+    MONITORED_EVENTS = (
+        sys.monitoring.events.PY_START, sys.monitoring.events.PY_RESUME, sys.monitoring.events.PY_THROW,
+        sys.monitoring.events.LINE, sys.monitoring.events.JUMP, sys.monitoring.events.PY_RETURN,
+        sys.monitoring.events.PY_YIELD, sys.monitoring.events.PY_UNWIND, sys.monitoring.events.RAISE,
+        sys.monitoring.events.STOP_ITERATION
+    )
+else:
+    MONITORED_EVENTS = ()
+
+def create_tracer(tracer_backend='settrace', snapshot_mode='full', keyframe_interval=DEFAULT_KEYFRAME_INTERVAL,
+                  value_options=None):
+    """Create the requested tracer, falling back to settrace when sys.monitoring is unavailable
+
+    value_options are ValueSerializer keyword arguments limiting how locals are serialized.
+    """
+    if tracer_backend in ('monitoring', 'auto') and MonitoringTracer.is_available():
+        return MonitoringTracer(snapshot_mode, keyframe_interval, value_options)
+    return SimpleTracer(snapshot_mode, keyframe_interval, value_options)
+
+def compile_source(code):
+    """Compile code in memory under a synthetic filename, reusing earlier compilations
+
+    The source is registered in linecache under that filename, so tracebacks
+    and the traceback module can still show the offending lines.
+    """
+    digest = hashlib.sha256(code.encode('utf-8')).hexdigest()
+    filename = f"<debugged-{digest[:16]}>"
+
+    with code_cache_lock:
+        code_obj = code_cache.get(digest)
+        if code_obj is not None:
+            code_cache.move_to_end(digest)
+
+    if code_obj is None:
+        code_obj = compile(code, filename, 'exec')
+        with code_cache_lock:
+            code_cache[digest] = code_obj
+            while len(code_cache) > CODE_CACHE_SIZE:
+                code_cache.popitem(last=False)
+
+    # An mtime of None keeps linecache.checkcache() from dropping the entry
+    linecache.cache[filename] = (len(code), None, code.splitlines(True), filename)
+    return filename, code_obj
+
+def top_level_statements(code):
+    """The top-level statement nodes of code, or None if it cannot be run a statement range at a time
+
+    That is when it does not parse, or when it imports from __future__,
+    whose flags a range of statements compiled on its own would lose.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    if any(isinstance(node, ast.ImportFrom) and node.module == '__future__' for node in tree.body):
+        return None
+    return tree.body
+
+def statement_first_line(node):
+    """The first line of a top-level statement, counting its decorators"""
+    return min([node.lineno] + [decorator.lineno for decorator in getattr(node, 'decorator_list', ())])
+
+def compile_split(code, filename, index):
+    """Compile the top-level statements of code before index and from index on, as two modules"""
+    statements = top_level_statements(code)
+    return tuple(compile(ast.Module(body=body, type_ignores=[]), filename, 'exec')
+                 for body in (statements[:index], statements[index:]))
+
+def apply_variable_delta(variables, state):
+    """Apply a delta-encoded state to the variables of its frame, returning the new full set"""
+    if state.get('keyframe'):
+        return dict(state['variables'])
+    
+    variables = dict(variables)
+    variables.update(state['variables'])
+    for name in state.get('removedVariables', []):
+        variables.pop(name, None)
+    return variables
+
+class VariableDeltaDecoder:
+    """Expand delta-encoded step states, one at a time, into full variable snapshots"""
+
+    def __init__(self):
+        self.frame_variables = {}
+
+    def decode(self, state):
+        if state.get('eventType', 'step') != 'step':
+            return state
+        
+        call_id = state.get('callId')
+        previous = self.frame_variables.get(call_id, {})
+        if state.get('keyframe') or state['variables'] or state.get('removedVariables'):
+            variables = apply_variable_delta(previous, state)
+            self.frame_variables[call_id] = variables
+        else:
+            # Nothing changed, share the previous snapshot instead of copying it
+            variables = previous
+        
+        full_state = {key: value for key, value in state.items() if key not in ('keyframe', 'removedVariables')}
+        full_state['variables'] = variables
+        return full_state
 
-def debug_python(code, input_data=None):
-    """Debug Python code using sys.settrace"""
+class VariableDeltaEncoder:
+    """Delta-encode the variables of simplified step states per call, one at a time"""
+
+    def __init__(self, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL):
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.frame_variables = {}
+        self.since_keyframe = {}
+
+    def encode(self, state):
+        if state.get('eventType', 'step') != 'step':
+            return state
+        
+        call_id = state.get('callId')
+        variables = state['variables']
+        previous = self.frame_variables.get(call_id)
+        self.frame_variables[call_id] = variables
+        
+        if previous is None or self.since_keyframe[call_id] >= self.keyframe_interval:
+            self.since_keyframe[call_id] = 0
+            return {**state, 'keyframe': True}
+        
+        self.since_keyframe[call_id] += 1
+        delta_state = {
+            **state,
+            'variables': {name: value for name, value in variables.items()
+                          if name not in previous or previous[name] != value},
+            'keyframe': False
+        }
+        removed = [name for name in previous if name not in variables]
+        if removed:
+            delta_state['removedVariables'] = removed
+        return delta_state
+
+def materialize_variables(debug_states):
+    """Expand delta-encoded step states back into full variable snapshots"""
+    decoder = VariableDeltaDecoder()
+    return [decoder.decode(state) for state in debug_states]
+
+def record_call_step(entry_steps, return_steps, index, state):
+    """Note the position of a simplified state if it enters or returns from its call"""
+    call_id = state.get('callId')
+    if call_id not in entry_steps:
+        entry_steps[call_id] = index
+    if state.get('eventType') == 'return' and call_id not in return_steps:
+        return_steps[call_id] = index
+
+def assign_call_steps(call_history, entry_steps, return_steps):
+    """Store the entry and return step indices on the call hierarchy records"""
+    for call in call_history:
+        call['entry_step'] = entry_steps.get(call['call_id'])
+        call['return_step'] = return_steps.get(call['call_id'])
+    
+    return call_history
+
+def rebuild_call_stack(frames, call_id):
+    """Recover the call stack of a state, outermost call first, from the frame table"""
+    call_stack = []
+    while call_id is not None and call_id in frames:
+        frame = frames[call_id]
+        call_stack.append(frame)
+        call_id = frame['parent_id']
+    call_stack.reverse()
+    return call_stack
+
+def rebuild_variables(states, index):
+    """Rebuild the full variables of a step from delta-encoded states"""
+    state = states[index]
+    if state.get('eventType', 'step') != 'step':
+        return dict(state['variables'])
+    
+    # Walk back to the closest keyframe of the same call
+    call_id = state.get('callId')
+    chain = []
+    for i in range(index, -1, -1):
+        candidate = states[i]
+        if candidate.get('eventType', 'step') != 'step' or candidate.get('callId') != call_id:
+            continue
+        chain.append(candidate)
+        if candidate.get('keyframe', True):
+            break
+    
+    variables = {}
+    for candidate in reversed(chain):
+        variables = apply_variable_delta(variables, candidate)
+    return variables
+
+def debug_python(code, input_data=None, snapshot_mode='full', keyframe_interval=DEFAULT_KEYFRAME_INTERVAL,
+                 tracer_backend='settrace', collapse_loops=False, loop_keep_iterations=DEFAULT_LOOP_KEEP_ITERATIONS,
+                 value_options=None, selection=None, budget=None, profile=False, heap=False, checkpoints=False,
+                 resume=None, progress=None):
+    """Debug Python code using sys.settrace or sys.monitoring
+    
+    tracer_backend is 'settrace', 'monitoring' or 'auto'. 'monitoring' and
+    'auto' use sys.monitoring when the interpreter supports it and fall back
+    to settrace otherwise.
+    
+    With snapshot_mode='delta' each step only carries the locals that changed
+    since the previous step of the same call, plus a full keyframe every
+    keyframe_interval steps. Use rebuild_variables() to recover any step.
+    
+    With collapse_loops, only the first and last loop_keep_iterations
+    iterations of each loop are recorded and the rest is replaced by a
+    'loop_summary' state.
+    
+    value_options (value_format, max_depth, max_items, max_string_length)
+    bound how locals are serialized; see ValueSerializer.
+    
+    selection (functions, line_ranges, breakpoints) limits tracing to part
+    of the program; see TraceSelection.
     
-    complexity = analyze_complexity(code)
-    # Save code to a temporary file
-    with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False) as temp_file:
-        temp_file.write(code)
-        temp_filename = temp_file.name
+    budget (max_steps, max_seconds, max_state_bytes) stops the program once
+    it runs too long or records too much; the states so far are returned
+    with a 'truncated' marker giving the reason. See ExecutionBudget.
+    
+    With profile, the result also has a 'profile' with the hit count and
+    time of every line and function; see LineProfile. profile_python gives
+    the same profile without recording states.
+    
+    With heap, containers in locals are stored once per version in a heap
+    table returned as 'heap', and states reference them; see HeapTable.
+    
+    With checkpoints, the result also has 'prefixCheckpoints', the state of
+    the run at the start of each top-level statement; see PrefixCheckpoints.
+    resume is one of them, completed by PreviousRun.resume_point(), for a
+    program whose statements before it are unchanged: only the statements
+    from there are traced, and 'resumedFrom' tells how the result continues
+    the earlier one (see PreviousRun.splice()). Neither works with loop
+    collapsing, selection, profile or heap.
+    
+    progress, when given, is called with the number of raw steps traced so
+    far every PROGRESS_INTERVAL steps. Raising DebugCancelled from it stops
+    the program, and the DebugCancelled propagates to the caller.
+    """
+    
+    # Set up the tracer
+    tracer = create_tracer(tracer_backend, snapshot_mode, keyframe_interval, value_options)
+    if collapse_loops:
+        tracer.enable_loop_collapsing(code, loop_keep_iterations)
+    if selection:
+        tracer.enable_selection(TraceSelection(**selection))
+    execution_budget = ExecutionBudget(**(budget or {}))
+    tracer.enable_budget(execution_budget)
+    line_profile = LineProfile() if profile else None
+    tracer.enable_profiling(line_profile)
+    heap_table = HeapTable(tracer.serializer, execution_budget) if heap else None
+    if heap_table is not None:
+        tracer.enable_heap(heap_table)
+    
+    # States are filtered and simplified as the tracer produces them
+    pipeline, call_steps = create_state_pipeline(snapshot_mode, keyframe_interval)
+    simplified_states = []
+    run_metrics = RunMetrics()
+    prefix_checkpoints = None
+    if checkpoints or resume is not None:
+        prefix_checkpoints = PrefixCheckpoints(code, tracer, pipeline, run_metrics)
+        tracer.prefix_checkpoints = prefix_checkpoints
+    if resume is not None:
+        prefix_checkpoints.restore(resume)
+    tracer.state_sink = run_metrics.timed_sink(lambda state: simplified_states.extend(pipeline.push(state)), progress)
+    output, error = execute_traced(code, tracer, input_data, run_metrics,
+                                   resume_at=resume['statement'] if resume is not None else None)
+    
+    # The output goes on the last debug state
+    with run_metrics.filtering():
+        simplified_states.extend(pipeline.finish(output, error))
+    
+    # Add call hierarchy information
+    result = {
+        'debugStates': simplified_states,
+        'callHierarchy': call_steps.assign(tracer.call_history),
+        'frames': tracer.frames,
+        'complexity': analyze_complexity(code),
+        'snapshotMode': snapshot_mode,
+        'tracerBackend': 'monitoring' if isinstance(tracer, MonitoringTracer) else 'settrace',
+        'metrics': run_metrics.summary(len(simplified_states))
+    }
+    truncation = execution_budget.truncation()
+    if truncation:
+        result['truncated'] = truncation
+    if line_profile is not None:
+        line_profile.finish()
+        result['profile'] = line_profile.export()
+    if heap_table is not None:
+        result['heap'] = heap_table.export()
+    if checkpoints:
+        result['prefixCheckpoints'] = prefix_checkpoints.export()
+    if resume is not None:
+        result['resumedFrom'] = prefix_checkpoints.resumed_from()
+    
+    print(f"Debug completed - {len(simplified_states)} states")
+    return result
 
+DEFAULT_STREAM_CHUNK_SIZE = 200
+
+def stream_debug_python(code, emit, input_data=None, snapshot_mode='full',
+                        keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, tracer_backend='settrace',
+                        collapse_loops=False, loop_keep_iterations=DEFAULT_LOOP_KEEP_ITERATIONS,
+                        value_options=None, selection=None, budget=None, profile=False, heap=False,
+                        chunk_size=DEFAULT_STREAM_CHUNK_SIZE):
+    """Debug Python code, passing simplified states to emit() in chunks while it runs
+    
+    emit() receives {'type': 'states', 'states': [...]} records as the tracer
+    produces them, then a final {'type': 'summary', ...} record with the call
+    hierarchy, program output and complexity. States are filtered online and
+    never kept in full, so memory stays bounded however long the program runs.
+    A run stopped by its budget has a 'truncated' marker in the summary, and
+    with profile the summary has the run's line profile. With heap, each
+    chunk carries the heap table versions added since the previous one.
+    """
+    tracer = create_tracer(tracer_backend, snapshot_mode, keyframe_interval, value_options)
+    if collapse_loops:
+        tracer.enable_loop_collapsing(code, loop_keep_iterations)
+    if selection:
+        tracer.enable_selection(TraceSelection(**selection))
+    execution_budget = ExecutionBudget(**(budget or {}))
+    tracer.enable_budget(execution_budget)
+    line_profile = LineProfile() if profile else None
+    tracer.enable_profiling(line_profile)
+    heap_table = HeapTable(tracer.serializer, execution_budget) if heap else None
+    if heap_table is not None:
+        tracer.enable_heap(heap_table)
+    pipeline, call_steps = create_state_pipeline(snapshot_mode, keyframe_interval, streaming=True)
+    run_metrics = RunMetrics()
+    chunk = []
+    
+    def emit_chunk():
+        record = {'type': 'states', 'states': list(chunk)}
+        if heap_table is not None:
+            record['heap'] = heap_table.take_new()
+        emit(record)
+        chunk.clear()
+    
+    def on_state(state):
+        chunk.extend(pipeline.push(state))
+        if len(chunk) >= chunk_size:
+            emit_chunk()
+    
+    tracer.state_sink = run_metrics.timed_sink(on_state)
+    output, error = execute_traced(code, tracer, input_data, run_metrics)
+    
+    with run_metrics.filtering():
+        chunk.extend(pipeline.finish(output, error))
+    if chunk:
+        emit_chunk()
+    
+    summary = {
+        'type': 'summary',
+        'totalStates': call_steps.emitted,
+        'callHierarchy': call_steps.assign(tracer.call_history),
+        'frames': tracer.frames,
+        'output': output,
+        'errorOutput': error,
+        'complexity': analyze_complexity(code),
+        'snapshotMode': snapshot_mode,
+        'tracerBackend': 'monitoring' if isinstance(tracer, MonitoringTracer) else 'settrace',
+        'metrics': run_metrics.summary(call_steps.emitted)
+    }
+    truncation = execution_budget.truncation()
+    if truncation:
+        summary['truncated'] = truncation
+    if line_profile is not None:
+        line_profile.finish()
+        summary['profile'] = line_profile.export()
+    emit(summary)
+    print(f"Debug stream completed - {call_steps.emitted} states")
+
+def record_python(code, input_data=None, tracer_backend='settrace', value_options=None,
+                  checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL, budget=None, progress=None):
+    """Run code keeping only what is needed to replay any of its steps later
+
+    Instead of a state per step, the recording has the step count, the
+    nondeterministic inputs (see InputLog) and a checkpoint every
+    checkpoint_interval steps with the position and locals at that step, so
+    its size grows with the number of checkpoints rather than steps. Pass
+    it to replay_python to get the states of any range of steps.
+    """
+    tracer = create_tracer(tracer_backend, value_options=value_options)
+    recorder = StepRecorder(checkpoint_interval, progress=progress, progress_interval=PROGRESS_INTERVAL)
+    tracer.enable_recording(recorder)
+    execution_budget = ExecutionBudget(**(budget or {}))
+    tracer.enable_budget(execution_budget)
+    
+    checkpoints = []
+    
+    def on_state(state):
+        step = recorder.take_captured()
+        if step is not None:
+            checkpoints.append(step_state(step, state))
+    
+    tracer.state_sink = on_state
+    input_log = InputLog()
+    run_metrics = RunMetrics()
+    with input_log.installed():
+        output, error = execute_traced(code, tracer, input_data, run_metrics)
+    
+    recording = {
+        'totalSteps': recorder.steps,
+        'checkpointInterval': recorder.checkpoint_interval,
+        'checkpoints': checkpoints,
+        'inputLog': input_log.export(),
+        'output': output,
+        'errorOutput': error,
+        'tracerBackend': 'monitoring' if isinstance(tracer, MonitoringTracer) else 'settrace',
+        'metrics': dict(run_metrics.summary(len(checkpoints)), rawStates=recorder.steps)
+    }
+    truncation = execution_budget.truncation()
+    if truncation:
+        recording['truncated'] = truncation
+    print(f"Recording completed - {recorder.steps} steps, {len(checkpoints)} checkpoints")
+    return recording
+
+def profile_python(code, input_data=None, tracer_backend='settrace', budget=None, progress=None):
+    """Run code counting and timing its lines and calls, without recording any state
+
+    No locals are serialized and no call history is kept, so this costs
+    little more than the trace hooks themselves. The result has the
+    profile (see LineProfile), the program's output and the step count.
+    """
+    tracer = create_tracer(tracer_backend)
+    recorder = StepRecorder(None, progress=progress, progress_interval=PROGRESS_INTERVAL)
+    tracer.enable_recording(recorder)
+    execution_budget = ExecutionBudget(**(budget or {}))
+    tracer.enable_budget(execution_budget)
+    line_profile = LineProfile()
+    tracer.enable_profiling(line_profile)
+    
+    errors = []
+    
+    def on_state(state):
+        # Only the error state of a program that failed is built
+        if state.get('errorDetails'):
+            errors.append(state['errorDetails'])
+    
+    tracer.state_sink = on_state
+    run_metrics = RunMetrics()
+    output, error = execute_traced(code, tracer, input_data, run_metrics)
+    line_profile.finish()
+    
+    result = {
+        'profile': line_profile.export(),
+        'totalSteps': recorder.steps,
+        'output': output,
+        'errorOutput': error,
+        'tracerBackend': 'monitoring' if isinstance(tracer, MonitoringTracer) else 'settrace',
+        'metrics': dict(run_metrics.summary(0), rawStates=recorder.steps)
+    }
+    if errors:
+        result['error'] = errors[-1]
+    truncation = execution_budget.truncation()
+    if truncation:
+        result['truncated'] = truncation
+    print(f"Profile completed - {recorder.steps} steps")
+    return result
+
+# An untraced timing run is repeated until this much time has been measured, at most MEASURE_MAX_REPEATS times
+MEASURE_MIN_SECONDS = 0.2
+MEASURE_MAX_REPEATS = 5
+
+def measure_python(code, input_data=None, tracer_backend='settrace', budget=None, progress=None):
+    """Count the steps of a run of code, then time it running untraced
+
+    Steps are counted as profile_python counts them, without building any
+    state, and within the budget. The program is then timed with no trace
+    hook at all, the fastest of a few runs being kept, within the budget's
+    time limit. A run that was stopped by its budget or raised is not
+    timed. Used by the empirical complexity measurement.
+    """
+    tracer = create_tracer(tracer_backend)
+    recorder = StepRecorder(None, progress=progress, progress_interval=PROGRESS_INTERVAL)
+    tracer.enable_recording(recorder)
+    execution_budget = ExecutionBudget(**(budget or {}))
+    tracer.enable_budget(execution_budget)
+
+    errors = []
+
+    def on_state(state):
+        if state.get('errorDetails'):
+            errors.append(state['errorDetails'])
+
+    tracer.state_sink = on_state
+    run_metrics = RunMetrics()
+    execute_traced(code, tracer, input_data, run_metrics)
+
+    result = {
+        'steps': recorder.steps,
+        'metrics': dict(run_metrics.summary(0), rawStates=recorder.steps)
+    }
+    truncation = execution_budget.truncation()
+    if truncation:
+        result['truncated'] = truncation
+    if errors:
+        result['error'] = errors[-1]
+    if not truncation and not errors:
+        result['seconds'] = time_untraced(code, input_data, execution_budget.max_seconds)
+    return result
+
+def time_untraced(code, input_data=None, max_seconds=None):
+    """The fastest of up to MEASURE_MAX_REPEATS runs of code without a trace hook, in seconds
+
+    The runs are stopped once they took max_seconds together; None is
+    returned if the first one had not finished by then.
+    """
+    filename, code_obj = compile_source(code)
+    timings = []
+    budget = ExecutionBudget(max_seconds=max_seconds)
+    try:
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            budget.start()
+            try:
+                while len(timings) < MEASURE_MAX_REPEATS and sum(timings) < MEASURE_MIN_SECONDS:
+                    sys.stdin = io.StringIO(input_data or '')
+                    global_vars = {'__file__': filename, '__builtins__': builtins}
+                    start = time.perf_counter()
+                    exec(code_obj, global_vars)
+                    timings.append(time.perf_counter() - start)
+            finally:
+                budget.finish()
+    except BudgetExceeded:
+        # The runs finished before the deadline still count
+        pass
+    except Exception:
+        # It ran fine traced; a program failing now depends on something else, like time or randomness
+        pass
+    finally:
+        sys.stdin = sys.__stdin__
+    return min(timings) if timings else None
+
+def replay_python(code, recording, start, count, input_data=None, tracer_backend='settrace', value_options=None,
+                  budget=None, progress=None):
+    """Re-execute a recorded program and return the states of steps [start, start + count)
+
+    CPython cannot restore a running frame stack, so the program is run
+    again from the start with the recorded inputs. Steps before start are
+    only counted, the position and locals at the checkpoints passed on the
+    way are checked against the recording, and the program is stopped right after the last requested
+    step. The result has the states, each with its step number, the frames
+    of their call stacks and whether the replay diverged from the recording.
+
+    A replay therefore costs time linear in start whatever the checkpoint
+    interval; replayedSteps in the result is the number of steps it ran,
+    and a replay stopped by its budget has a 'truncated' marker.
+    """
+    tracer = create_tracer(tracer_backend, value_options=value_options)
+    recorder = StepRecorder(recording['checkpointInterval'], (start, start + count), progress, PROGRESS_INTERVAL)
+    tracer.enable_recording(recorder)
+    execution_budget = ExecutionBudget(**(budget or {}))
+    tracer.enable_budget(execution_budget)
+    
+    expected = {checkpoint['step']: checkpoint for checkpoint in recording['checkpoints']}
+    states = []
+    frames = {}
+    diverged_at = None
+    
+    def on_state(state):
+        nonlocal diverged_at
+        step = recorder.take_captured()
+        if step is None:
+            return
+        replayed = step_state(step, state)
+        checkpoint = expected.get(step)
+        if diverged_at is None and checkpoint is not None and checkpoint != replayed:
+            diverged_at = step
+        if step >= start:
+            states.append(replayed)
+            # Frames of finished calls are dropped while replaying, so keep those of the live stack now
+            for call in tracer.current_call_stack:
+                frames[call['call_id']] = tracer.frames[call['call_id']]
+    
+    tracer.state_sink = on_state
+    input_log = InputLog(recording['inputLog']['seed'], recording['inputLog']['clockReads'])
+    try:
+        with input_log.installed():
+            execute_traced(code, tracer, input_data)
+    except ReplayDone:
+        pass
+    
+    if input_log.diverged and diverged_at is None:
+        diverged_at = recorder.steps
+    result = {
+        'states': states,
+        'frames': frames,
+        'replayedSteps': recorder.steps,
+        'diverged': diverged_at is not None,
+        'divergedAt': diverged_at
+    }
+    truncation = execution_budget.truncation()
+    if truncation:
+        result['truncated'] = truncation
+    return result
+
+def step_state(step, state):
+    """A raw tracer state in the shape of a simplified state, numbered, with nothing filtered out"""
+    replayed = {
+        'step': step,
+        'line': state['lineNumber'],
+        'function': state['functionName'],
+        'variables': clean_variables(state['variables']),
+        'callId': state.get('callId'),
+        'parentId': state.get('parentId'),
+        'stackDepth': state.get('stackDepth', 0),
+        'eventType': state.get('eventType', 'step')
+    }
+    if 'returnValue' in state:
+        replayed['returnValue'] = state['returnValue']
+    if state.get('error', False):
+        replayed['error'] = True
+    return replayed
+
+class RunMetrics:
+    """Phase timings and state counts of one debug run
+
+    Filtering runs inside the tracer's state sink while the program runs, so
+    the sink is timed on its own and that time is taken out of the execute
+    time: 'trace' is the user code plus tracing, 'filter' the state pipeline.
+    """
+
+    def __init__(self):
+        self.compile_seconds = 0.0
+        self.execute_seconds = 0.0
+        self.filter_seconds = 0.0
+        self.raw_states = 0
+
+    def timed_sink(self, sink, progress=None):
+        """Wrap a tracer state sink to count raw states and the time spent in it, reporting progress"""
+        def timed(state):
+            start = time.perf_counter()
+            sink(state)
+            self.filter_seconds += time.perf_counter() - start
+            self.raw_states += 1
+            if progress is not None and self.raw_states % PROGRESS_INTERVAL == 0:
+                progress(self.raw_states)
+        return timed
+
+    @contextmanager
+    def filtering(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.filter_seconds += time.perf_counter() - start
+
+    def summary(self, states):
+        return {
+            'rawStates': self.raw_states,
+            'states': states,
+            'compileSeconds': round(self.compile_seconds, 6),
+            'traceSeconds': round(max(0.0, self.execute_seconds - self.filter_seconds), 6),
+            'filterSeconds': round(self.filter_seconds, 6),
+            # Peak resident memory of the process that ran the job, in KB on Linux
+            'peakMemoryKB': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        }
+
+def execute_traced(code, tracer, input_data=None, run_metrics=None, resume_at=None):
+    """Run code under the tracer and return its captured (stdout, stderr)
+
+    run_metrics, a RunMetrics, receives the compile and execute times. A
+    program stopped by the tracer's budget is not an error: the states so
+    far are kept and the budget records why it stopped.
+
+    With resume_at, the top-level statements before that index run
+    untraced first, and only the rest is traced; see PrefixCheckpoints.
+    """
+    run_metrics = run_metrics or RunMetrics()
     # Capture stdout and stderr
     output_buffer = io.StringIO()
     error_buffer = io.StringIO()
     
-    # Set up the tracer
-    tracer = SimpleTracer()
-    
     # Run the code with the tracer
     try:
         with redirect_stdout(output_buffer), redirect_stderr(error_buffer):
@@ -208,30 +1207,56 @@ def debug_python(code, input_data=None):
             if input_data:
                 sys.stdin = io.StringIO(input_data)
             
-            # Set up the trace function
-            sys.settrace(tracer.trace_calls)
-            
-            # Execute the code
-            with open(temp_filename, 'r') as f:
-                code_obj = compile(f.read(), temp_filename, 'exec')
-                global_vars = {'__file__': temp_filename}
+            # Compile before tracing starts; a SyntaxError lands in the except below
+            start = time.perf_counter()
+            filename, code_obj = compile_source(code)
+            prefix_code = None
+            if resume_at is not None:
+                prefix_code, code_obj = compile_split(code, filename, resume_at)
+            tracer.source_filename = filename
+            run_metrics.compile_seconds = time.perf_counter() - start
+
+            # Execute the code. Passing the builtins module, as a real __main__ has,
+            # keeps exec() from inserting the builtins dict into the module's
+            # locals, which would otherwise be serialized on every module-level step
+            global_vars = {'__file__': filename, '__builtins__': builtins}
+            start = time.perf_counter()
+            try:
+                if prefix_code is not None:
+                    # The reused statements only run for their side effects
+                    exec(prefix_code, global_vars)
+
+                # Set up the trace function
+                tracer.start()
+                if tracer.budget is not None:
+                    tracer.budget.start()
                 exec(code_obj, global_vars)
+            finally:
+                run_metrics.execute_seconds = time.perf_counter() - start
+                # Last, so a deadline hit as the program ended is raised inside this try
+                if tracer.budget is not None:
+                    tracer.budget.finish()
             
             # Turn off tracing
-            sys.settrace(None)
+            tracer.stop()
             
+    except BudgetExceeded:
+        # The budget has the reason; the states recorded so far are the result
+        pass
     except Exception as e:
+        if isinstance(e, MemoryError) and tracer.budget is not None:
+            tracer.budget.out_of_memory()
+        
         # Capture any exceptions
         error_msg = traceback.format_exc()
         print(f"Error executing code: {error_msg}")
         
         # Add the error state if it hasn't been added by the tracer
-        if not tracer.debug_states or not tracer.debug_states[-1].get('error'):
-            tracer.debug_states.append({
+        if not tracer.last_state or not tracer.last_state.get('error'):
+            tracer.emit_state({
                 'lineNumber': -1,
                 'functionName': 'main',
                 'variables': {'exception': str(e)},
-                'callStack': [],
                 'callId': None,
                 'parentId': None,
                 'stackDepth': 0,
@@ -245,178 +1270,444 @@ def debug_python(code, input_data=None):
             })
     finally:
         # Clean up
-        import os
-        os.unlink(temp_filename)
-        sys.settrace(None)
+        tracer.stop()
         
         # Reset stdin if we modified it
         if input_data:
             sys.stdin = sys.__stdin__
     
-    # Get the captured output
-    output = output_buffer.getvalue()
-    error = error_buffer.getvalue()
-    
-    # Add output to the last debug state
-    if tracer.debug_states:
-        tracer.debug_states[-1]['output'] = output
-        if error:
-            tracer.debug_states[-1]['error_output'] = error
-    
-    # Filter debug states to reduce noise
-    filtered_states = filter_debug_states(tracer.debug_states)
-    
-    # Simplify states to only include essential information
-    simplified_states = simplify_debug_states(filtered_states)
-    
-    # Add call hierarchy information
-    result = {
-        'debugStates': simplified_states,
-        'callHierarchy': tracer.call_history
-    }
-    
-    print(f"Debug completed - {len(simplified_states)} states")
-    return result
+    tracer.flush_states()
+    return output_buffer.getvalue(), error_buffer.getvalue()
 
-def filter_debug_states(debug_states):
-    """Filter debug states to reduce noise and focus on important states"""
-    if len(debug_states) <= 10:  # If there are very few states, return them all
-        return debug_states
-    
-    # Check if there's an error state
-    has_error = any(state.get('error', False) for state in debug_states)
+class StatePipeline:
+    """Run raw tracer states through a chain of stages as the tracer produces them
     
-    if has_error:
-        # For error cases, only keep the most relevant states
-        filtered = []
-        user_code_only = []
-        
-        # First, filter to only keep user code (not traceback/internal code)
-        for state in debug_states:
-            # Skip internal Python functions used for traceback
-            if state['functionName'] in ['format_exc', 'format_exception', 'lazycache', 'checkcache']:
-                continue
-                
-            # Skip Python machinery
-            if state['functionName'].startswith('_') or state['functionName'] in ['<listcomp>', 'decode', '__init__']:
-                continue
-                
-            # Keep user code states
-            user_code_only.append(state)
-        
-        # For error cases, just take first few states and the error state
-        for i, state in enumerate(user_code_only):
-            # Keep the first few states of execution
-            if i < 5:
-                filtered.append(state)
-            
-            # Always keep error states
-            if state.get('error', False):
-                filtered.append(state)
-        
-        return filtered
-    
-    # For non-error cases, use normal filtering logic
-    filtered = []
-    prev_line = None
-    prev_func = None
-    prev_vars = {}
-    prev_event_type = None
-    
-    for state in debug_states:
-        line = state['lineNumber']
-        func = state['functionName']
+    Every stage has push(state) and finish(), both returning the states it
+    passes on to the next stage. The newest raw state is held back until
+    the next one arrives, so finish() can still attach the program output
+    to the last state before it goes through the stages.
+    """
+
+    def __init__(self, stages):
+        self.stages = stages
+        self.held = None
+
+    def push(self, state):
+        """Take one raw state and return the final states that are ready"""
+        held, self.held = self.held, state
+        if held is None:
+            return []
+        return self.run([held], 0)
+
+    def finish(self, output=None, error_output=None):
+        """Process the last state with the program output attached, then flush every stage"""
+        ready = []
+        if self.held is not None:
+            if output is not None:
+                self.held['output'] = output
+            if error_output:
+                self.held['error_output'] = error_output
+            ready = self.run([self.held], 0)
+            self.held = None
+        for index, stage in enumerate(self.stages):
+            ready.extend(self.run(stage.finish(), index + 1))
+        return ready
+
+    def run(self, states, start):
+        for stage in self.stages[start:]:
+            states = [result for state in states for result in stage.push(state)]
+        return states
+
+    def find(self, stage_class):
+        """The pipeline's stage of stage_class, or None"""
+        return next((stage for stage in self.stages if isinstance(stage, stage_class)), None)
+
+class DeltaDecodeStage:
+    """Expand delta-encoded raw states to full variables"""
+
+    def __init__(self):
+        self.decoder = VariableDeltaDecoder()
+
+    def push(self, state):
+        return [self.decoder.decode(state)]
+
+    def finish(self):
+        return []
+
+class ChangeFilterStage:
+    """Drop states that repeat the previously kept one; the last state is always kept"""
+
+    def __init__(self):
+        self.prev_kept = None
+        self.last_state = None
+
+    def push(self, state):
+        self.last_state = state
+        prev = self.prev_kept
         event_type = state.get('eventType', 'step')
-        vars_changed = has_vars_changed(prev_vars, state['variables'])
-        
-        # Always keep function entry/exit points and exception states
         keep_state = (
-            event_type != prev_event_type or  # Event type changed
+            prev is None or  # First state
+            event_type != prev.get('eventType', 'step') or  # Event type changed
             event_type in ('return', 'exception') or  # Always keep returns and exceptions
-            line != prev_line or  # Line number changed
-            func != prev_func or  # Function changed
-            vars_changed or  # Variables changed significantly
-            state.get('error', False) or  # Error states
-            len(filtered) == 0  # First state
+            state['lineNumber'] != prev['lineNumber'] or  # Line number changed
+            state['functionName'] != prev['functionName'] or  # Function changed
+            has_vars_changed(prev['variables'], state['variables']) or  # Variables changed
+            state.get('error', False)  # Error states
         )
-        
-        if keep_state:
-            filtered.append(state)
-            prev_line = line
-            prev_func = func
-            prev_vars = state['variables'].copy()
-            prev_event_type = event_type
+        if not keep_state:
+            return []
+        self.prev_kept = state
+        return [state]
+
+    def finish(self):
+        if self.last_state is not None and self.last_state != self.prev_kept:
+            self.prev_kept = self.last_state
+            return [self.last_state]
+        return []
+
+# Traceback helpers and Python machinery skipped when focusing on an error
+TRACEBACK_FUNCTIONS = ['format_exc', 'format_exception', 'lazycache', 'checkcache', '<listcomp>', 'decode', '__init__']
+
+class TraceFilterStage:
+    """Pick the states worth showing once the whole trace has been seen
     
-    # Always include the last state
-    if debug_states and (not filtered or filtered[-1] != debug_states[-1]):
-        filtered.append(debug_states[-1])
+    Short traces are kept whole. Traces with an error keep the first few
+    user-code states and the error states. Other traces go through the
+    change filter. Only the last error state of each function is kept.
+    Which rule applies is only known at the end, so every rule runs and
+    holds just the states it could still return.
+    """
+
+    SHORT_TRACE = 10
+    ERROR_CONTEXT = 5
+
+    def __init__(self):
+        self.count = 0
+        self.short = []            # Every state, while the trace is still short
+        self.changes = ChangeFilterStage()
+        self.changed = []          # States kept by the change filter, while there is no error
+        self.has_error = False
+        self.user_states = 0
+        self.focused = []          # First user-code states and error states, for traces with an error
+        self.error_positions = {}  # function -> position of its latest error state in focused
+        self.prefix = None         # PrefixCheckpoints of a resumed run, whose changed states continue a reused prefix
+
+    def push(self, state):
+        self.count += 1
+        if self.count <= self.SHORT_TRACE:
+            self.short.append(state)
         
-    return filtered
+        is_error = state.get('error', False)
+        if is_error:
+            self.has_error = True
+            self.changed = None
+        if not self.has_error:
+            self.changed.extend(self.changes.push(state))
+        
+        func_name = state['functionName']
+        if func_name not in TRACEBACK_FUNCTIONS and not func_name.startswith('_'):
+            if self.user_states < self.ERROR_CONTEXT:
+                self.focus(state)
+            if is_error:
+                self.focus(state)
+            self.user_states += 1
+        return []
 
-def simplify_debug_states(debug_states):
-    """Extract only essential information from debug states"""
-    simplified = []
-    
-    # Remove duplicate error states (keep only the last one)
-    error_funcs_seen = set()
-    filtered_states = []
-    
-    for state in reversed(debug_states):
-        # For error states, only keep one per function
+    def focus(self, state):
         if state.get('error', False):
-            if state['functionName'] not in error_funcs_seen:
-                filtered_states.insert(0, state)
-                error_funcs_seen.add(state['functionName'])
-        else:
-            filtered_states.insert(0, state)
-    
-    for state in filtered_states:
-        # Skip internal Python machinery states
-        if state['functionName'] in ['decode', '__init__', '__new__'] or state['functionName'].startswith('_'):
-            continue
-            
-        # Create a simplified state with all necessary information for visualization
-        simple_state = {
-            'line': state['lineNumber'],
-            'function': state['functionName'],
-            'variables': clean_variables(state['variables']),
-            'callId': state.get('callId'),
-            'parentId': state.get('parentId'),
-            'stackDepth': state.get('stackDepth', 0),
-            'eventType': state.get('eventType', 'step')
-        }
-        
-        # Add full call stack info with parent-child relationships
-        if 'callStack' in state and state['callStack']:
-            # Simplify callStack to contain only essential info
-            simple_state['callStack'] = [{
-                'function': call['function'],
-                'line': call['line'],
-                'call_id': call.get('call_id'),
-                'parent_id': call.get('parent_id')
-            } for call in state['callStack']]
-        
-        # Add return value if present
-        if 'returnValue' in state:
-            simple_state['returnValue'] = state['returnValue']
-        
-        # Add error information if present
+            # A later error of the same function replaces the earlier one
+            position = self.error_positions.get(state['functionName'])
+            if position is not None:
+                self.focused[position] = None
+            self.error_positions[state['functionName']] = len(self.focused)
+        self.focused.append(state)
+
+    def finish(self):
+        if self.count <= self.SHORT_TRACE:
+            return collapse_errors(self.short)
+        if self.has_error:
+            return [state for state in self.focused if state is not None]
+        if self.prefix is not None:
+            self.prefix.continue_prefix()
+        return self.changed + self.changes.finish()
+
+def collapse_errors(states):
+    """Keep only the last error state of each function"""
+    seen = set()
+    kept = []
+    for state in reversed(states):
         if state.get('error', False):
-            simple_state['error'] = True
-            if 'errorDetails' in state:
-                simple_state['errorMessage'] = state['errorDetails']['message']
-            elif 'exception_message' in state['variables']:
-                simple_state['errorMessage'] = state['variables']['exception_message']
-        
-        # Add output only to the last state
-        if 'output' in state and state['output']:
-            simple_state['output'] = state['output']
+            if state['functionName'] in seen:
+                continue
+            seen.add(state['functionName'])
+        kept.append(state)
+    kept.reverse()
+    return kept
+
+class SimplifyStage:
+    """Reduce states to what the frontend shows, dropping machinery and empty steps"""
+
+    def __init__(self):
+        self.pushed = 0
+        self.dropped = []  # Positions of the dropped states among those pushed
+
+    def push(self, state):
+        simple_state = simplify_state(state)
+        self.pushed += 1
+        if simple_state is None:
+            self.dropped.append(self.pushed - 1)
+            return []
+        return [simple_state]
+
+    def finish(self):
+        return []
+
+class DeltaEncodeStage:
+    """Delta-encode the variables of simplified states, with periodic keyframes"""
+
+    def __init__(self, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL):
+        self.encoder = VariableDeltaEncoder(keyframe_interval)
+
+    def push(self, state):
+        return [self.encoder.encode(state)]
+
+    def finish(self):
+        return []
+
+class CallStepStage:
+    """Count final states and note where each call enters and returns"""
+
+    def __init__(self):
+        self.emitted = 0
+        self.entry_steps = {}
+        self.return_steps = {}
+
+    def push(self, state):
+        record_call_step(self.entry_steps, self.return_steps, self.emitted, state)
+        self.emitted += 1
+        return [state]
+
+    def finish(self):
+        return []
+
+    def assign(self, call_history):
+        return assign_call_steps(call_history, self.entry_steps, self.return_steps)
+
+def create_state_pipeline(snapshot_mode='full', keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, streaming=False):
+    """Build the filter/simplify pipeline, returning it with its CallStepStage
+    
+    Streamed states cannot be taken back, so streaming pipelines only use
+    the change filter and keep every error state.
+    """
+    delta = snapshot_mode == 'delta'
+    call_steps = CallStepStage()
+    stages = [
+        DeltaDecodeStage() if delta else None,
+        ChangeFilterStage() if streaming else TraceFilterStage(),
+        SimplifyStage(),
+        DeltaEncodeStage(keyframe_interval) if delta else None,
+        call_steps
+    ]
+    return StatePipeline([stage for stage in stages if stage is not None]), call_steps
+
+class PrefixCheckpoints:
+    """The state of a traced run at the start of each of its top-level statements
+
+    A later run of an edited program can resume from a checkpoint whose
+    preceding statements did not change: those statements run untraced,
+    only for their side effects, the tracer and the state pipeline are put
+    back as they were at the checkpoint, and only the rest is traced. Its
+    final states then continue the earlier run's first ones.
+
+    Between top-level statements only the module call is live, so a
+    checkpoint is small: counters, the module's locals and the few raw
+    states the filters hold on to. Where the final states of a checkpoint
+    start is only known once the run is over, and only when the change
+    filter picked them; for traces kept whole or focused on an error,
+    export() returns None.
+    """
+
+    def __init__(self, code, tracer, pipeline, run_metrics):
+        self.tracer = tracer
+        self.pipeline = pipeline
+        self.run_metrics = run_metrics
+        self.decode = pipeline.find(DeltaDecodeStage)
+        self.trace_filter = pipeline.find(TraceFilterStage)
+        self.simplify = pipeline.find(SimplifyStage)
+        self.encode = pipeline.find(DeltaEncodeStage)
+        self.call_steps = pipeline.find(CallStepStage)
+
+        self.statement_at = {}  # line -> index of the top-level statement it belongs to
+        self.starts = {}        # index -> first line, of the statements a run can resume at
+        for index, node in enumerate(top_level_statements(code) or []):
+            first = statement_first_line(node)
+            for line in range(first, node.end_lineno + 1):
+                self.statement_at.setdefault(line, index)
+            # A string on its own would become the docstring of the code compiled from it on
+            is_string = isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) \
+                and isinstance(node.value.value, str)
+            if index and self.statement_at[first] == index and not is_string:
+                self.starts[index] = first
+        self.current = None
+        self.checkpoints = []
+
+        # What came before the run's own states and calls, when it resumed from a checkpoint
+        self.resume = None
+        self.changed_offset = 0
+        self.states_offset = 0
+        self.calls_offset = 0
+
+    def line(self, line_no):
+        """Note a module-level line, taking a checkpoint if it starts a new statement"""
+        index = self.statement_at.get(line_no)
+        if index is None or index == self.current:
+            return
+        self.current = index
+        if self.starts.get(index) == line_no and not self.trace_filter.has_error:
+            self.take(index)
+
+    def take(self, index):
+        tracer = self.tracer
+        trace_filter = self.trace_filter
+        call_info = tracer.current_call_stack[0]
+        call_id = call_info['call_id']
+        snapshot = tracer.frame_snapshots.get(call_id)
+        self.checkpoints.append({
+            'statement': index,
+            'call_info': dict(call_info),
+            'call_ids': tracer.call_id_counter,
+            'calls': self.calls_offset + len(tracer.call_history),
+            'module_children': len(tracer.call_records[call_id]['children']),
+            'snapshot': snapshot and {'values': dict(snapshot['values']),
+                                      'since_keyframe': snapshot['since_keyframe']},
+            'steps': tracer.budget.steps,
+            'state_bytes': tracer.budget.state_bytes,
+            'raw_states': self.run_metrics.raw_states,
+            'held': self.pipeline.held,
+            'decoded': self.decode and self.decode.decoder.frame_variables.get(call_id),
+            'count': trace_filter.count,
+            # Past SHORT_TRACE states the whole trace is never kept
+            'short': list(trace_filter.short) if trace_filter.count <= trace_filter.SHORT_TRACE else [],
+            'prev_kept': trace_filter.changes.prev_kept,
+            'last_state': trace_filter.changes.last_state,
+            'changed': self.changed_offset + len(trace_filter.changed),
+            'user_states': trace_filter.user_states,
+            'focused': list(trace_filter.focused)
+        })
+
+    def restore(self, resume):
+        """Put the tracer and pipeline back at a checkpoint, before running the statements from there
+
+        resume is a checkpoint of an earlier run with what that run's result
+        tells about it: the module's call record and frame, 'states', its
+        final states before the checkpoint, 'entry_step', the module's first
+        one if any, and in delta mode 'encoding', the module's variables and
+        steps since its keyframe as VariableDeltaEncoder last saw them.
+        """
+        tracer = self.tracer
+        call_info = dict(resume['call_info'])
+        call_id = call_info['call_id']
+        tracer.resumed_call = call_info
+        tracer.call_id_counter = resume['call_ids']
+        module_record = dict(resume['module_record'])
+        tracer.call_history.append(module_record)
+        tracer.call_records[call_id] = module_record
+        tracer.frames[call_id] = resume['module_frame']
+        if resume['snapshot'] is not None:
+            tracer.frame_snapshots[call_id] = {'objects': {}, 'values': dict(resume['snapshot']['values']),
+                                               'since_keyframe': resume['snapshot']['since_keyframe']}
+        tracer.budget.steps = resume['steps']
+        tracer.budget.state_bytes = resume['state_bytes']
+        self.run_metrics.raw_states = resume['raw_states']
+
+        # The held state may still get the program output attached
+        held = resume['held'] and dict(resume['held'])
+        tracer.last_state = self.pipeline.held = held
+        if self.decode is not None and resume['decoded'] is not None:
+            self.decode.decoder.frame_variables[call_id] = resume['decoded']
+        trace_filter = self.trace_filter
+        trace_filter.count = resume['count']
+        trace_filter.short = list(resume['short'])
+        trace_filter.changes.prev_kept = resume['prev_kept']
+        trace_filter.changes.last_state = resume['last_state']
+        trace_filter.user_states = resume['user_states']
+        trace_filter.focused = list(resume['focused'])
+        trace_filter.prefix = self
+
+        self.resume = resume
+        self.current = resume['statement'] - 1
+        self.changed_offset = resume['changed']
+        self.calls_offset = resume['calls'] - 1
+
+    def continue_prefix(self):
+        """Start the final-state stages where they were after the reused states"""
+        resume = self.resume
+        call_id = resume['call_info']['call_id']
+        self.states_offset = resume['states']
+        self.call_steps.emitted = resume['states']
+        if resume['entry_step'] is not None:
+            self.call_steps.entry_steps[call_id] = resume['entry_step']
+        if self.encode is not None and resume['encoding'] is not None:
+            variables, since_keyframe = resume['encoding']
+            self.encode.encoder.frame_variables[call_id] = variables
+            self.encode.encoder.since_keyframe[call_id] = since_keyframe
+
+    def resumed_from(self):
+        """Where a resumed run's result continues the earlier one: statement index, final states and calls"""
+        return {'statement': self.resume['statement'], 'states': self.states_offset, 'calls': self.resume['calls']}
+
+    def export(self):
+        """The checkpoints, each with 'states', the number of final states before it, or None"""
+        trace_filter = self.trace_filter
+        if trace_filter.count <= trace_filter.SHORT_TRACE or trace_filter.has_error:
+            return None
+        dropped = self.simplify.dropped
+        for checkpoint in self.checkpoints:
+            kept = checkpoint['changed'] - self.changed_offset
+            checkpoint['states'] = self.states_offset + kept - bisect.bisect_left(dropped, kept)
+        return self.checkpoints
+
+def simplify_state(state):
+    """Extract the essential information of one state, or None if it is not worth showing"""
+    # Skip internal Python machinery states
+    if state['functionName'] in ['decode', '__init__', '__new__'] or state['functionName'].startswith('_'):
+        return None
         
-        # Only add the state if it has useful information
-        if simple_state['variables'] or state.get('error', False) or state.get('eventType') != 'step':
-            simplified.append(simple_state)
+    # Create a simplified state with all necessary information for visualization
+    simple_state = {
+        'line': state['lineNumber'],
+        'function': state['functionName'],
+        'variables': clean_variables(state['variables']),
+        'callId': state.get('callId'),
+        'parentId': state.get('parentId'),
+        'stackDepth': state.get('stackDepth', 0),
+        'eventType': state.get('eventType', 'step')
+    }
     
-    return simplified
+    # Add return value if present
+    if 'returnValue' in state:
+        simple_state['returnValue'] = state['returnValue']
+    
+    # Add the summary of collapsed loop iterations
+    if 'loopSummary' in state:
+        simple_state['loopSummary'] = state['loopSummary']
+    
+    # Add error information if present
+    if state.get('error', False):
+        simple_state['error'] = True
+        if 'errorDetails' in state:
+            simple_state['errorMessage'] = state['errorDetails']['message']
+        elif 'exception_message' in state['variables']:
+            simple_state['errorMessage'] = state['variables']['exception_message']
+    
+    # Add output only to the last state
+    if 'output' in state and state['output']:
+        simple_state['output'] = state['output']
+    
+    # Only keep the state if it has useful information
+    if simple_state['variables'] or state.get('error', False) or state.get('eventType') != 'step':
+        return simple_state
+    return None
 
 def clean_variables(variables):
     """Clean variable values to make them simpler"""
@@ -453,75 +1744,3 @@ def has_vars_changed(prev_vars, current_vars):
             return True
             
     return False
-
-def analyze_complexity(code):
-    """Analyze time and space complexity of Python code"""
-    # Simple heuristic-based analysis
-    complexity = {
-        'time': 'O(1)',
-        'space': 'O(1)',
-        'has_recursion': False,
-        'has_loops': False,
-        'loop_details': []
-    }
-    
-    try:
-        # Check for recursion
-        if 'def ' in code and '(' in code and ')' in code:
-            # Simple check for recursive calls
-            function_lines = [line for line in code.split('\n') if line.strip().startswith('def ')]
-            for func_line in function_lines:
-                func_name = func_line.split('def ')[1].split('(')[0].strip()
-                if f"{func_name}(" in code.replace(func_line, ''):
-                    complexity['has_recursion'] = True
-                    complexity['time'] = 'O(2^n)'  # Default for recursion
-                    complexity['space'] = 'O(n)'   # Default stack depth for recursion
-        
-        # Check for loops
-        loops = ['for ', 'while ']
-        loop_counts = {loop: code.count(loop) for loop in loops}
-        total_loops = sum(loop_counts.values())
-        
-        if total_loops > 0:
-            complexity['has_loops'] = True
-            complexity['loop_details'] = []
-            
-            # Simple loop analysis
-            if total_loops == 1:
-                complexity['time'] = 'O(n)'
-            elif total_loops == 2:
-                complexity['time'] = 'O(n²)'
-            else:
-                complexity['time'] = f'O(n^{total_loops})'
-                
-            # Nested loop check
-            lines = code.split('\n')
-            indent_level = 0
-            max_nesting = 0
-            current_nesting = 0
-            
-            for line in lines:
-                stripped = line.strip()
-                if any(stripped.startswith(loop) for loop in loops):
-                    current_nesting += 1
-                    max_nesting = max(max_nesting, current_nesting)
-                    complexity['loop_details'].append({
-                        'type': 'for' if stripped.startswith('for') else 'while',
-                        'line': line,
-                        'nesting_level': current_nesting
-                    })
-                elif stripped.startswith('if ') or stripped.startswith('elif '):
-                    # Not counting conditionals toward nesting for complexity
-                    pass
-                else:
-                    # Reset nesting when we exit a block
-                    if stripped and not stripped.startswith(' ') and not stripped.startswith('#'):
-                        current_nesting = 0
-            
-            if max_nesting > 1:
-                complexity['time'] = f'O(n^{max_nesting})'
-                
-    except Exception as e:
-        print(f"Complexity analysis error: {str(e)}")
-    
-    return complexity
\ No newline at end of file
@@ -0,0 +1,124 @@
+import json
+
+MAX_STEP_RANGES = 20  # Step ranges listed per node; count has the full number of calls
+
+class RecursionTree:
+    """Call hierarchy with identical subtrees merged into shared nodes
+
+    Two calls share a node when they have the same function, argument
+    values and return value and their children share nodes too, so the
+    tree grows with the number of distinct subproblems instead of the
+    number of calls: fib(20) without memoization has 21 nodes instead of
+    21891 calls. Consecutive calls to the same node become one child with
+    a multiplicity.
+
+    Memoized calls end up in their own nodes, since a cache hit has no
+    children while the first call of the same subproblem does; such leaves
+    are flagged with memoHit.
+    """
+
+    def __init__(self, call_history):
+        self.nodes = []   # node id -> node
+        self.roots = []   # [node id, multiplicity] of top-level calls
+        self.total_calls = len(call_history)
+        self.subproblems = {}  # (function, args) -> number of calls
+        self.build(call_history)
+
+    def build(self, call_history):
+        node_ids = {}  # subtree key -> node id
+        call_nodes = {}  # call_id -> node id
+
+        # Children are recorded after their parent, so walking backwards
+        # reaches every call after all of its children
+        for record in reversed(call_history):
+            children = run_lengths(call_nodes[child] for child in record['children'] if child in call_nodes)
+            args_key = stable_key(record.get('args'))
+            key = (record['function'], args_key, stable_key(record.get('return_value')), tuple(map(tuple, children)))
+            node_id = node_ids.get(key)
+            if node_id is None:
+                node_id = len(self.nodes)
+                node_ids[key] = node_id
+                self.nodes.append({
+                    'id': node_id,
+                    'function': record['function'],
+                    'args': record.get('args', {}),
+                    'returnValue': record.get('return_value'),
+                    'children': children,
+                    'calls': 1 + sum(self.nodes[child]['calls'] * count for child, count in children),
+                    'height': 1 + max((self.nodes[child]['height'] for child, _ in children), default=0),
+                    'count': 0,
+                    'stepRanges': [],
+                    'subproblem': (record['function'], args_key)
+                })
+            call_nodes[record['call_id']] = node_id
+
+        for record in call_history:
+            node = self.nodes[call_nodes[record['call_id']]]
+            node['count'] += 1
+            entry_step, return_step = record.get('entry_step'), record.get('return_step')
+            if entry_step is not None and len(node['stepRanges']) < MAX_STEP_RANGES:
+                node['stepRanges'].append([entry_step, return_step])
+            self.subproblems[node['subproblem']] = self.subproblems.get(node['subproblem'], 0) + 1
+
+        roots = [call_nodes[record['call_id']] for record in call_history
+                 if record['parent_id'] is None or record['parent_id'] not in call_nodes]
+        self.roots = run_lengths(roots)
+
+        # A leaf is a cache hit when the same subproblem was computed with children elsewhere
+        computed = {node['subproblem'] for node in self.nodes if node['children']}
+        for node in self.nodes:
+            node['memoHit'] = not node['children'] and node['subproblem'] in computed
+            node['subproblemCalls'] = self.subproblems[node['subproblem']]
+
+    def view(self, node_id=None, depth=None):
+        """The tree below node_id (the roots by default), cut after depth levels
+
+        Nodes at the cut keep their child ids but have expanded False; ask
+        for view(child_id) to load the next levels.
+        """
+        start = self.roots if node_id is None else self.nodes[node_id]['children']
+        nodes = {}
+        level = [child for child, _ in start]
+        remaining = depth
+        while level and (remaining is None or remaining > 0):
+            next_level = []
+            for child in level:
+                if child in nodes:
+                    continue
+                nodes[child] = self.export(child, True)
+                next_level.extend(grandchild for grandchild, _ in self.nodes[child]['children'])
+            level = next_level
+            remaining = None if remaining is None else remaining - 1
+        for child in level:
+            if child not in nodes:
+                nodes[child] = self.export(child, False)
+
+        result = {
+            'nodes': nodes,
+            'totalCalls': self.total_calls,
+            'distinctNodes': len(self.nodes),
+            'distinctSubproblems': len(self.subproblems)
+        }
+        if node_id is None:
+            result['roots'] = self.roots
+        else:
+            result['node'] = node_id
+        return result
+
+    def export(self, node_id, expanded):
+        node = {key: value for key, value in self.nodes[node_id].items() if key != 'subproblem'}
+        node['expanded'] = expanded or not node['children']
+        return node
+
+def run_lengths(items):
+    """[[item, times repeated consecutively], ...]"""
+    runs = []
+    for item in items:
+        if runs and runs[-1][0] == item:
+            runs[-1][1] += 1
+        else:
+            runs.append([item, 1])
+    return runs
+
+def stable_key(value):
+    return json.dumps(value, sort_keys=True, default=str)
@@ -0,0 +1,116 @@
+import os
+import sys
+import time
+import types
+import random
+from contextlib import contextmanager
+
+DEFAULT_CHECKPOINT_INTERVAL = 10000
+
+# time functions whose results are logged when recording and fed back when replaying
+CLOCK_FUNCTIONS = ('time', 'time_ns', 'monotonic', 'monotonic_ns', 'perf_counter', 'perf_counter_ns',
+                   'process_time', 'process_time_ns', 'thread_time', 'thread_time_ns')
+
+class ReplayDone(BaseException):
+    """Raised inside a replayed program once the requested steps were captured"""
+
+class InputLog:
+    """The nondeterministic inputs of a run: its random seed and clock reads
+
+    Recording logs every clock read of the program; replaying returns the
+    logged values in order, so the program takes the same path again. stdin
+    needs no log, it is the run's input_data. The program's own
+    random.Random() instances, os.urandom and C-level clocks such as
+    datetime.now() are not covered.
+    """
+
+    def __init__(self, seed=None, clock_reads=None):
+        self.replaying = clock_reads is not None
+        self.seed = seed if seed is not None else int.from_bytes(os.urandom(8), 'big')
+        self.clock_reads = list(clock_reads or ())
+        self.position = 0
+        self.diverged = False  # Set when a replay reads the clock more often than the recording
+
+    def read_clock(self, function):
+        if not self.replaying:
+            value = function()
+            self.clock_reads.append(value)
+            return value
+        if self.position < len(self.clock_reads):
+            self.position += 1
+            return self.clock_reads[self.position - 1]
+        self.diverged = True
+        return function()
+
+    @contextmanager
+    def installed(self):
+        """Seed random and give the program a time module whose clocks go through the log
+
+        The debugger's own modules keep the real time module; only imports
+        made while the program runs get the logged one.
+        """
+        clock = types.ModuleType('time', time.__doc__)
+        clock.__dict__.update({name: value for name, value in vars(time).items() if not name.startswith('__')})
+        for name in CLOCK_FUNCTIONS:
+            if hasattr(time, name):
+                setattr(clock, name, self.logged(getattr(time, name)))
+
+        random_state = random.getstate()
+        random.seed(self.seed)
+        sys.modules['time'] = clock
+        try:
+            yield
+        finally:
+            sys.modules['time'] = time
+            random.setstate(random_state)
+
+    def logged(self, function):
+        def read():
+            return self.read_clock(function)
+        read.__name__ = function.__name__
+        return read
+
+    def export(self):
+        return {'seed': self.seed, 'clockReads': self.clock_reads}
+
+class StepRecorder:
+    """Step counter of a record, replay or profile-only run, deciding which states are built
+
+    Every state the tracer would produce counts as a step, but building one
+    means serializing the frame's locals, so only the states asked for are
+    built: the checkpoints, one every checkpoint_interval steps, and when
+    replaying the steps of window, a (start, end) range. Everything else is
+    counted and skipped, which keeps a run of millions of steps cheap. With
+    no checkpoint_interval and no window no state is built at all.
+
+    A replay stops the program with ReplayDone once it is past window.
+    progress is called with the step count every progress_interval steps.
+    """
+
+    def __init__(self, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL, window=None, progress=None,
+                 progress_interval=1000):
+        self.checkpoint_interval = max(1, checkpoint_interval) if checkpoint_interval else None
+        self.window = window
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.steps = 0
+        self.captured = None  # Number of the step whose state is being built
+
+    def step(self):
+        """Count a step and return whether its state should be built"""
+        step = self.steps
+        if self.window is not None and step >= self.window[1]:
+            raise ReplayDone()
+        self.steps += 1
+        if self.progress is not None and self.steps % self.progress_interval == 0:
+            self.progress(self.steps)
+        if ((self.checkpoint_interval is not None and step % self.checkpoint_interval == 0)
+                or (self.window is not None and step >= self.window[0])):
+            self.captured = step
+            return True
+        return False
+
+    def take_captured(self):
+        """The number of the step whose state was just built, or None for states built outside the run"""
+        step, self.captured = self.captured, None
+        return step
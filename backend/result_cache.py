@@ -0,0 +1,166 @@
+import os
+import ast
+import sys
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Importing any of these makes a program's trace depend on more than its code and input
+NONDETERMINISTIC_MODULES = {
+    'random', 'secrets', 'uuid', 'time', 'datetime', 'os', 'sys', 'io', 'pathlib',
+    'shutil', 'tempfile', 'glob', 'socket', 'ssl', 'select', 'urllib', 'http',
+    'requests', 'subprocess', 'threading', 'multiprocessing', 'asyncio',
+    'concurrent', 'signal', 'sqlite3', 'numpy'
+}
+# Builtins that read the outside world or expose object addresses
+NONDETERMINISTIC_BUILTINS = {'open', 'id', 'hash', 'exec', 'eval', 'compile', '__import__', 'globals'}
+
+def is_deterministic(code):
+    """Guess whether code always produces the same trace for the same input
+
+    Only a static check: programs importing randomness, clocks or I/O, or
+    calling builtins like open() or id(), are never cached.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        # Syntax errors are as deterministic as it gets
+        return True
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            if any(alias.name.split('.')[0] in NONDETERMINISTIC_MODULES for alias in node.names):
+                return False
+        elif isinstance(node, ast.ImportFrom):
+            if node.level == 0 and node.module and node.module.split('.')[0] in NONDETERMINISTIC_MODULES:
+                return False
+        elif isinstance(node, ast.Name) and node.id in NONDETERMINISTIC_BUILTINS:
+            return False
+    return True
+
+def cache_key(code, input_data, options, tracer_version):
+    """Content hash of everything that determines a debug_python result"""
+    payload = json.dumps({
+        'code': code,
+        'input': input_data or '',
+        'options': options,
+        'tracer': tracer_version,
+        'python': sys.version
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class ResultCache:
+    """LRU cache of serialized debug results, bounded by bytes, with an optional disk tier
+
+    Results are kept as JSON bytes so their size is exact and callers can
+    never mutate a cached entry. Entries evicted from memory stay on disk
+    when disk_dir is set, and disk hits are promoted back into memory.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_MAX_BYTES, disk_dir=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+        self.entries = OrderedDict()  # key -> JSON bytes, least recently used first
+        self.size = 0
+        self.lock = threading.Lock()
+        self.counters = {
+            'hits': 0,
+            'diskHits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0,
+            'uncacheable': 0
+        }
+
+    def get(self, key):
+        """Return the cached result for key, or None"""
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+                self.counters['hits'] += 1
+                return json.loads(data)
+
+        data = self.read_disk(key)
+        with self.lock:
+            if data is None:
+                self.counters['misses'] += 1
+                return None
+            self.counters['diskHits'] += 1
+            self.store_memory(key, data)
+        return json.loads(data)
+
+    def put(self, key, result):
+        """Cache a result; results that cannot be serialized are skipped"""
+        try:
+            data = json.dumps(result).encode('utf-8')
+        except (TypeError, ValueError):
+            self.count('uncacheable')
+            return
+
+        with self.lock:
+            self.counters['stores'] += 1
+            self.store_memory(key, data)
+        self.write_disk(key, data)
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def stats(self):
+        """Return a snapshot of the cache counters"""
+        with self.lock:
+            lookups = self.counters['hits'] + self.counters['diskHits'] + self.counters['misses']
+            return dict(self.counters, entries=len(self.entries), bytes=self.size, maxBytes=self.max_bytes,
+                        hitRate=round((lookups - self.counters['misses']) / lookups, 4) if lookups else 0.0)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def store_memory(self, key, data):
+        """Insert into the memory tier and evict down to max_bytes; the caller holds the lock"""
+        if len(data) > self.max_bytes:
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self.entries[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.counters['evictions'] += 1
+
+    def disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self.disk_path(key), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def write_disk(self, key, data):
+        if not self.disk_dir:
+            return
+        # Write to a temporary file first so readers never see a partial entry
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self.disk_path(key))
+        except OSError:
+            # A full or read-only disk only costs future disk hits
+            pass
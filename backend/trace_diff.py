@@ -0,0 +1,71 @@
+from python_debugger import VariableDeltaDecoder
+from heap_table import resolve_heap_refs
+
+def compare_traces(results):
+    """Compare debug_python results of one program run on several inputs
+
+    Every run is compared step by step with the first successful one, the
+    reference. A run's divergence is the first step where its control flow
+    (line, function or event) differs, or where the variables differ while
+    the control flow is still the same. Failed runs are None in results and
+    are only listed.
+    """
+    runs = []
+    reference = None
+    reference_index = None
+    for index, result in enumerate(results):
+        if result is None:
+            runs.append({'input': index, 'failed': True})
+            continue
+        states = result['debugStates']
+        if result.get('snapshotMode') == 'delta':
+            decoder = VariableDeltaDecoder()
+            states = [decoder.decode(state) for state in states]
+        if 'heap' in result:
+            # Heap ids are per run, so runs are compared by the values they reference
+            states = [dict(state, variables=resolve_heap_refs(state['variables'], result['heap']))
+                      for state in states]
+        last = states[-1] if states else {}
+        run = {
+            'input': index,
+            'steps': len(states),
+            'output': last.get('output', ''),
+            'error': next((state.get('errorMessage', True) for state in states if state.get('error')), None),
+            'truncated': result.get('truncated', {}).get('reason'),
+            'divergence': None
+        }
+        if reference is None:
+            reference, reference_index = states, index
+        else:
+            run['divergence'] = first_divergence(reference, states)
+        runs.append(run)
+
+    completed = [run for run in runs if not run.get('failed')]
+    return {
+        'reference': reference_index,
+        'runs': runs,
+        'sameControlFlow': all(run['divergence'] is None or run['divergence']['kind'] == 'values'
+                               for run in completed),
+        'distinctOutputs': len({run['output'] for run in completed})
+    }
+
+def first_divergence(reference, states):
+    """The first step where states stop matching reference, or None if they never do"""
+    for step, (expected, actual) in enumerate(zip(reference, states)):
+        if control_point(expected) != control_point(actual):
+            return {'step': step, 'kind': 'controlFlow',
+                    'referenceLine': expected.get('line'), 'line': actual.get('line')}
+        if expected.get('variables') != actual.get('variables'):
+            names = sorted(name for name in set(expected.get('variables', {})) | set(actual.get('variables', {}))
+                           if expected.get('variables', {}).get(name) != actual.get('variables', {}).get(name))
+            return {'step': step, 'kind': 'values', 'line': actual.get('line'), 'variables': names}
+    if len(reference) != len(states):
+        # One run went on after the other ended
+        step = min(len(reference), len(states))
+        return {'step': step, 'kind': 'controlFlow',
+                'referenceLine': reference[step].get('line') if step < len(reference) else None,
+                'line': states[step].get('line') if step < len(states) else None}
+    return None
+
+def control_point(state):
+    return state.get('line'), state.get('function'), state.get('eventType', 'step')
@@ -0,0 +1,88 @@
+class TraceSelection:
+    """The parts of a program to trace: named functions, line ranges and breakpoints
+
+    A line is recorded when its function is one of functions (by name or
+    qualified name), when it falls in one of line_ranges ((start, end)
+    pairs, inclusive), or when it has a breakpoint whose condition holds.
+    Breakpoints are {'line': n, 'condition': expression}; conditions are
+    compiled once here and evaluated in the frame's globals and locals.
+
+    Code objects with no selected line never get a local tracer, so
+    everything outside the selection runs at close to native speed.
+    """
+
+    def __init__(self, functions=None, line_ranges=None, breakpoints=None):
+        functions = as_list(functions, 'functions')
+        if not all(isinstance(name, str) for name in functions):
+            raise ValueError('functions must be a list of function names')
+        self.functions = set(functions)
+        self.line_ranges = []
+        for line_range in as_list(line_ranges, 'line_ranges'):
+            if not isinstance(line_range, (list, tuple)) or len(line_range) != 2:
+                raise ValueError(f'Invalid line range: {line_range!r}, expected [start, end]')
+            start, end = int(line_range[0]), int(line_range[1])
+            if start > end:
+                raise ValueError(f'Invalid line range: {start}-{end}')
+            self.line_ranges.append((start, end))
+
+        self.breakpoints = {}  # line -> compiled conditions, None for an unconditional breakpoint
+        for breakpoint in as_list(breakpoints, 'breakpoints'):
+            if not isinstance(breakpoint, dict) or 'line' not in breakpoint:
+                raise ValueError(f'Invalid breakpoint: {breakpoint!r}, expected {{"line": n, "condition": ...}}')
+            line = int(breakpoint['line'])
+            condition = breakpoint.get('condition')
+            if condition is not None and not isinstance(condition, str):
+                raise ValueError(f'The condition of the breakpoint on line {line} must be a string')
+            if condition:
+                try:
+                    condition = compile(condition, f'<breakpoint line {line}>', 'eval')
+                except SyntaxError as e:
+                    raise ValueError(f'Invalid condition for the breakpoint on line {line}: {e.msg}')
+            self.breakpoints.setdefault(line, []).append(condition or None)
+
+        self.selected_code = {}  # code -> whether any of its lines can be recorded
+
+    def is_function_selected(self, code):
+        return code.co_name in self.functions or getattr(code, 'co_qualname', None) in self.functions
+
+    def in_line_ranges(self, line):
+        return any(start <= line <= end for start, end in self.line_ranges)
+
+    def traces_code(self, code):
+        """Whether frames running code need a local tracer at all"""
+        selected = self.selected_code.get(code)
+        if selected is None:
+            selected = self.is_function_selected(code) or any(
+                line is not None and (self.in_line_ranges(line) or line in self.breakpoints)
+                for _, _, line in code.co_lines()
+            )
+            self.selected_code[code] = selected
+        return selected
+
+    def never_records(self, code, line):
+        """Whether a line of code is outside the selection whatever the frame's state"""
+        return not (self.is_function_selected(code) or self.in_line_ranges(line) or line in self.breakpoints)
+
+    def records_line(self, frame, line):
+        """Whether the step at line of frame is recorded, evaluating breakpoint conditions"""
+        if self.is_function_selected(frame.f_code) or self.in_line_ranges(line):
+            return True
+        conditions = self.breakpoints.get(line)
+        if conditions is None:
+            return False
+        return any(condition is None or self.condition_holds(condition, frame) for condition in conditions)
+
+    def condition_holds(self, condition, frame):
+        try:
+            return bool(eval(condition, frame.f_globals, frame.f_locals))
+        except Exception:
+            # Like pdb, a condition that fails to evaluate stops at the breakpoint
+            return True
+
+def as_list(value, name):
+    """A list or tuple option, [] when missing; a string or a lone dict is an error, not a sequence"""
+    if value is None:
+        return []
+    if not isinstance(value, (list, tuple)):
+        raise ValueError(f'{name} must be a list, got {type(value).__name__}')
+    return value
@@ -0,0 +1,154 @@
+from array import array
+
+COLUMNAR_FORMAT = 'columnar-v1'
+
+# Keys stored in columns; anything else on a state goes to the sparse extras table
+COLUMN_KEYS = ('line', 'function', 'variables', 'callId', 'parentId', 'stackDepth', 'eventType', 'keyframe')
+
+class StringTable:
+    """Interned strings, referenced by index; None is -1"""
+
+    def __init__(self, strings=None):
+        self.strings = list(strings or [])
+        self.index = {string: position for position, string in enumerate(self.strings)}
+
+    def intern(self, string):
+        if string is None:
+            return -1
+        position = self.index.get(string)
+        if position is None:
+            position = len(self.strings)
+            self.strings.append(string)
+            self.index[string] = position
+        return position
+
+    def get(self, position):
+        return None if position < 0 else self.strings[position]
+
+class TraceStore:
+    """Simplified debug states kept as parallel typed arrays instead of one dict per step
+
+    Line, function, call, parent, depth, event type and keyframe flag are
+    columns of machine integers; function names, call ids, event types and
+    variable names are interned once in a string table. Variables live in
+    a side table: step i owns the entries var_offsets[i]:var_offsets[i + 1]
+    of var_names and var_values. Rare keys (return values, errors, output,
+    loop summaries) go in a sparse per-step dict. Indexing a store rebuilds
+    the original state dicts on demand.
+    """
+
+    def __init__(self):
+        self.strings = StringTable()
+        self.line = array('i')
+        self.function = array('i')
+        self.call_id = array('i')
+        self.parent_id = array('i')
+        self.depth = array('i')
+        self.event = array('i')
+        self.keyframe = array('b')  # -1 when the state has no keyframe flag
+        self.var_offsets = array('I', [0])
+        self.var_names = array('i')
+        self.var_values = []
+        self.extras = {}  # step -> {key: value} for keys outside the columns
+
+    @classmethod
+    def from_states(cls, states):
+        store = cls()
+        for state in states:
+            store.append(state)
+        return store
+
+    def append(self, state):
+        intern = self.strings.intern
+        self.line.append(state.get('line', -1))
+        self.function.append(intern(state.get('function')))
+        self.call_id.append(intern(state.get('callId')))
+        self.parent_id.append(intern(state.get('parentId')))
+        self.depth.append(state.get('stackDepth', 0))
+        self.event.append(intern(state.get('eventType', 'step')))
+        self.keyframe.append(int(state['keyframe']) if 'keyframe' in state else -1)
+
+        for name, value in state.get('variables', {}).items():
+            self.var_names.append(intern(name))
+            self.var_values.append(value)
+        self.var_offsets.append(len(self.var_values))
+
+        extras = {key: value for key, value in state.items() if key not in COLUMN_KEYS}
+        if extras:
+            self.extras[len(self.line) - 1] = extras
+
+    def __len__(self):
+        return len(self.line)
+
+    def __iter__(self):
+        return (self.state(index) for index in range(len(self)))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.state(position) for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('trace step out of range')
+        return self.state(index)
+
+    def state(self, index):
+        """Rebuild the state dict of one step"""
+        get = self.strings.get
+        start, end = self.var_offsets[index], self.var_offsets[index + 1]
+        state = {
+            'line': self.line[index],
+            'function': get(self.function[index]),
+            'variables': {get(self.var_names[i]): self.var_values[i] for i in range(start, end)},
+            'callId': get(self.call_id[index]),
+            'parentId': get(self.parent_id[index]),
+            'stackDepth': self.depth[index],
+            'eventType': get(self.event[index])
+        }
+        if self.keyframe[index] >= 0:
+            state['keyframe'] = bool(self.keyframe[index])
+        state.update(self.extras.get(index, {}))
+        return state
+
+    def to_columns(self):
+        """Dictionary-encoded JSON form: one list per column plus the string table"""
+        columns = {
+            'format': COLUMNAR_FORMAT,
+            'length': len(self),
+            'strings': self.strings.strings,
+            'line': self.line.tolist(),
+            'function': self.function.tolist(),
+            'callId': self.call_id.tolist(),
+            'parentId': self.parent_id.tolist(),
+            'stackDepth': self.depth.tolist(),
+            'eventType': self.event.tolist(),
+            'variables': {
+                'offsets': self.var_offsets.tolist(),
+                'names': self.var_names.tolist(),
+                'values': self.var_values
+            },
+            'extras': [[step, extras] for step, extras in sorted(self.extras.items())]
+        }
+        if any(flag >= 0 for flag in self.keyframe):
+            columns['keyframe'] = self.keyframe.tolist()
+        return columns
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Load a store from the to_columns() form"""
+        if columns.get('format') != COLUMNAR_FORMAT:
+            raise ValueError(f"Unsupported trace format: {columns.get('format')}")
+        store = cls()
+        store.strings = StringTable(columns['strings'])
+        store.line = array('i', columns['line'])
+        store.function = array('i', columns['function'])
+        store.call_id = array('i', columns['callId'])
+        store.parent_id = array('i', columns['parentId'])
+        store.depth = array('i', columns['stackDepth'])
+        store.event = array('i', columns['eventType'])
+        store.keyframe = array('b', columns.get('keyframe', [-1] * columns['length']))
+        store.var_offsets = array('I', columns['variables']['offsets'])
+        store.var_names = array('i', columns['variables']['names'])
+        store.var_values = list(columns['variables']['values'])
+        store.extras = {step: extras for step, extras in columns['extras']}
+        return store
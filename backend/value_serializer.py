@@ -0,0 +1,226 @@
+import dataclasses
+from operator import is_
+from itertools import islice, chain
+
+DEFAULT_MAX_DEPTH = 6
+DEFAULT_MAX_ITEMS = 100
+DEFAULT_MAX_STRING_LENGTH = 1000
+MAX_MEMO_ENTRIES = 4096
+
+# Values of these types are rendered directly and never memoized
+PRIMITIVE_TYPES = (int, float, bool, str, type(None))
+CONTAINER_TYPES = (list, tuple, dict, set, frozenset)
+# What repr() shows for a container that contains itself
+CYCLE_MARKERS = {list: '[...]', tuple: '(...)', dict: '{...}'}
+
+class ValueSerializer:
+    """Turn traced values into bounded, JSON-serializable values
+
+    In 'repr' format the result is the same string repr() would give, except
+    that containers are cut after max_items items and max_depth levels and
+    strings after max_string_length characters, so a huge list in scope
+    costs the same on every step as a small one. In 'structured' format
+    lists, tuples, sets, dicts and dataclasses become JSON objects instead.
+
+    Containers and dataclasses are memoized by identity. A memo entry holds
+    the object, its children and their rendered forms: primitive children
+    that are still the same objects are not rendered again, and the joined
+    result is reused when no child rendered differently. When the children
+    are all still the same objects only the nested containers among them
+    are visited, so an unchanged container is not walked item by item.
+    Holding the references keeps ids from being reused while an entry is
+    alive.
+    """
+
+    def __init__(self, value_format='repr', max_depth=DEFAULT_MAX_DEPTH, max_items=DEFAULT_MAX_ITEMS,
+                 max_string_length=DEFAULT_MAX_STRING_LENGTH):
+        self.structured = value_format == 'structured'
+        self.max_depth = max(1, max_depth)
+        self.max_items = max(1, max_items)
+        self.max_string_length = max(1, max_string_length)
+        self.memo = {}            # (id, depth) -> (value, length, children, rendered children, result, nested child indices)
+        self.active = set()       # ids of containers being rendered, to detect cycles
+        self.cycle_found = False
+
+    def serialize(self, value):
+        """Serialize a local variable; objects with a __dict__ use str() like before"""
+        try:
+            if isinstance(value, str):
+                return self.truncate(value)
+            if isinstance(value, PRIMITIVE_TYPES):
+                return value
+            if self.is_renderable(value):
+                return self.render(value, 0)
+            if hasattr(value, '__dict__'):
+                return self.opaque(value, str)
+            return self.opaque(value, repr)
+        except Exception:
+            return "Error: Unparseable value"
+
+    def serialize_return(self, value):
+        """Serialize a return value; anything not primitive goes through repr()"""
+        try:
+            if isinstance(value, str):
+                return self.truncate(value)
+            if isinstance(value, PRIMITIVE_TYPES):
+                return value
+            return self.render(value, 0)
+        except Exception:
+            return "Error: Unparseable return value"
+
+    def truncate(self, text):
+        if len(text) <= self.max_string_length:
+            return text
+        return text[:self.max_string_length] + '...'
+
+    def opaque(self, value, to_text):
+        """Objects we cannot look inside are rendered with str() or repr(), cut to length"""
+        text = self.truncate(to_text(value))
+        if self.structured:
+            return {'type': type(value).__name__, 'repr': text}
+        return text
+
+    def is_renderable(self, value):
+        return type(value) in CONTAINER_TYPES or is_plain_dataclass(value)
+
+    def render(self, value, depth):
+        """Render any value nested at depth, using the memo for containers"""
+        container = type(value) in CONTAINER_TYPES
+        if not container:
+            if isinstance(value, str):
+                if self.structured:
+                    return self.truncate(value)
+                return repr(value) if len(value) <= self.max_string_length else repr(value[:self.max_string_length]) + '...'
+            if isinstance(value, PRIMITIVE_TYPES):
+                return value if self.structured else repr(value)
+            if not is_plain_dataclass(value):
+                return self.opaque(value, repr)
+
+        if id(value) in self.active:
+            self.cycle_found = True
+            return CYCLE_MARKERS.get(type(value), '...')
+        if depth >= self.max_depth:
+            return self.cut(value)
+
+        children = self.children(value)
+        length = len(value) if container else len(children)
+        key = (id(value), depth)
+        entry = self.memo.get(key)
+        if entry is not None and entry[0] is not value:
+            entry = None
+        old_children, old_rendered = (entry[2], entry[3]) if entry else ((), ())
+        # When the children are the same objects, compared at C speed, only the
+        # nested containers among them can have changed
+        if (entry is not None and entry[1] == length and len(children) == len(old_children)
+                and all(map(is_, children, old_children)) and self.nested_unchanged(value, depth, entry)):
+            return entry[4]
+
+        outer_cycle = self.cycle_found
+        self.cycle_found = False
+        self.active.add(id(value))
+        try:
+            rendered = []
+            for index, child in enumerate(children):
+                # A primitive that is still the same object renders the same
+                if index < len(old_children) and child is old_children[index] and isinstance(child, PRIMITIVE_TYPES):
+                    rendered.append(old_rendered[index])
+                else:
+                    rendered.append(self.render(child, depth + 1))
+        finally:
+            self.active.discard(id(value))
+
+        if entry is not None and entry[1] == length and rendered == old_rendered:
+            result = entry[4]
+        else:
+            result = self.build(value, length, rendered)
+
+        # Renders that stopped at a cycle depend on the path, so they are not memoized
+        if not self.cycle_found:
+            if len(self.memo) >= MAX_MEMO_ENTRIES and key not in self.memo:
+                self.memo.clear()
+            nested = tuple(index for index, child in enumerate(children) if not isinstance(child, PRIMITIVE_TYPES))
+            self.memo[key] = (value, length, children, rendered, result, nested)
+        self.cycle_found = self.cycle_found or outer_cycle
+        return result
+
+    def nested_unchanged(self, value, depth, entry):
+        """Whether the non-primitive children of a memoized container still render to the same objects"""
+        nested = entry[5]
+        if not nested:
+            return True
+        children, rendered = entry[2], entry[3]
+        outer_cycle = self.cycle_found
+        self.cycle_found = False
+        self.active.add(id(value))
+        try:
+            unchanged = all(self.render(children[index], depth + 1) is rendered[index] for index in nested)
+        finally:
+            self.active.discard(id(value))
+        # A render that met a cycle is redone on the full path, which handles it
+        unchanged = unchanged and not self.cycle_found
+        self.cycle_found = outer_cycle
+        return unchanged
+
+    def children(self, value):
+        """The first max_items children of a container, flattened to keys and values for dicts"""
+        kind = type(value)
+        if kind is list or kind is tuple:
+            # A slice copies a list, so the memo keeps the children it was rendered from
+            return value[:self.max_items]
+        if isinstance(value, dict):
+            return list(chain.from_iterable(islice(value.items(), self.max_items)))
+        if is_plain_dataclass(value):
+            return [getattr(value, field.name) for field in dataclasses.fields(value) if field.repr]
+        return list(islice(value, self.max_items))
+
+    def cut(self, value):
+        """A container below max_depth"""
+        if self.structured:
+            return {'type': type(value).__name__, 'length': len(value) if not is_plain_dataclass(value) else None,
+                    'truncated': True}
+        if isinstance(value, dict):
+            return '{...}'
+        if is_plain_dataclass(value):
+            return f"{type(value).__qualname__}(...)"
+        return '[...]'
+
+    def build(self, value, length, rendered):
+        kind = type(value)
+        more = length - self.max_items if kind in CONTAINER_TYPES and length > self.max_items else 0
+
+        if self.structured:
+            if is_plain_dataclass(value):
+                names = [field.name for field in dataclasses.fields(value) if field.repr]
+                return {'type': 'dataclass', 'name': kind.__qualname__, 'fields': dict(zip(names, rendered))}
+            result = {'type': kind.__name__, 'length': length}
+            if kind is dict:
+                result['entries'] = [[rendered[i], rendered[i + 1]] for i in range(0, len(rendered), 2)]
+            else:
+                result['items'] = rendered
+            if more:
+                result['truncated'] = True
+            return result
+
+        suffix = [f"... ({more} more)"] if more else []
+        if is_plain_dataclass(value):
+            names = [field.name for field in dataclasses.fields(value) if field.repr]
+            return f"{kind.__qualname__}({', '.join(f'{name}={text}' for name, text in zip(names, rendered))})"
+        if kind is dict:
+            items = [f"{rendered[i]}: {rendered[i + 1]}" for i in range(0, len(rendered), 2)]
+            return '{' + ', '.join(items + suffix) + '}'
+        if kind is list:
+            return '[' + ', '.join(rendered + suffix) + ']'
+        if kind is tuple:
+            if length == 1:
+                return f"({rendered[0]},)"
+            return '(' + ', '.join(rendered + suffix) + ')'
+        if not length:
+            return f"{kind.__name__}()"
+        body = '{' + ', '.join(rendered + suffix) + '}'
+        return body if kind is set else f"frozenset({body})"
+
+def is_plain_dataclass(value):
+    """A dataclass instance that still uses the generated __repr__"""
+    kind = type(value)
+    return (dataclasses.is_dataclass(kind) and hasattr(kind.__repr__, '__wrapped__')
+            and kind.__str__ is object.__str__)
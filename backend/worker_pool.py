@@ -0,0 +1,378 @@
+import os
+import time
+import secrets
+import queue
+import resource
+import threading
+import multiprocessing
+from concurrent.futures import Future, CancelledError
+
+# Imported here so every worker process has the tracer loaded before its first job
+from python_debugger import (debug_python, stream_debug_python, record_python, replay_python, profile_python,
+                             measure_python, DebugCancelled)
+
+DEFAULT_POOL_SIZE = os.cpu_count() or 2
+DEFAULT_MAX_JOBS_PER_WORKER = 100
+DEFAULT_MAX_MEMORY_MB = 512
+DEFAULT_JOB_TIMEOUT = 30
+STREAM_BUFFER_RECORDS = 16  # Records buffered per stream before the worker is paused
+CANCEL_GRACE_SECONDS = 2  # How long a cancelled job may take to stop before its worker is killed
+CANCEL_POLL_SECONDS = 0.1
+
+# Functions run by the non-streaming job kinds
+RUNNERS = {'run': debug_python, 'record': record_python, 'replay': replay_python, 'profile': profile_python,
+           'measure': measure_python}
+
+class JobTimeoutError(Exception):
+    """Raised when a debug job exceeds its time limit and its worker is killed"""
+
+class WorkerCrashedError(Exception):
+    """Raised when a worker process dies while running a job"""
+
+class PoolShutdownError(Exception):
+    """Raised for jobs submitted to or still queued in a pool that was shut down"""
+
+class JobCancelledError(Exception):
+    """Raised for jobs cancelled before or while running"""
+
+def worker_main(conn, cancel_flag, address_space_mb=None):
+    """Run debug jobs received over a pipe until told to stop
+
+    Run jobs report their step count back every PROGRESS_INTERVAL steps and
+    stop at that point once the dispatcher has raised cancel_flag. With
+    address_space_mb, allocations past that much virtual memory fail with
+    MemoryError, which ends the job as truncated instead of the machine
+    running out of memory.
+    """
+    if address_space_mb:
+        limit = address_space_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    def report_progress(steps):
+        if cancel_flag.value:
+            raise DebugCancelled()
+        conn.send(('progress', steps))
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+
+        kind, job = message
+        try:
+            if kind == 'stream':
+                # Each record goes back over the pipe as soon as it is produced
+                stream_debug_python(emit=lambda record: conn.send(('record', record)), **job)
+                result = ('ok', None)
+            else:
+                result = ('ok', RUNNERS[kind](progress=report_progress, **job))
+        except DebugCancelled:
+            result = ('cancelled', None)
+        except Exception as e:
+            result = ('error', f"{type(e).__name__}: {str(e)}")
+
+        # Peak resident memory of this worker in KB, used to decide recycling
+        peak_memory_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        conn.send(('done', (result, peak_memory_kb)))
+    conn.close()
+
+class Worker:
+    """A warm worker process and the pipe used to talk to it"""
+
+    def __init__(self, context, address_space_mb=None):
+        self.conn, child_conn = context.Pipe()
+        self.cancel_flag = context.RawValue('b', 0)  # Shared with the process, set to stop its job
+        self.process = context.Process(target=worker_main, args=(child_conn, self.cancel_flag, address_space_mb),
+                                       daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs_done = 0
+
+    def kill(self):
+        """Kill the worker immediately, for hung or crashed jobs"""
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def close(self):
+        """Ask the worker to exit after its current job"""
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+class WorkerPool:
+    """Pool of pre-started processes running debug_python in isolation
+
+    Each session runs in its own process, so sys.settrace, sys.stdin and
+    stdout redirection of one session cannot affect another. Workers are
+    recycled after max_jobs_per_worker jobs or once their peak memory grows
+    past max_memory_mb, and killed when a job runs longer than job_timeout.
+    address_space_mb, when set, is a hard RLIMIT_AS on every worker.
+    """
+
+    def __init__(self, size=DEFAULT_POOL_SIZE, max_jobs_per_worker=DEFAULT_MAX_JOBS_PER_WORKER,
+                 max_memory_mb=DEFAULT_MAX_MEMORY_MB, job_timeout=DEFAULT_JOB_TIMEOUT,
+                 address_space_mb=None, start_method='spawn'):
+        self.size = max(1, size)
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_memory_mb = max_memory_mb
+        self.job_timeout = job_timeout
+        self.address_space_mb = address_space_mb
+        # Workers share one string hash seed, so set iteration order, and with it a
+        # replayed run, is the same whichever worker runs the program
+        os.environ.setdefault('PYTHONHASHSEED', str(secrets.randbelow(2 ** 32)))
+        self.context = multiprocessing.get_context(start_method)
+
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.closed = False
+        self.stats_counters = {
+            'completed': 0,
+            'failed': 0,
+            'timeouts': 0,
+            'crashes': 0,
+            'recycled': 0,
+            'cancelled': 0,
+            'busy': 0
+        }
+
+        # One dispatcher thread per worker process
+        self.threads = []
+        for index in range(self.size):
+            thread = threading.Thread(target=self.dispatch, name=f"debug-worker-{index}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, job, timeout=None, progress=None, cancel_event=None, kind='run'):
+        """Queue debug_python keyword arguments and return a Future for the result
+
+        kind 'record' or 'replay' runs record_python or replay_python instead.
+
+        progress is called from a dispatcher thread with the job's step count
+        as it runs. Setting cancel_event cancels the job: a queued job never
+        starts, a running one stops at its next progress report.
+        """
+        future = JobFuture(progress, cancel_event)
+        self.enqueue((kind, job, timeout or self.job_timeout, future))
+        return future
+
+    def run(self, job, timeout=None, progress=None, cancel_event=None, kind='run'):
+        """Run a debug job on the pool and wait for its result"""
+        future = self.submit(job, timeout, progress, cancel_event, kind)
+        try:
+            return future.result()
+        except CancelledError:
+            raise JobCancelledError('Debug job was cancelled')
+
+    def stream(self, job, timeout=None):
+        """Run stream_debug_python keyword arguments on the pool, yielding records as they arrive
+        
+        The record buffer is bounded, so a slow reader pauses the worker. If the
+        reader stops early the job is abandoned and its worker replaced.
+        """
+        stream = StreamSink()
+        self.enqueue(('stream', job, timeout or self.job_timeout, stream))
+        try:
+            while True:
+                record = stream.records.get()
+                if record is StreamSink.END:
+                    return
+                if isinstance(record, Exception):
+                    raise record
+                yield record
+        finally:
+            stream.abandoned.set()
+
+    def enqueue(self, item):
+        with self.lock:
+            if self.closed:
+                raise PoolShutdownError('Worker pool is shut down')
+            self.jobs.put(item)
+
+    def stats(self):
+        """Return a snapshot of the pool counters"""
+        with self.lock:
+            return dict(self.stats_counters, size=self.size, queued=self.jobs.qsize())
+
+    def shutdown(self):
+        """Stop accepting jobs, fail queued ones and stop all workers"""
+        with self.lock:
+            self.closed = True
+        while True:
+            try:
+                job = self.jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                job[3].set_exception(PoolShutdownError('Worker pool is shut down'))
+        for _ in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def count(self, name, delta=1):
+        with self.lock:
+            self.stats_counters[name] += delta
+
+    def dispatch(self):
+        """Feed queued jobs to one worker process, replacing it when needed"""
+        worker = Worker(self.context, self.address_space_mb)
+
+        while True:
+            item = self.jobs.get()
+            if item is None:
+                break
+            kind, job, timeout, sink = item
+            if not sink.set_running_or_notify_cancel():
+                continue
+
+            self.count('busy')
+            worker.cancel_flag.value = 0
+            try:
+                status, payload, peak_memory_kb = self.exchange(worker, kind, job, timeout, sink)
+            except JobCancelledError as e:
+                # The job ignored the cancellation for too long
+                worker.kill()
+                worker = Worker(self.context, self.address_space_mb)
+                self.count('cancelled')
+                sink.set_exception(e)
+                continue
+            except JobTimeoutError as e:
+                # Hung job: nothing short of killing the process stops it
+                worker.kill()
+                worker = Worker(self.context, self.address_space_mb)
+                self.count('timeouts')
+                sink.set_exception(e)
+                continue
+            except StreamAbandonedError:
+                worker.kill()
+                worker = Worker(self.context, self.address_space_mb)
+                self.count('failed')
+                continue
+            except (EOFError, BrokenPipeError, OSError):
+                worker.kill()
+                worker = Worker(self.context, self.address_space_mb)
+                self.count('crashes')
+                sink.set_exception(WorkerCrashedError('Debug worker exited unexpectedly'))
+                continue
+            finally:
+                self.count('busy', -1)
+
+            if status == 'ok':
+                self.count('completed')
+                sink.set_result(payload)
+            elif status == 'cancelled':
+                self.count('cancelled')
+                sink.set_exception(JobCancelledError('Debug job was cancelled'))
+            else:
+                self.count('failed')
+                sink.set_exception(RuntimeError(payload))
+
+            # Recycle workers that have done enough jobs or grown too large
+            worker.jobs_done += 1
+            if (worker.jobs_done >= self.max_jobs_per_worker or
+                    peak_memory_kb > self.max_memory_mb * 1024):
+                worker.close()
+                worker = Worker(self.context, self.address_space_mb)
+                self.count('recycled')
+
+        worker.close()
+
+    def exchange(self, worker, kind, job, timeout, sink):
+        """Send a job to a worker and collect its reply, forwarding streamed records and progress to the sink"""
+        deadline = time.monotonic() + timeout
+        cancel_event = getattr(sink, 'cancel_event', None)
+        cancel_deadline = None
+        worker.conn.send((kind, job))
+        while True:
+            # Cancellable jobs wake up regularly to pass a cancellation on to the worker
+            wait_until = deadline
+            if cancel_event is not None:
+                if cancel_deadline is None and cancel_event.is_set():
+                    worker.cancel_flag.value = 1
+                    cancel_deadline = time.monotonic() + CANCEL_GRACE_SECONDS
+                wait_until = min(deadline, cancel_deadline or time.monotonic() + CANCEL_POLL_SECONDS)
+
+            if not worker.conn.poll(max(0, wait_until - time.monotonic())):
+                if time.monotonic() >= deadline:
+                    raise JobTimeoutError(f'Debug job exceeded {timeout}s')
+                if cancel_deadline is not None and time.monotonic() >= cancel_deadline:
+                    raise JobCancelledError('Debug job was cancelled')
+                continue
+            message, payload = worker.conn.recv()
+            if message == 'done':
+                (status, result), peak_memory_kb = payload
+                return status, result, peak_memory_kb
+            if message == 'progress':
+                sink.put_progress(payload)
+            else:
+                sink.put_record(payload, deadline)
+
+class JobFuture(Future):
+    """Future of a run job, with its progress callback and cancellation event"""
+
+    def __init__(self, progress=None, cancel_event=None):
+        super().__init__()
+        self.progress = progress
+        self.cancel_event = cancel_event
+
+    def set_running_or_notify_cancel(self):
+        # A job cancelled while queued never reaches a worker
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            self.cancel()
+        return super().set_running_or_notify_cancel()
+
+    def put_progress(self, steps):
+        if self.progress is not None:
+            self.progress(steps)
+
+class StreamAbandonedError(Exception):
+    """Raised in a dispatcher when nobody is reading a streamed job any more"""
+
+class StreamSink:
+    """Bounded buffer between a dispatcher thread and the reader of a streamed job"""
+
+    END = object()
+
+    def __init__(self):
+        self.records = queue.Queue(maxsize=STREAM_BUFFER_RECORDS)
+        self.abandoned = threading.Event()
+
+    def set_running_or_notify_cancel(self):
+        return not self.abandoned.is_set()
+
+    def put_record(self, record, deadline):
+        """Buffer a record, waiting for the reader but giving up if it leaves or time runs out"""
+        while True:
+            if self.abandoned.is_set():
+                raise StreamAbandonedError()
+            if time.monotonic() > deadline:
+                raise JobTimeoutError('Debug stream reader is too slow')
+            try:
+                self.records.put(record, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def set_result(self, result):
+        self.put_final(self.END)
+
+    def set_exception(self, exception):
+        self.put_final(exception)
+
+    def put_final(self, item):
+        while not self.abandoned.is_set():
+            try:
+                self.records.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
@@ -0,0 +1,8 @@
+"""WSGI entry point for production servers
+
+Jobs, sessions, the result cache and the worker pool live in the server
+process, so run a single process with threads rather than several workers:
+
+    gunicorn --workers 1 --threads 16 --bind 0.0.0.0:5000 wsgi:application
+"""
+from app import app as application
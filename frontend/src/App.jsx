@@ -5,7 +5,9 @@ import DebugTimeline from "./components/DebugTimeline";
 import RecursionTree from "./components/RecursionTree";
 import VariablesPanel from "./components/VariablesPanel";
 import RecursionAnalytics from "./components/RecursionAnalytics";
-import { callDebugAPI } from "./lib/api";
+import { streamDebugAPI, profileAPI, complexityAPI } from "./lib/api";
+import { rebuildVariables } from "./lib/snapshots";
+import { rebuildCallStack } from "./lib/frames";
 
 const App = () => {
   const [code, setCode] = useState(
@@ -27,22 +29,69 @@ print(result)
     debugStates: {
       debugStates: [],
       callHierarchy: [],
+      frames: {},
     },
     success: false,
   });
   const [currentStep, setCurrentStep] = useState(0);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
+  const [profile, setProfile] = useState(null);
+  const [measuredComplexity, setMeasuredComplexity] = useState(null);
+
+  const handleRecord = (record) => {
+    if (record.type === "states") {
+      // Render the timeline while the program is still running
+      setDebugData((prev) => ({
+        ...prev,
+        debugStates: {
+          ...prev.debugStates,
+          debugStates: [...prev.debugStates.debugStates, ...record.states],
+        },
+      }));
+    } else if (record.type === "summary") {
+      setDebugData((prev) => {
+        const states = [...prev.debugStates.debugStates];
+        if (states.length && record.output) {
+          states[states.length - 1] = {
+            ...states[states.length - 1],
+            output: record.output,
+          };
+        }
+        return {
+          success: true,
+          debugStates: {
+            debugStates: states,
+            callHierarchy: record.callHierarchy,
+            recursionTree: record.recursionTree,
+            frames: record.frames,
+            complexity: record.complexity,
+            snapshotMode: record.snapshotMode,
+            truncated: record.truncated,
+          },
+        };
+      });
+    } else if (record.type === "error") {
+      setError(record.error);
+    }
+  };
 
   const handleDebug = async () => {
     try {
       setLoading(true);
       setError(null);
-      const response = await callDebugAPI(code, testCase);
-      if (response && response.success) {
-        setDebugData(response);
-        setCurrentStep(0);
-      } else {
+      setCurrentStep(0);
+      setDebugData({
+        debugStates: {
+          debugStates: [],
+          callHierarchy: [],
+          frames: {},
+          snapshotMode: "delta",
+        },
+        success: false,
+      });
+      const ok = await streamDebugAPI(code, testCase, handleRecord);
+      if (!ok) {
         setError("Debugging failed. Please check your code and try again.");
       }
     } catch (err) {
@@ -52,6 +101,39 @@ print(result)
     }
   };
 
+  const handleProfile = async () => {
+    setLoading(true);
+    setError(null);
+    const result = await profileAPI(code, testCase);
+    if (result && result.success) {
+      setProfile(result.profile);
+    } else {
+      setError("Profiling failed. Please check your code and try again.");
+    }
+    setLoading(false);
+  };
+
+  const handleMeasureComplexity = async () => {
+    setLoading(true);
+    setError(null);
+    // The test input is the template when it says where the size goes
+    const template = testCase.includes("{n}") ? testCase : "{n}";
+    const result = await complexityAPI(code, template);
+    if (result && result.success) {
+      setMeasuredComplexity(result.measured);
+    } else {
+      setError("Measuring complexity failed. Please check your code and try again.");
+    }
+    setLoading(false);
+  };
+
+  const handleCodeChange = (value) => {
+    setCode(value);
+    // The heatmap and measurements belong to the code they were taken from
+    setProfile(null);
+    setMeasuredComplexity(null);
+  };
+
   const handleStepChange = (step) => {
     setCurrentStep(step);
   };
@@ -69,7 +151,21 @@ print(result)
   };
 
   const getCurrentDebugState = () => {
-    return debugData.debugStates.debugStates[currentStep] || {};
+    const states = debugData.debugStates.debugStates;
+    const state = states[currentStep];
+    if (!state) return {};
+    const callStack = rebuildCallStack(
+      debugData.debugStates.frames,
+      state.callId
+    );
+    if (debugData.debugStates.snapshotMode !== "delta") {
+      return { ...state, callStack };
+    }
+    return {
+      ...state,
+      callStack,
+      variables: rebuildVariables(states, currentStep),
+    };
   };
 
   const getCurrentLine = () => {
@@ -102,8 +198,9 @@ print(result)
           <div className="bg-white rounded-xl shadow-lg p-6">
             <CodeEditor
               code={code}
-              setCode={setCode}
+              setCode={handleCodeChange}
               currentLine={getCurrentLine()}
+              profile={profile}
             />
             <div className="mt-4">
               <h2 className="text-lg font-semibold mb-2">Test Input</h2>
@@ -120,11 +217,31 @@ print(result)
               >
                 {loading ? "Debugging..." : "Start Debugging"}
               </button>
+              <button
+                onClick={handleProfile}
+                disabled={loading}
+                className="mt-2 w-full border border-indigo-600 text-indigo-600 py-2 px-4 rounded-lg hover:bg-indigo-50 transition-colors disabled:border-gray-400 disabled:text-gray-400"
+              >
+                Profile Lines
+              </button>
+              <button
+                onClick={handleMeasureComplexity}
+                disabled={loading}
+                className="mt-2 w-full border border-indigo-600 text-indigo-600 py-2 px-4 rounded-lg hover:bg-indigo-50 transition-colors disabled:border-gray-400 disabled:text-gray-400"
+              >
+                Measure Complexity
+              </button>
               {error && (
                 <div className="mt-3 text-red-600 bg-red-50 p-3 rounded-lg">
                   {error}
                 </div>
               )}
+              {debugData.debugStates.truncated && (
+                <div className="mt-3 text-amber-700 bg-amber-50 p-3 rounded-lg">
+                  {debugData.debugStates.truncated.message}. Showing the steps
+                  recorded until then.
+                </div>
+              )}
             </div>
           </div>
           <motion.div
@@ -135,6 +252,7 @@ print(result)
             <RecursionAnalytics
               debugData={debugData.debugStates}
               currentStep={currentStep}
+              measuredComplexity={measuredComplexity}
             />
           </motion.div>
         </motion.div>
@@ -1,9 +1,16 @@
 import React, { useRef, useEffect } from "react";
 import Editor from "@monaco-editor/react";
 
-const CodeEditor = ({ code, setCode, currentLine = null }) => {
+// Heatmap levels, heat-1 (cold) to heat-5 (hottest line)
+const HEAT_LEVELS = 5;
+
+const formatNs = (ns) =>
+  ns >= 1e6 ? `${(ns / 1e6).toFixed(2)} ms` : `${(ns / 1e3).toFixed(1)} µs`;
+
+const CodeEditor = ({ code, setCode, currentLine = null, profile = null }) => {
   const editorRef = useRef(null);
   const decorationsRef = useRef([]);
+  const heatDecorationsRef = useRef([]);
   
   const handleEditorDidMount = (editor, monaco) => {
     editorRef.current = editor;
@@ -49,6 +56,28 @@ const CodeEditor = ({ code, setCode, currentLine = null }) => {
     }
   }, [currentLine]);
 
+  // Effect to shade lines by their share of the profiled run's time
+  useEffect(() => {
+    if (!editorRef.current) return;
+    const monaco = window.monaco;
+    if (!monaco) return;
+
+    const lines = profile ? profile.lines : [];
+    heatDecorationsRef.current = editorRef.current.deltaDecorations(
+      heatDecorationsRef.current,
+      lines.map((line) => ({
+        range: new monaco.Range(line.line, 1, line.line, 1),
+        options: {
+          isWholeLine: true,
+          className: `heat-${Math.max(1, Math.ceil(line.heat * HEAT_LEVELS))}`,
+          hoverMessage: {
+            value: `${line.hits} hits · self ${formatNs(line.selfNs)} · total ${formatNs(line.totalNs)}`
+          }
+        }
+      }))
+    );
+  }, [profile]);
+
   return (
     <div>
       <h2 className="text-lg font-semibold mb-4">Code Editor</h2>
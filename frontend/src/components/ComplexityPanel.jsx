@@ -1,7 +1,33 @@
 import React from "react";
 
-const ComplexityPanel = ({ complexity }) => {
-  if (!complexity) {
+const formatSeconds = (seconds) =>
+  seconds === undefined || seconds === null
+    ? "—"
+    : seconds < 0.001
+    ? `${(seconds * 1e6).toFixed(0)} µs`
+    : `${(seconds * 1000).toFixed(2)} ms`;
+
+const GrowthFit = ({ title, fit }) => (
+  <div className="bg-gray-50 p-3 rounded-lg">
+    <h4 className="text-xs font-medium text-gray-600 mb-1">{title}</h4>
+    {fit ? (
+      <>
+        <p className="text-lg font-bold text-gray-800">{fit.complexity}</p>
+        <p className="text-xs text-gray-500">
+          Fit error {(fit.error * 100).toFixed(1)}%
+          {fit.exponent !== null && `, log-log slope ${fit.exponent}`}
+        </p>
+      </>
+    ) : (
+      <p className="text-sm text-gray-500">Not enough runs to fit</p>
+    )}
+  </div>
+);
+
+// Static estimate from the code, returned with every debug run, and the
+// growth measured by running the program at several input sizes.
+const ComplexityPanel = ({ complexity, measured }) => {
+  if (!complexity && !measured) {
     return (
       <div className="p-4">
         <h2 className="text-lg font-semibold mb-4">Complexity Analysis</h2>
@@ -10,63 +36,113 @@ const ComplexityPanel = ({ complexity }) => {
     );
   }
 
+  const recursive = complexity
+    ? complexity.functions.filter((fn) => fn.recursive)
+    : [];
+
   return (
     <div className="bg-white rounded-xl shadow-lg p-6">
       <h2 className="text-lg font-semibold mb-4">Complexity Analysis</h2>
 
-      <div className="grid grid-cols-2 gap-4 mb-4">
-        <div className="bg-blue-50 p-4 rounded-lg">
-          <h3 className="text-sm font-medium text-blue-800 mb-1">
-            Time Complexity
+      {measured && (
+        <div className="mb-4">
+          <h3 className="text-sm font-medium text-gray-700 mb-2">
+            Measured Growth
           </h3>
-          <p className="text-2xl font-bold text-blue-600">{complexity.time}</p>
+          <div className="grid grid-cols-2 gap-4 mb-2">
+            <GrowthFit title="Steps" fit={measured.stepGrowth} />
+            <GrowthFit title="Run time" fit={measured.timeGrowth} />
+          </div>
+          <table className="w-full text-xs">
+            <thead>
+              <tr className="text-gray-500 text-left">
+                <th>Input size</th>
+                <th>Steps</th>
+                <th>Untraced time</th>
+              </tr>
+            </thead>
+            <tbody>
+              {measured.runs.map((run) => (
+                <tr key={run.size} className="font-mono">
+                  <td>{run.size}</td>
+                  <td>
+                    {run.steps ?? "—"}
+                    {run.truncated && " (stopped)"}
+                  </td>
+                  <td>{run.error ? run.error.type : formatSeconds(run.seconds)}</td>
+                </tr>
+              ))}
+            </tbody>
+          </table>
         </div>
+      )}
 
-        <div className="bg-green-50 p-4 rounded-lg">
-          <h3 className="text-sm font-medium text-green-800 mb-1">
-            Space Complexity
-          </h3>
-          <p className="text-2xl font-bold text-green-600">
-            {complexity.space}
-          </p>
-        </div>
-      </div>
+      {complexity && (
+        <>
+          <div className="grid grid-cols-2 gap-4 mb-4">
+            <div className="bg-blue-50 p-4 rounded-lg">
+              <h3 className="text-sm font-medium text-blue-800 mb-1">
+                Time Complexity (estimated)
+              </h3>
+              <p className="text-2xl font-bold text-blue-600">
+                {complexity.time}
+              </p>
+            </div>
 
-      {complexity.has_recursion && (
-        <div className="mb-4 p-3 bg-purple-50 rounded-lg border border-purple-200">
-          <h3 className="text-sm font-medium text-purple-800 mb-1">
-            Recursion Detected
-          </h3>
-          <p className="text-sm text-purple-600">
-            This function uses recursion which typically has O(n) space
-            complexity (due to call stack) and O(2^n) time complexity in worst
-            case.
-          </p>
-        </div>
-      )}
+            <div className="bg-green-50 p-4 rounded-lg">
+              <h3 className="text-sm font-medium text-green-800 mb-1">
+                Space Complexity (estimated)
+              </h3>
+              <p className="text-2xl font-bold text-green-600">
+                {complexity.space}
+              </p>
+            </div>
+          </div>
 
-      {complexity.has_loops && (
-        <div>
-          <h3 className="text-sm font-medium text-gray-700 mb-2">
-            Loop Details
-          </h3>
-          <div className="space-y-2">
-            {complexity.loop_details.map((loop, index) => (
-              <div key={index} className="flex items-start">
-                <span
-                  className={`inline-block w-4 h-4 rounded-full mt-1 mr-2 
-                  ${loop.nesting_level > 1 ? "bg-red-500" : "bg-yellow-500"}`}
-                ></span>
-                <div>
-                  <p className="text-sm font-mono">{loop.line.trim()}</p>
-                  <p className="text-xs text-gray-500">
-                    Nesting level: {loop.nesting_level}
-                  </p>
-                </div>
+          {recursive.length > 0 && (
+            <div className="mb-4 p-3 bg-purple-50 rounded-lg border border-purple-200">
+              <h3 className="text-sm font-medium text-purple-800 mb-1">
+                Recursion Detected
+              </h3>
+              {recursive.map((fn) => (
+                <p key={fn.name} className="text-sm text-purple-600">
+                  <span className="font-mono">{fn.name}</span>: {fn.time} time,{" "}
+                  {fn.space} space
+                  {fn.fanOut !== undefined &&
+                    ` (${fn.fanOut} recursive call${fn.fanOut === 1 ? "" : "s"} per call` +
+                      `${fn.memoized ? ", memoized" : ""})`}
+                </p>
+              ))}
+            </div>
+          )}
+
+          {complexity.has_loops && (
+            <div>
+              <h3 className="text-sm font-medium text-gray-700 mb-2">
+                Loop Details
+              </h3>
+              <div className="space-y-2">
+                {complexity.loop_details.map((loop, index) => (
+                  <div key={index} className="flex items-start">
+                    <span
+                      className={`inline-block w-4 h-4 rounded-full mt-1 mr-2
+                      ${loop.nesting_level > 1 ? "bg-red-500" : "bg-yellow-500"}`}
+                    ></span>
+                    <div>
+                      <p className="text-sm font-mono">{loop.line.trim()}</p>
+                      <p className="text-xs text-gray-500">
+                        Line {loop.lineNumber}, nesting level{" "}
+                        {loop.nesting_level}, runs{" "}
+                        {loop.bound === "constant" ? "a fixed number of" : loop.bound}{" "}
+                        times
+                      </p>
+                    </div>
+                  </div>
+                ))}
               </div>
-            ))}
-          </div>
-        </div>
+            </div>
+          )}
+        </>
       )}
     </div>
   );
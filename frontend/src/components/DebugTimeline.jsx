@@ -69,6 +69,13 @@ const DebugTimeline = ({ debugStates, currentStep, onStepChange }) => {
           color: '#065f46',
           borderColor: '#a7f3d0'
         };
+      case 'loop_summary':
+        return {
+          ...baseStyle,
+          backgroundColor: '#fef3c7',
+          color: '#92400e',
+          borderColor: '#fde68a'
+        };
       case 'exception':
         return {
           ...baseStyle,
@@ -144,6 +151,21 @@ const DebugTimeline = ({ debugStates, currentStep, onStepChange }) => {
           </div>
         )}
 
+        {debugStates[currentStep]?.loopSummary && (
+          <div style={{ gridColumn: 'span 2' }}>
+            <h3 style={{ fontSize: '0.875rem', fontWeight: '600', color: '#4b5563', marginBottom: '0.25rem' }}>Collapsed Loop:</h3>
+            <p style={{ color: '#213547' }}>
+              {debugStates[currentStep].loopSummary.collapsedIterations} of {debugStates[currentStep].loopSummary.iterations} iterations
+              ({debugStates[currentStep].loopSummary.collapsedTimeMs} ms) hidden
+            </p>
+            {Object.entries(debugStates[currentStep].loopSummary.variables).map(([name, stats]) => (
+              <p key={name} style={{ color: '#4b5563', fontSize: '0.75rem' }}>
+                {name}: {stats.min !== undefined ? `${stats.min} .. ${stats.max}, ` : ''}final {String(stats.final)}
+              </p>
+            ))}
+          </div>
+        )}
+
         {debugStates[currentStep]?.output && (
           <div style={{ gridColumn: 'span 2' }}>
             <h3 style={{ fontSize: '0.875rem', fontWeight: '600', color: '#4b5563', marginBottom: '0.25rem' }}>Output:</h3>
@@ -14,7 +14,7 @@ import {
 } from "recharts";
 import ComplexityPanel from "./ComplexityPanel";
 
-const RecursionAnalytics = ({ debugData, currentStep }) => {
+const RecursionAnalytics = ({ debugData, currentStep, measuredComplexity }) => {
   if (
     !debugData ||
     !debugData.debugStates ||
@@ -24,6 +24,11 @@ const RecursionAnalytics = ({ debugData, currentStep }) => {
       <div className="p-4">
         <h2 className="text-lg font-semibold mb-4">Recursion Analytics</h2>
         <p className="text-gray-500">No debug data available</p>
+        {measuredComplexity && (
+          <div className="mt-6">
+            <ComplexityPanel measured={measuredComplexity} />
+          </div>
+        )}
       </div>
     );
   }
@@ -31,7 +36,6 @@ const RecursionAnalytics = ({ debugData, currentStep }) => {
   const functionCalls = {};
   const stackDepthOverTime = [];
   const returnValues = [];
-  const loopDetails = [];
   let maxStackDepth = 0;
 
   debugData.debugStates.forEach((state, index) => {
@@ -49,40 +53,8 @@ const RecursionAnalytics = ({ debugData, currentStep }) => {
     if (state.returnValue !== undefined) {
       returnValues.push({ function: state.function, value: state.returnValue });
     }
-
-    // Loop detection
-    const lineStr = String(state.line || "");
-    if (
-      state.eventType === "step" &&
-      (lineStr.includes("for") || lineStr.includes("while"))
-    ) {
-      loopDetails.push({
-        line: lineStr,
-        nesting_level: depth,
-      });
-    }
-  });
-
-  const hasRecursion = debugData.callHierarchy?.some((call) => {
-    return (
-      call.function &&
-      debugData.callHierarchy.some(
-        (other) =>
-          other !== call &&
-          other.function === call.function &&
-          other.parent_id === call.call_id
-      )
-    );
   });
 
-  const complexity = {
-    time: hasRecursion ? "O(2^n)" : loopDetails.length ? "O(n)" : "O(1)",
-    space: hasRecursion ? "O(n)" : "O(1)",
-    has_recursion: hasRecursion,
-    has_loops: loopDetails.length > 0,
-    loop_details: loopDetails.map((ld) => `Line: ${ld.line}`),
-  };
-
   const functionCallData = Object.entries(functionCalls).map(
     ([name, count]) => ({ name, calls: count })
   );
@@ -155,7 +127,10 @@ const RecursionAnalytics = ({ debugData, currentStep }) => {
         </div>
       </div>
 
-      <ComplexityPanel complexity={complexity} />
+      <ComplexityPanel
+        complexity={debugData.complexity}
+        measured={measuredComplexity}
+      />
     </div>
   );
 };
@@ -10,7 +10,7 @@ const RecursionTree = ({ debugData, currentStep, onStepChange }) => {
   const positions = useRef({});
 
   useEffect(() => {
-    if (!debugData?.callHierarchy?.length) return;
+    if (!debugData?.recursionTree && !debugData?.callHierarchy?.length) return;
 
     const svgElement = d3.select(svgRef.current);
     svgElement.selectAll("*").remove();
@@ -49,21 +49,19 @@ const RecursionTree = ({ debugData, currentStep, onStepChange }) => {
       .attr("d", "M0,-5L10,0L0,5")
       .attr("fill", "#999");
 
+    // Calls carry their own entry/return step indices, so no scans over
+    // debugStates are needed to place or annotate a node
+    const callsById = new Map(
+      (debugData.callHierarchy || []).map((call) => [call.call_id, call])
+    );
+
     const buildTree = () => {
       const nodesMap = new Map();
       const rootNodes = [];
 
-      const filteredCalls = debugData.callHierarchy.filter((call) => {
-        const idx = debugData.debugStates.findIndex(
-          (s) => s.callId === call.call_id
-        );
-        return (
-          viewAll ||
-          idx <= currentStep ||
-          (debugData.debugStates[idx]?.eventType === "return" &&
-            idx <= currentStep)
-        );
-      });
+      const filteredCalls = debugData.callHierarchy.filter(
+        (call) => viewAll || (call.entry_step ?? -1) <= currentStep
+      );
 
       filteredCalls.forEach((call) => {
         const args = call.args ? Object.values(call.args).join(", ") : "";
@@ -72,6 +70,7 @@ const RecursionTree = ({ debugData, currentStep, onStepChange }) => {
           name: `${call.function}(${args})`,
           children: [],
           depth: call.stack_depth,
+          entryStep: call.entry_step,
         });
       });
 
@@ -84,16 +83,13 @@ const RecursionTree = ({ debugData, currentStep, onStepChange }) => {
           rootNodes.push(node);
         }
 
-        const returnState = debugData.debugStates.find(
-          (s) => s.callId === call.call_id && s.eventType === "return"
-        );
-
-        const returnStepIndex = debugData.debugStates.findIndex(
-          (s) => s.callId === call.call_id && s.eventType === "return"
-        );
-
-        if (returnState && (viewAll || returnStepIndex <= currentStep)) {
-          node.returnValue = returnState.returnValue;
+        const returnStep = call.return_step;
+        if (
+          returnStep !== null &&
+          returnStep !== undefined &&
+          (viewAll || returnStep <= currentStep)
+        ) {
+          node.returnValue = debugData.debugStates[returnStep].returnValue;
         }
       });
 
@@ -102,25 +98,89 @@ const RecursionTree = ({ debugData, currentStep, onStepChange }) => {
         : { name: "root", children: rootNodes };
     };
 
-    const root = d3.hierarchy(buildTree());
-    const treeLayout = d3.tree().nodeSize([120, 120]);
-    treeLayout(root);
+    // The backend's aggregated tree merges identical subtrees into shared
+    // nodes, so it is drawn with one node per distinct subproblem. A shared
+    // node is expanded where it first appears and drawn as a leaf elsewhere.
+    const buildAggregatedTree = () => {
+      const tree = debugData.recursionTree;
+      const placed = new Set();
+      const highlighted = new Set();
+      let current = null;
+      const isActive = ([entry, exit]) =>
+        entry <= currentStep && (exit === null || exit === undefined || currentStep <= exit);
+
+      const visit = (nodeId, multiplicity, id, depth) => {
+        const node = tree.nodes[nodeId];
+        if (!node) return null;
+        const [entryStep, returnStep] = node.stepRanges?.[0] ?? [];
+        const started = viewAll || (entryStep ?? -1) <= currentStep;
 
-    const currentCallId = debugData.debugStates?.[currentStep]?.callId;
-    const getAncestors = (id) => {
-      const ancestors = new Set();
-      let currentId = id;
-      while (currentId) {
-        ancestors.add(currentId);
-        currentId = debugData.callHierarchy.find(
-          (c) => c.call_id === currentId
-        )?.parent_id;
-      }
-      return ancestors;
+        const args = Object.values(node.args || {}).join(", ");
+        const times = multiplicity > 1 ? ` ×${multiplicity}` : "";
+        const shared = placed.has(nodeId);
+        const datum = {
+          id,
+          name: `${node.function}(${args})${times}${node.memoHit ? " (memo)" : ""}${shared ? " ↺" : ""}`,
+          children: [],
+          entryStep,
+        };
+        if (viewAll || (returnStep !== null && returnStep !== undefined && returnStep <= currentStep)) {
+          datum.returnValue = node.returnValue;
+        }
+        if (node.stepRanges?.some(isActive)) {
+          highlighted.add(id);
+          if (!current || depth > current.depth) current = { id, depth };
+        }
+        if (!shared) {
+          placed.add(nodeId);
+          node.children.forEach(([childId, count], index) => {
+            const child = visit(childId, count, `${id}/${index}`, depth + 1);
+            if (child) datum.children.push(child);
+          });
+        }
+        // A call whose own first step was filtered out still shows once its children run
+        if (!started && !datum.children.length) {
+          if (!shared) placed.delete(nodeId);
+          highlighted.delete(id);
+          return null;
+        }
+        return datum;
+      };
+
+      const rootNodes = tree.roots
+        .map(([nodeId, count], index) => visit(nodeId, count, `${index}`, 0))
+        .filter(Boolean);
+      return {
+        data: rootNodes.length === 1 ? rootNodes[0] : { name: "root", children: rootNodes },
+        highlighted,
+        currentId: current?.id,
+      };
     };
-    const highlightedNodes = currentCallId
-      ? getAncestors(currentCallId)
-      : new Set();
+
+    let root;
+    let currentCallId;
+    let highlightedNodes;
+    if (debugData.recursionTree) {
+      const aggregated = buildAggregatedTree();
+      root = d3.hierarchy(aggregated.data);
+      currentCallId = aggregated.currentId;
+      highlightedNodes = aggregated.highlighted;
+    } else {
+      root = d3.hierarchy(buildTree());
+      currentCallId = debugData.debugStates?.[currentStep]?.callId;
+      const getAncestors = (id) => {
+        const ancestors = new Set();
+        let currentId = id;
+        while (currentId) {
+          ancestors.add(currentId);
+          currentId = callsById.get(currentId)?.parent_id;
+        }
+        return ancestors;
+      };
+      highlightedNodes = currentCallId ? getAncestors(currentCallId) : new Set();
+    }
+    const treeLayout = d3.tree().nodeSize([120, 120]);
+    treeLayout(root);
 
     const getPos = (d) => positions.current[d.data.id] || { x: d.x, y: d.y };
     const linkGroup = svgGroup.append("g");
@@ -219,10 +279,10 @@ const RecursionTree = ({ debugData, currentStep, onStepChange }) => {
       )
       .on("click", (_, d) => {
         if (!d.data.id) return;
-        const matchingStep = debugData.debugStates.findIndex(
-          (s) => s.callId === d.data.id
-        );
-        if (matchingStep >= 0) onStepChange(matchingStep);
+        const entryStep = d.data.entryStep;
+        if (entryStep !== null && entryStep !== undefined) {
+          onStepChange(entryStep);
+        }
       });
 
     node
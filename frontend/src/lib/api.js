@@ -1,3 +1,9 @@
+import { decodeColumnarTrace } from "./columnar";
+
+// Identifies this editor to the backend, which keeps its last run so that
+// re-running an edited program only traces from the first changed statement
+const CLIENT_ID = crypto.randomUUID();
+
 export const callDebugAPI = async (code, testCase) => {
     try {
       const response = await fetch("http://localhost:5000/api/debug", {
@@ -5,7 +11,7 @@ export const callDebugAPI = async (code, testCase) => {
         headers: {
           "Content-Type": "application/json",
         },
-        body: JSON.stringify({ code, testCase }),
+        body: JSON.stringify({ code, testCase, snapshotMode: "delta", traceFormat: "columnar", clientId: CLIENT_ID }),
       });
   
       if (!response.ok) {
@@ -13,9 +19,220 @@ export const callDebugAPI = async (code, testCase) => {
       }
   
       const data = await response.json();
+      const result = data.debugStates;
+      if (result && result.traceFormat === "columnar") {
+        result.debugStates = decodeColumnarTrace(result.debugStates);
+      }
       return data;
     } catch (error) {
       console.error("Error calling debug API:", error);
       return null;
     }
-  };
\ No newline at end of file
+  };
+
+// Streams debug states as the backend produces them. onRecord is called with
+// each {type: "states"} chunk and finally with the {type: "summary"} record.
+export const streamDebugAPI = async (code, testCase, onRecord) => {
+  try {
+    const response = await fetch("http://localhost:5000/api/debug/stream", {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify({ code, testCase, snapshotMode: "delta", recursionTree: true }),
+    });
+
+    if (!response.ok) {
+      throw new Error("Failed to fetch debug stream");
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      const lines = buffer.split("\n");
+      buffer = lines.pop();
+      lines.filter((line) => line.trim()).forEach((line) => {
+        onRecord(JSON.parse(line));
+      });
+    }
+    if (buffer.trim()) {
+      onRecord(JSON.parse(buffer));
+    }
+    return true;
+  } catch (error) {
+    console.error("Error calling debug stream API:", error);
+    return false;
+  }
+};
+
+// Debugs one program on several test inputs at once. Without includeTraces
+// only the per-input results and their comparison come back.
+export const batchDebugAPI = async (code, inputs, includeTraces = false) => {
+  try {
+    const response = await fetch("http://localhost:5000/api/debug/batch", {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify({ code, inputs, includeTraces, snapshotMode: "delta", traceFormat: "columnar" }),
+    });
+
+    if (!response.ok) {
+      throw new Error("Failed to fetch batch debug data");
+    }
+
+    const data = await response.json();
+    data.results.forEach(({ debugStates: result }) => {
+      if (result && result.traceFormat === "columnar") {
+        result.debugStates = decodeColumnarTrace(result.debugStates);
+      }
+    });
+    return data;
+  } catch (error) {
+    console.error("Error calling batch debug API:", error);
+    return null;
+  }
+};
+
+// Server-side debug sessions: the trace stays on the backend and is fetched
+// a page at a time, so large traces never have to be downloaded whole.
+export const createDebugSession = async (code, testCase) => {
+  try {
+    const response = await fetch("http://localhost:5000/api/debug", {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify({ code, testCase, snapshotMode: "delta", session: true }),
+    });
+
+    if (!response.ok) {
+      throw new Error("Failed to create debug session");
+    }
+
+    return await response.json();
+  } catch (error) {
+    console.error("Error creating debug session:", error);
+    return null;
+  }
+};
+
+const getSessionJSON = async (sessionId, path) => {
+  try {
+    const response = await fetch(`http://localhost:5000/api/sessions/${sessionId}${path}`);
+    if (!response.ok) {
+      throw new Error(`Failed to fetch session ${path}`);
+    }
+    return await response.json();
+  } catch (error) {
+    console.error("Error calling debug session API:", error);
+    return null;
+  }
+};
+
+export const fetchSessionSteps = (sessionId, start, count) =>
+  getSessionJSON(sessionId, `/steps?start=${start}&count=${count}`);
+
+export const fetchSessionVariables = (sessionId, step) =>
+  getSessionJSON(sessionId, `/steps/${step}/variables`);
+
+// criteria: any of { line, function, callId, variable }, plus from and direction
+export const seekSession = (sessionId, criteria) =>
+  getSessionJSON(sessionId, `/seek?${new URLSearchParams(criteria)}`);
+
+// Aggregated recursion tree, depth levels at a time; pass a node id to expand it
+export const fetchRecursionTree = (sessionId, depth, node) =>
+  getSessionJSON(
+    sessionId,
+    `/recursion-tree?${new URLSearchParams({ depth, ...(node !== undefined ? { node } : {}) })}`
+  );
+
+// Recordings keep only a run's inputs and checkpoints; steps are rebuilt on
+// the backend by replaying the program, so very long runs stay debuggable.
+export const createRecording = async (code, testCase, checkpointInterval) => {
+  try {
+    const response = await fetch("http://localhost:5000/api/recordings", {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify({ code, testCase, checkpointInterval }),
+    });
+
+    if (!response.ok) {
+      throw new Error("Failed to record run");
+    }
+
+    return await response.json();
+  } catch (error) {
+    console.error("Error creating recording:", error);
+    return null;
+  }
+};
+
+export const fetchRecordingSteps = async (recordingId, start, count) => {
+  try {
+    const response = await fetch(
+      `http://localhost:5000/api/recordings/${recordingId}/steps?start=${start}&count=${count}`
+    );
+    if (!response.ok) {
+      throw new Error("Failed to replay recording");
+    }
+    return await response.json();
+  } catch (error) {
+    console.error("Error calling recording API:", error);
+    return null;
+  }
+};
+
+// Profile-only run: per-line hit counts and times, no variables, for the
+// editor's heatmap.
+export const profileAPI = async (code, testCase) => {
+  try {
+    const response = await fetch("http://localhost:5000/api/profile", {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify({ code, testCase }),
+    });
+
+    if (!response.ok) {
+      throw new Error("Failed to profile code");
+    }
+
+    return await response.json();
+  } catch (error) {
+    console.error("Error calling profile API:", error);
+    return null;
+  }
+};
+
+// Measures how the program's step count and run time grow with input size.
+// inputTemplate is the test input with {n} standing for the size.
+export const complexityAPI = async (code, inputTemplate, sizes) => {
+  try {
+    const response = await fetch("http://localhost:5000/api/complexity", {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify({ code, inputTemplate, sizes }),
+    });
+
+    if (!response.ok) {
+      throw new Error("Failed to measure complexity");
+    }
+
+    return await response.json();
+  } catch (error) {
+    console.error("Error calling complexity API:", error);
+    return null;
+  }
+};
@@ -0,0 +1,33 @@
+// Decode the columnar trace format ("columnar-v1") sent when a request asks
+// for traceFormat: "columnar". Each column is one array indexed by step, and
+// function names, call ids, event types and variable names are indices into
+// a shared string table (-1 for null).
+
+export const decodeColumnarTrace = (columns) => {
+  const { strings, variables } = columns;
+  const str = (index) => (index < 0 ? null : strings[index]);
+  const extras = new Map(columns.extras);
+
+  const states = [];
+  for (let i = 0; i < columns.length; i++) {
+    const stateVariables = {};
+    for (let v = variables.offsets[i]; v < variables.offsets[i + 1]; v++) {
+      stateVariables[strings[variables.names[v]]] = variables.values[v];
+    }
+
+    const state = {
+      line: columns.line[i],
+      function: str(columns.function[i]),
+      variables: stateVariables,
+      callId: str(columns.callId[i]),
+      parentId: str(columns.parentId[i]),
+      stackDepth: columns.stackDepth[i],
+      eventType: str(columns.eventType[i]),
+    };
+    if (columns.keyframe && columns.keyframe[i] >= 0) {
+      state.keyframe = columns.keyframe[i] === 1;
+    }
+    states.push({ ...state, ...(extras.get(i) || {}) });
+  }
+  return states;
+};
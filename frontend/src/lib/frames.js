@@ -0,0 +1,12 @@
+// States only reference their innermost call; the full call stack is
+// recovered from the shared frame table by following parent links.
+
+export const rebuildCallStack = (frames, callId) => {
+  const callStack = [];
+  let currentId = callId;
+  while (currentId && frames?.[currentId]) {
+    callStack.push(frames[currentId]);
+    currentId = frames[currentId].parent_id;
+  }
+  return callStack.reverse();
+};
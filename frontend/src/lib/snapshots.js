@@ -0,0 +1,35 @@
+// Rebuild full variable snapshots from delta-encoded debug states.
+// Each step only carries the locals that changed since the previous step of
+// the same call, plus a full keyframe every few steps.
+
+const applyDelta = (variables, state) => {
+  if (state.keyframe) {
+    return { ...state.variables };
+  }
+  const next = { ...variables, ...state.variables };
+  (state.removedVariables || []).forEach((name) => {
+    delete next[name];
+  });
+  return next;
+};
+
+export const rebuildVariables = (debugStates, index) => {
+  const state = debugStates[index];
+  if (!state) return {};
+  if (state.eventType !== "step" || state.keyframe === undefined) {
+    return state.variables || {};
+  }
+
+  // Walk back to the closest keyframe of the same call
+  const chain = [];
+  for (let i = index; i >= 0; i--) {
+    const candidate = debugStates[i];
+    if (candidate.eventType !== "step" || candidate.callId !== state.callId) {
+      continue;
+    }
+    chain.push(candidate);
+    if (candidate.keyframe !== false) break;
+  }
+
+  return chain.reduceRight(applyDelta, {});
+};